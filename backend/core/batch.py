@@ -0,0 +1,99 @@
+"""
+Batch API: run several GET requests to other API routes in one HTTP request. The
+batch request is authenticated once and its sub-requests skip authentication and
+the middleware, each one only runs its view.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import serializers, status
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .renderers import FastJSONRenderer
+
+MAX_REQUESTS = 20
+# Threads per batch when sub-requests run in parallel
+MAX_WORKERS = 4
+# Headers of the batch request that don't apply to its sub-requests
+EXCLUDED_META = {'CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE'}
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET'], default='GET')
+    path = serializers.CharField(max_length=2000)
+
+    def validate_path(self, value):
+        path = urlsplit(value).path
+        if not path.startswith('/api/') or path.rstrip('/') == '/api/batch':
+            raise serializers.ValidationError('Path must be an API route other than the batch endpoint')
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > MAX_REQUESTS:
+            raise serializers.ValidationError(f'A batch holds at most {MAX_REQUESTS} requests')
+        return value
+
+
+class BatchView(APIView):
+    """
+    POST {"requests": [{"path": "/api/song-logs/home_status/"}, ...], "parallel": false}
+    and get {"responses": [{"path", "status", "body"}, ...]} in the same order.
+    With "parallel": true the sub-requests run in up to MAX_WORKERS threads.
+    """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'error': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        paths = [sub_request['path'] for sub_request in serializer.validated_data['requests']]
+        if serializer.validated_data['parallel'] and len(paths) > 1:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(paths))) as executor:
+                responses = list(executor.map(lambda path: self.run_in_thread(request, path), paths))
+        else:
+            responses = [self.run(request, path) for path in paths]
+        return Response({'responses': responses})
+
+    def run_in_thread(self, request, path):
+        try:
+            return self.run(request, path)
+        finally:
+            # Worker threads get their own database connections
+            connections.close_all()
+
+    def run(self, request, path):
+        try:
+            match = resolve(urlsplit(path).path)
+        except Resolver404:
+            return {'path': path, 'status': status.HTTP_404_NOT_FOUND, 'body': {'error': 'Not found'}}
+
+        response = match.func(self.build_request(request, path), *match.args, **match.kwargs)
+        return {'path': path, 'status': response.status_code, 'body': getattr(response, 'data', None)}
+
+    @staticmethod
+    def build_request(request, path):
+        """
+        A GET request for `path` carrying the batch request's user and headers
+        """
+        url = urlsplit(path)
+        sub_request = HttpRequest()
+        sub_request.method = 'GET'
+        sub_request.path = sub_request.path_info = url.path
+        sub_request.META = {key: value for key, value in request.META.items() if key not in EXCLUDED_META}
+        sub_request.META.update(
+            REQUEST_METHOD='GET', PATH_INFO=url.path, QUERY_STRING=url.query, HTTP_ACCEPT='application/json'
+        )
+        sub_request.GET = QueryDict(url.query)
+        # DRF uses these instead of the authentication classes
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
@@ -0,0 +1,60 @@
+"""
+Conditional GET for API views whose response only depends on one user's data
+"""
+import hashlib
+from functools import wraps
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+
+
+def data_version_etag(user_id_param=None):
+    """
+    Decorate a viewset action to send an ETag derived from the user's data
+    version, and answer a matching If-None-Match with 304 Not Modified before the
+    action runs. The response is for the requesting user, or for the user whose
+    ID is in the `user_id_param` query parameter.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapped(self, request, *args, **kwargs):
+            etag = get_etag(request, user_id_param)
+            if etag is None:
+                return view_method(self, request, *args, **kwargs)
+
+            if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+            if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                # Let browsers keep the response but revalidate it on every use
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapped
+    return decorator
+
+
+def get_etag(request, user_id_param=None):
+    # Imported here, core modules load before the apps
+    from user_management.services import DataVersionService
+
+    if user_id_param is None:
+        user_id, version = request.user.pk, request.user.data_version
+    else:
+        try:
+            user_id = int(request.query_params.get(user_id_param))
+        except (TypeError, ValueError):
+            return None
+        version = DataVersionService.get(user_id)
+        if version is None:
+            return None
+
+    # The same data renders differently per URL (filters, pages) and per format
+    variant = hashlib.md5(
+        f'{request.accepted_renderer.format}:{request.get_full_path()}'.encode(), usedforsecurity=False
+    ).hexdigest()[:12]
+    return quote_etag(f'{user_id}-{version}-{variant}')
@@ -0,0 +1,109 @@
+"""
+Sparse fieldsets: clients pick the fields of a response with ?fields= and ?omit=,
+comma separated, with dots for nested fields (e.g. ?omit=user.favorite_artists).
+The selection is also used to fetch only the columns the response needs.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+def parse_field_tree(value: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    'id,user.username' -> {'id': None, 'user': {'username': None}}, where None
+    stands for the whole field. Returns None when the parameter is absent.
+    """
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        parts = [part.strip() for part in path.split('.')]
+        if not all(parts):
+            continue
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part, {})
+            if child is None:
+                # The whole field is already selected
+                break
+            node = node.setdefault(part, child)
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+class FieldSelection:
+    """
+    The fields a client asked for. `fields` lists the fields to keep (all of them
+    if absent), `omit` the fields to drop.
+    """
+
+    def __init__(self, fields: Optional[Dict[str, Any]] = None, omit: Optional[Dict[str, Any]] = None):
+        self.fields = fields
+        self.omit = omit or {}
+
+    @classmethod
+    def from_request(cls, request) -> 'FieldSelection':
+        params = request.query_params if hasattr(request, 'query_params') else request.GET
+        return cls(parse_field_tree(params.get('fields')), parse_field_tree(params.get('omit')))
+
+    def __repr__(self):
+        # Also what memoized results are keyed by
+        return f'FieldSelection(fields={self.fields!r}, omit={self.omit!r})'
+
+    def __bool__(self):
+        # Whether the selection removes anything
+        return self.fields is not None or bool(self.omit)
+
+    def includes(self, name: str) -> bool:
+        if name in self.omit and self.omit[name] is None:
+            return False
+        return self.fields is None or name in self.fields
+
+    def nested(self, name: str) -> 'FieldSelection':
+        """
+        The selection within a nested field
+        """
+        fields = self.fields.get(name) if self.fields is not None else None
+        omit = self.omit.get(name) or {}
+        return FieldSelection(fields, omit)
+
+    def filter(self, names: Iterable[str]) -> List[str]:
+        return [name for name in names if self.includes(name)]
+
+    def lookups(self, columns: Dict[str, Any], always: Iterable[str] = ()) -> List[str]:
+        """
+        The ORM lookups needed for the selected fields, for .only() or .values().
+        `columns` maps each field to its lookups, or to such a dict for nested fields.
+        """
+        result = dict.fromkeys(always)
+        for name, field_columns in columns.items():
+            if not self.includes(name):
+                continue
+            if isinstance(field_columns, dict):
+                result.update(dict.fromkeys(self.nested(name).lookups(field_columns)))
+            else:
+                result.update(dict.fromkeys(field_columns))
+        return list(result)
+
+    def build(self, getters: Dict[str, Callable[[Any], Any]], obj: Any) -> Dict[str, Any]:
+        """
+        A response dict of the selected fields, only calling the getters of those
+        """
+        return {name: getter(obj) for name, getter in getters.items() if self.includes(name)}
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin dropping the fields not selected on the request. Only applies
+    to reads, writes still accept and return every field.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        selection = FieldSelection.from_request(request)
+        if selection:
+            for name in list(self.fields):
+                if not selection.includes(name):
+                    self.fields.pop(name)
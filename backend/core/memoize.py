@@ -0,0 +1,148 @@
+"""
+Memoization of service methods in Django's cache. Results are keyed by the
+method, its arguments and generation counters: one per user and one global.
+Bumping a generation makes every key built with the old one unreachable, so
+invalidating a user's results is a single counter update however many of them
+are cached; the orphaned entries expire on their own.
+
+Memoize a method with @memoize(scope=USER) when its result only depends on the
+data of the user passed as `user`, and with @memoize(scope=GLOBAL) when other
+users' profiles or song logs change it too. Generations are bumped by
+DataVersionService, which model signals call on every write to a user's data.
+Comparisons only bump the user's generation: they are by far the most frequent
+write, so ratings shown in global results can lag by up to the timeout.
+"""
+import functools
+import hashlib
+import inspect
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, transaction
+
+USER = 'user'
+GLOBAL = 'global'
+
+GLOBAL_GENERATION_KEY = 'memo:generation:global'
+# Stampede protection: one caller computes a missing result while the others
+# wait up to LOCK_WAIT seconds for it, then compute it themselves
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5.0
+LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+def get_cache():
+    return caches[settings.MEMOIZE_CACHE]
+
+
+def user_generation_key(user_id) -> str:
+    return f'memo:generation:user:{user_id}'
+
+
+def _get_generation(cache, key):
+    generation = cache.get(key)
+    if generation is None:
+        # Start from the clock rather than 0: a counter evicted from the cache
+        # must not come back with a value that older entries were keyed with
+        initial = time.time_ns()
+        cache.add(key, initial, timeout=None)
+        generation = cache.get(key, initial)
+    return generation
+
+
+def _bump(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Not set yet, the first read will start it
+        pass
+
+
+def bump_generations(user_id=None, global_results=True) -> None:
+    """
+    Invalidate the memoized results of a user, and every global one unless
+    `global_results` is False. Called again after the transaction commits, so a
+    result computed from the data before the commit can't be cached under the
+    new generation.
+    """
+    def bump():
+        cache = get_cache()
+        if user_id is not None:
+            _bump(cache, user_generation_key(user_id))
+        if global_results:
+            _bump(cache, GLOBAL_GENERATION_KEY)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def _key_part(value):
+    if isinstance(value, models.Model):
+        return f'{value._meta.label}:{value.pk}'
+    return repr(value)
+
+
+def memoize(scope=USER, timeout=300, user_arg='user'):
+    """
+    Decorate a function or method to cache its results for `timeout` seconds.
+    Arguments are part of the key: models by primary key, other values by repr.
+    With scope=USER the result is dropped when the `user_arg` user's data
+    changes, with scope=GLOBAL when any user's data changes. Apply it below
+    @classmethod or @staticmethod.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters)
+        # The class or instance of a method isn't part of the key
+        skipped = parameters[0] if parameters and parameters[0] in ('cls', 'self') else None
+        prefix = f'memo:{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            if not settings.MEMOIZE_ENABLED:
+                return func(*args, **kwargs)
+            cache = get_cache()
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+
+            if scope == USER:
+                generation_key = user_generation_key(bound.arguments[user_arg].pk)
+            else:
+                generation_key = GLOBAL_GENERATION_KEY
+            generation = _get_generation(cache, generation_key)
+
+            arguments = ','.join(
+                f'{name}={_key_part(value)}' for name, value in bound.arguments.items() if name != skipped
+            )
+            digest = hashlib.md5(arguments.encode(), usedforsecurity=False).hexdigest()
+            key = f'{prefix}:{generation}:{digest}'
+
+            result = cache.get(key, _MISSING)
+            if result is not _MISSING:
+                return result
+
+            lock_key = f'{key}:lock'
+            if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+                deadline = time.monotonic() + LOCK_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_INTERVAL)
+                    result = cache.get(key, _MISSING)
+                    if result is not _MISSING:
+                        return result
+                    if cache.get(lock_key) is None:
+                        # The computing caller failed, take over
+                        break
+                return func(*args, **kwargs)
+
+            try:
+                result = func(*args, **kwargs)
+                cache.set(key, result, timeout=timeout)
+            finally:
+                cache.delete(lock_key)
+            return result
+
+        wrapped.uncached = func
+        return wrapped
+    return decorator
@@ -0,0 +1,49 @@
+"""
+Middleware that steps aside for token-authenticated API requests. Sessions, CSRF
+protection, request.user and messages only matter to browser clients (admin and
+the browsable API); API clients authenticate every request with their token and
+DRF exempts its views from CSRF, so for them this machinery is pure overhead.
+Each class here is a drop-in replacement for the Django middleware it extends.
+"""
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.middleware import csrf
+
+
+def is_token_api_request(request) -> bool:
+    """
+    Whether the request is under LEAN_MIDDLEWARE_PATHS and carries an API token
+    """
+    if not hasattr(request, '_token_api_request'):
+        authorization = request.META.get('HTTP_AUTHORIZATION', '')
+        request._token_api_request = authorization.startswith('Token ') and \
+            request.path_info.startswith(tuple(settings.LEAN_MIDDLEWARE_PATHS))
+    return request._token_api_request
+
+
+class TokenAPIBypassMixin:
+    def __call__(self, request):
+        if is_token_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(TokenAPIBypassMixin, sessions_middleware.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(TokenAPIBypassMixin, csrf.CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_token_api_request(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(TokenAPIBypassMixin, auth_middleware.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(TokenAPIBypassMixin, messages_middleware.MessageMiddleware):
+    pass
@@ -0,0 +1,42 @@
+"""
+JSON renderer backed by orjson, producing the same bytes as DRF's JSONRenderer
+"""
+import re
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Floats that orjson formats differently from json.dumps: exponents are written
+# as 1e16 instead of 1e+16, and values below 1e-4 as 0.0000... instead of 1e-05.
+# Output with a number like that is rendered again by the standard encoder; the
+# rare string that happens to match only costs the slower path.
+FLOAT_MISMATCH = re.compile(rb'[:,\[]-?(?:\d+(?:\.\d+)?[eE]|0\.0000)')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer that encodes with orjson when it is installed. Indented
+    output (the browsable API) and non-default JSON settings use the standard encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            # Dates and times go through DRF's encoder, which formats them differently
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except (orjson.JSONEncodeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if FLOAT_MISMATCH.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -59,15 +59,22 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     # 'whitenoise.middleware.WhiteNoiseMiddleware',  # Temporarily commented out for deployment
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Session, CSRF, authentication and messages are skipped for token-authenticated API requests
+    'core.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Requests under these paths with an `Authorization: Token` header skip the
+# middleware above that only browser clients need, an empty list disables it
+LEAN_MIDDLEWARE_PATHS = [
+    path.strip() for path in os.getenv('LEAN_MIDDLEWARE_PATHS', '/api/').split(',') if path.strip()
+]
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -163,7 +170,7 @@ AUTH_USER_MODEL = 'user_management.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'user_management.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -175,6 +182,40 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Local memory by default, or files under CACHE_LOCATION with CACHE_BACKEND=file
+# so every worker process on the host shares one cache
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.getenv('CACHE_LOCATION', 'tastebud'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000'))},
+    }
+}
+# Service results memoized with core.memoize
+MEMOIZE_ENABLED = os.getenv('MEMOIZE_ENABLED', 'True').lower() == 'true'
+MEMOIZE_CACHE = 'default'
+
+# Token authentication keeps recently used tokens' users in memory, per process
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000'))
+# Seconds a user snapshot is trusted, the longest a change made through another process goes unseen
+AUTH_TOKEN_CACHE_TTL = float(os.getenv('AUTH_TOKEN_CACHE_TTL', '60'))
+
+# ELO rating settings
+# Shrink the K-factor as songs collect more comparisons
+ELO_ADAPTIVE_K_FACTOR = os.getenv('ELO_ADAPTIVE_K_FACTOR', 'False').lower() == 'true'
+# Snapshot every song's rating after this many comparisons so deleted or edited
+# ratings only need the comparisons after the nearest snapshot replayed
+ELO_CHECKPOINT_INTERVAL = int(os.getenv('ELO_CHECKPOINT_INTERVAL', '100'))
+# Store comparisons immediately and apply their ELO updates in background micro-batches
+ELO_WRITE_BEHIND = os.getenv('ELO_WRITE_BEHIND', 'False').lower() == 'true'
+ELO_WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('ELO_WRITE_BEHIND_FLUSH_INTERVAL', '0.5'))
+ELO_WRITE_BEHIND_BATCH_SIZE = int(os.getenv('ELO_WRITE_BEHIND_BATCH_SIZE', '500'))
+
 # CORS settings for production
 if DEBUG:
     CORS_ALLOWED_ORIGINS = [
@@ -0,0 +1,271 @@
+"""
+Helpers shared by the apps' test suites
+"""
+import gc
+import json
+import os
+import re
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def create_user_with_songs(username, song_count=5, **extra_fields):
+    """
+    Create a user with music preferences set and `song_count` logged songs
+    """
+    from user_management.models import User
+    from music_logs.models import SongLog, Track
+
+    fields = {
+        'favorite_genres': ['pop', 'rock'],
+        'favorite_artists': [{'id': 'artist-0', 'name': 'Artist 0', 'image': None}],
+        'mood_preferences': ['happy'],
+        **extra_fields
+    }
+    user = User.objects.create_user(username=username, email=f'{username}@example.com', password='password', **fields)
+    for i in range(song_count):
+        track, _ = Track.objects.get_or_create(title=f'Song {i}', artist=f'Artist {i % 3}', album='Album')
+        SongLog.objects.create(user=user, track=track, date=date(2024, 1, 1 + i % 28))
+    return user
+
+
+def create_rated_users(user_count, song_count, rating_count, seed=0):
+    """
+    Synthetic dataset: `user_count` users with `song_count` songs and
+    `rating_count` comparisons each, drawn from a shared catalog
+    """
+    import random
+    from music_ratings.services import RatingService
+
+    rng = random.Random(seed)
+    users = []
+    for i in range(user_count):
+        user = create_user_with_songs(f'user{i}', song_count=song_count)
+        song_ids = list(user.song_logs.values_list('id', flat=True))
+        pairs = set()
+        while len(pairs) < min(rating_count, song_count * (song_count - 1) // 2):
+            pairs.add(tuple(sorted(rng.sample(song_ids, 2))))
+        for song_log_id, compared_song_log_id in sorted(pairs):
+            winner_song_log_id = rng.choice((song_log_id, compared_song_log_id))
+            RatingService.create_rating(user, song_log_id, compared_song_log_id, winner_song_log_id)
+        users.append(user)
+    return users
+
+
+class AggregateConsistencyMixin:
+    """
+    Assertions that aggregates maintained incrementally match a full recomputation
+    """
+
+    def assertRatingStatsConsistent(self, user):
+        from music_logs.models import SongLog, elo_to_rating
+        from music_ratings.models import Rating, UserRatingStats
+
+        stats = UserRatingStats.objects.get(pk=user.pk)
+        elo_ratings = list(SongLog.objects.filter(user=user).values_list('elo_rating', flat=True))
+        self.assertEqual(stats.total_songs, len(elo_ratings))
+        # Buffered write-behind comparisons are only counted once applied
+        self.assertEqual(stats.total_ratings, Rating.objects.filter(user=user, elo_applied=True).count())
+        self.assertAlmostEqual(stats.rating_sum, sum(map(elo_to_rating, elo_ratings)), places=6)
+        # Compared by rating, ties may pick either song
+        self.assertEqual(
+            stats.highest_rated_song and stats.highest_rated_song.elo_rating, max(elo_ratings, default=None)
+        )
+        self.assertEqual(
+            stats.lowest_rated_song and stats.lowest_rated_song.elo_rating, min(elo_ratings, default=None)
+        )
+
+    def assertLeaderboardConsistent(self):
+        from music_logs.models import SongLog, elo_to_rating
+        from music_ratings.models import TrackLeaderboardEntry
+
+        expected = {}
+        for track_id, user_id, elo_rating, created_at in SongLog.objects.values_list(
+            'track_id', 'user_id', 'elo_rating', 'created_at'
+        ):
+            totals = expected.setdefault(track_id, {'users': set(), 'elo_ratings': [], 'created_at': []})
+            totals['users'].add(user_id)
+            totals['elo_ratings'].append(elo_rating)
+            totals['created_at'].append(created_at)
+
+        entries = TrackLeaderboardEntry.objects.in_bulk()
+        self.assertEqual(set(entries), set(expected))
+        for track_id, totals in expected.items():
+            entry = entries[track_id]
+            self.assertEqual(entry.logger_count, len(totals['users']))
+            self.assertEqual(entry.song_log_count, len(totals['elo_ratings']))
+            self.assertAlmostEqual(entry.elo_sum, sum(totals['elo_ratings']), places=6)
+            self.assertAlmostEqual(entry.rating_sum, sum(map(elo_to_rating, totals['elo_ratings'])), places=6)
+            self.assertAlmostEqual(entry.mean_elo, entry.elo_sum / entry.song_log_count, places=6)
+            self.assertAlmostEqual(entry.mean_rating, entry.rating_sum / entry.song_log_count, places=6)
+            self.assertEqual(entry.last_logged_at, max(totals['created_at']))
+
+
+class EndpointBudgetMixin:
+    """
+    Query count and latency budgets for API endpoints. Query budgets are always
+    checked. Latencies depend on the machine, so they are only compared against
+    the p50/p95 recorded in PERF_BASELINE_PATH when the tests run with
+    PERF_LATENCY_CHECKS=1; run them with UPDATE_PERF_BASELINE=1 to record a new
+    baseline instead.
+    """
+
+    PERF_BASELINE_PATH = Path(__file__).resolve().parent / 'perf_baseline.json'
+    CHECK_LATENCY = bool(os.getenv('PERF_LATENCY_CHECKS'))
+    UPDATE_BASELINE = bool(os.getenv('UPDATE_PERF_BASELINE'))
+    # How many requests are timed per endpoint, and how many are sent when only
+    # queries are counted
+    LATENCY_SAMPLES = 20
+    QUERY_SAMPLES = 3
+    # A run fails when its p95 exceeds baseline * tolerance + slack, which absorbs
+    # machine-to-machine differences but still catches real slowdowns
+    LATENCY_TOLERANCE = float(os.getenv('PERF_LATENCY_TOLERANCE', 3.0))
+    LATENCY_SLACK_MS = 5.0
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.recorded_latencies = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.recorded_latencies and cls.UPDATE_BASELINE:
+            baseline = cls.load_perf_baseline()
+            baseline.update(cls.recorded_latencies)
+            cls.PERF_BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        super().tearDownClass()
+
+    @classmethod
+    def load_perf_baseline(cls):
+        if not cls.PERF_BASELINE_PATH.exists():
+            return {}
+        return json.loads(cls.PERF_BASELINE_PATH.read_text())
+
+    def assertEndpointBudget(self, name, max_queries, send_request, expected_status=200):
+        """
+        Call `send_request(i)` several times, failing if any call runs more than
+        `max_queries` queries or, when latencies are checked, if the latency
+        regressed against the baseline
+        """
+        measure = self.CHECK_LATENCY or self.UPDATE_BASELINE
+        timings = []
+        # A full garbage collection can take longer than the request itself, keep
+        # it out of the samples
+        gc.collect()
+        gc.disable()
+        try:
+            for i in range(self.LATENCY_SAMPLES if measure else self.QUERY_SAMPLES):
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = send_request(i)
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.assertEqual(response.status_code, expected_status, getattr(response, 'data', None))
+                self.assertLessEqual(
+                    len(context.captured_queries), max_queries,
+                    f"{name} ran {len(context.captured_queries)} queries, budget is {max_queries}:\n" +
+                    '\n'.join(query['sql'] for query in context.captured_queries)
+                )
+        finally:
+            gc.enable()
+        if not measure:
+            return None
+
+        # The first request warms caches, it is not part of the measurement
+        timings = sorted(timings[1:])
+        latency = {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(len(timings) - 1, round(len(timings) * 0.95))], 2),
+        }
+        self.recorded_latencies[name] = latency
+
+        baseline = self.load_perf_baseline().get(name)
+        if baseline and not self.UPDATE_BASELINE:
+            limit = baseline['p95_ms'] * self.LATENCY_TOLERANCE + self.LATENCY_SLACK_MS
+            self.assertLessEqual(
+                latency['p95_ms'], limit,
+                f"{name} p95 latency {latency['p95_ms']} ms exceeds {limit:.2f} ms (baseline {baseline['p95_ms']} ms)"
+            )
+        return latency
+
+
+class QueryPlanMixin:
+    """
+    Assertions on the plans of the queries a block of code runs, read with
+    EXPLAIN on SQLite and PostgreSQL
+    """
+
+    # Tables that may be read in full: user discovery compares against every user
+    FULL_SCAN_ALLOWED = {'user_management_user'}
+
+    @contextmanager
+    def assertUsesIndexes(self):
+        """
+        Fail if any SELECT run inside the block reads a table without an index
+        """
+        with CaptureQueriesContext(connection) as context:
+            yield context
+
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            scanned = full_table_scans(sql) - self.FULL_SCAN_ALLOWED
+            self.assertFalse(scanned, f"Full scan of {', '.join(sorted(scanned))} in: {sql}")
+
+
+def full_table_scans(sql):
+    """
+    Names of the tables the database would read in full to run `sql`
+    """
+    if connection.vendor == 'postgresql':
+        return _postgresql_full_table_scans(sql)
+    return _sqlite_full_table_scans(sql)
+
+
+def _sqlite_full_table_scans(sql):
+    # Subqueries refer to tables by alias, e.g. "music_logs_songlog" U0
+    aliases = dict((alias, table) for table, alias in re.findall(r'"(\w+)"\s+(?:AS\s+)?([A-Z]\d+)\b', sql))
+    tables = set(connection.introspection.table_names())
+
+    scanned = set()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        for row in cursor.fetchall():
+            # "SCAN table" without "USING ... INDEX" reads every row
+            match = re.fullmatch(r'SCAN (\S+)', row[-1])
+            if match:
+                name = aliases.get(match.group(1), match.group(1))
+                # Skip subqueries and other derived tables
+                if name in tables:
+                    scanned.add(name)
+    return scanned
+
+
+def _postgresql_full_table_scans(sql):
+    scanned = set()
+
+    def visit(node):
+        if node['Node Type'] == 'Seq Scan':
+            scanned.add(node['Relation Name'])
+        for child in node.get('Plans', []):
+            visit(child)
+
+    with connection.cursor() as cursor:
+        # Test tables are tiny, where a sequential scan is always cheapest; only
+        # fall back to one when no index can serve the query
+        cursor.execute('SET enable_seqscan = off')
+        try:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.execute('RESET enable_seqscan')
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    visit(plan[0]['Plan'])
+    return scanned
@@ -1,9 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.documentation import include_docs_urls
+from .batch import BatchView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/batch/', BatchView.as_view(), name='batch'),
     path('api/', include('user_management.urls')),  # Add user management URLs
     path('api/', include('music_logs.urls')),
     path('api/', include('music_ratings.urls')),
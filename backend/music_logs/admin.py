@@ -1,10 +1,33 @@
 from django.contrib import admin
-from .models import SongLog
+from .models import SongLog, Track, TrendingBucket, ImportJob
 
 @admin.register(SongLog)
 class SongLogAdmin(admin.ModelAdmin):
-    list_display = ('song_title', 'artist', 'user', 'date', 'elo_rating')
+    list_display = ('track', 'user', 'date', 'elo_rating')
     list_filter = ('date', 'user')
-    search_fields = ('song_title', 'artist', 'album', 'note')
+    list_select_related = ('track', 'user')
+    search_fields = ('track__title', 'track__artist', 'track__album', 'note')
+    raw_id_fields = ('track',)
     date_hierarchy = 'date'
     ordering = ('-date', '-created_at')
+
+@admin.register(Track)
+class TrackAdmin(admin.ModelAdmin):
+    list_display = ('title', 'artist', 'album', 'spotify_id', 'popularity')
+    search_fields = ('title', 'artist', 'album', 'spotify_id')
+    ordering = ('title',)
+
+@admin.register(TrendingBucket)
+class TrendingBucketAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'key', 'hour', 'count')
+    list_filter = ('kind',)
+    search_fields = ('key',)
+    ordering = ('-hour',)
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'file_format', 'status', 'rows_read', 'imported', 'duplicates', 'skipped', 'created_at')
+    list_filter = ('status', 'file_format')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    ordering = ('-created_at',)
@@ -0,0 +1,64 @@
+"""
+Streaming writers for data exports. Rows come from a queryset iterator and are
+encoded one at a time, so memory use doesn't grow with the size of the export.
+"""
+import csv
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+CONTENT_TYPES = {
+    FORMAT_NDJSON: 'application/x-ndjson',
+    FORMAT_CSV: 'text/csv; charset=utf-8',
+}
+# Rows fetched from the database per round trip
+CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """
+    File-like object for csv.writer that hands each encoded line back instead of storing it
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]], fields: List[str]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[field]) for field in fields])
+
+
+def _csv_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if value is None:
+        return ''
+    return value
+
+
+def export_response(queryset, fields: List[str], file_format: str, filename: str) -> StreamingHttpResponse:
+    """
+    Stream the `fields` of a .values() queryset as an NDJSON or CSV attachment
+    """
+    rows = queryset.values(*fields).iterator(chunk_size=CHUNK_SIZE)
+    if file_format == FORMAT_CSV:
+        content = iter_csv(rows, fields)
+    else:
+        content = iter_ndjson(rows)
+
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    return response
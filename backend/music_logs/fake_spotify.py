@@ -0,0 +1,33 @@
+"""
+Fake Spotify client used when the real API shouldn't be called
+"""
+import zlib
+
+
+class FakeSpotifyService:
+    """
+    Offline stand-in for SpotifyService with deterministic results, so the
+    benchmarks can run without Spotify credentials or network access
+    """
+
+    def search_songs(self, query, limit=10):
+        return [self.get_song_details(f'stub-{zlib.crc32(f"{query}:{i}".encode()) % 100000}') for i in range(limit)]
+
+    def get_song_details(self, spotify_id):
+        number = int(spotify_id.rsplit('-', 1)[-1]) if spotify_id.rsplit('-', 1)[-1].isdigit() else 0
+        return {
+            'spotify_id': spotify_id,
+            'title': f'Stub Song {number}',
+            'artist': f'Stub Artist {number % 100}',
+            'album': f'Stub Album {number % 500}',
+            'album_art': None,
+            'preview_url': None,
+            'duration_ms': 180000 + number % 60000,
+            'popularity': number % 101
+        }
+
+    def search_artists(self, query, limit=10):
+        return [
+            {'id': f'stub-artist-{i}', 'name': f'{query.title()} {i}', 'image': None}
+            for i in range(limit)
+        ]
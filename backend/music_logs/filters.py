@@ -0,0 +1,12 @@
+import django_filters
+from .models import SongLog
+
+
+class SongLogFilter(django_filters.FilterSet):
+    # Filter on the 1-10 rating computed in the database (see SongLogQuerySet.with_rating)
+    min_rating = django_filters.NumberFilter(field_name='db_rating', lookup_expr='gte')
+    max_rating = django_filters.NumberFilter(field_name='db_rating', lookup_expr='lte')
+
+    class Meta:
+        model = SongLog
+        fields = ['min_rating', 'max_rating']
@@ -0,0 +1,135 @@
+"""
+Streaming readers for listening history files, one record at a time so large
+exports are never held in memory
+"""
+import csv
+import io
+import json
+from datetime import date
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+READ_SIZE = 64 * 1024
+
+
+def iter_json_array(stream: TextIO, read_size: int = READ_SIZE) -> Iterator[Any]:
+    """
+    Yield the items of a top-level JSON array, reading the stream incrementally
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    in_array = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                raise ValueError('Unexpected end of file, the JSON array is not closed')
+            fill()
+            continue
+
+        if not in_array:
+            if buffer[position] != '[':
+                raise ValueError('Expected a JSON array of listening history entries')
+            in_array = True
+            position += 1
+            continue
+        if buffer[position] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError('Invalid JSON in listening history file')
+            fill()
+            continue
+        # A number at the end of the buffer may continue in the next read
+        if end == len(buffer) and not eof:
+            fill()
+            continue
+        position = end
+        yield item
+
+
+def iter_ndjson(stream: TextIO) -> Iterator[Any]:
+    """
+    Yield the value on each non-blank line of a newline-delimited JSON stream
+    """
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            raise ValueError(f'Invalid JSON on line {line_number} of listening history file')
+
+
+def iter_history_records(stream, file_format: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the raw records of a JSON, NDJSON or CSV history file opened in binary mode
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        yield from csv.DictReader(text)
+    elif file_format == 'ndjson':
+        yield from iter_ndjson(text)
+    else:
+        yield from iter_json_array(text)
+
+
+def normalize_record(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Map a record from any supported layout to title, artist, album, spotify_id,
+    date and ms_played. Returns None when the record has no song or date.
+
+    Supported layouts: Spotify "StreamingHistory*.json" (trackName, artistName,
+    endTime, msPlayed), Spotify extended history (master_metadata_*, ts,
+    spotify_track_uri, ms_played) and TasteBud's own export (song_title, artist,
+    album, spotify_id, date).
+    """
+    if not isinstance(record, dict):
+        return None
+
+    def first(*keys):
+        for key in keys:
+            value = record.get(key)
+            if value not in (None, ''):
+                return str(value).strip()
+        return None
+
+    title = first('song_title', 'title', 'trackName', 'master_metadata_track_name')
+    artist = first('artist', 'artistName', 'master_metadata_album_artist_name')
+    played_at = first('date', 'endTime', 'ts')
+    if not title or not artist or not played_at:
+        return None
+
+    try:
+        played_on = date.fromisoformat(played_at[:10])
+    except ValueError:
+        return None
+
+    spotify_id = first('spotify_id', 'spotify_track_uri')
+    if spotify_id and spotify_id.startswith('spotify:track:'):
+        spotify_id = spotify_id[len('spotify:track:'):]
+
+    try:
+        ms_played = int(float(first('msPlayed', 'ms_played') or 0)) or None
+    except ValueError:
+        ms_played = None
+
+    return {
+        'title': title[:255],
+        'artist': artist[:255],
+        'album': (first('album', 'master_metadata_album_album_name') or '')[:255],
+        'spotify_id': spotify_id or None,
+        'date': played_on,
+        'ms_played': ms_played,
+    }
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from music_logs.services import TrendingService
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete trending buckets older than the longest trending window, and emptied ones. '
+        'Meant to run periodically, e.g. hourly from cron.'
+    )
+
+    def handle(self, *args, **options):
+        deleted = TrendingService.compact()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} trending bucket(s)'))
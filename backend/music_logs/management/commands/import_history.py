@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from music_logs.models import ImportJob
+from music_logs.services import ImportService
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a listening history file (Spotify StreamingHistory or extended history JSON, '
+        'or an NDJSON/CSV export) into a user\'s song logs. The file is streamed from disk, '
+        'so it can be of any size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username to import the songs for')
+        parser.add_argument('--format', dest='file_format', choices=dict(ImportJob.FORMAT_CHOICES),
+                            help='File format, detected from the extension by default')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' not found")
+
+        try:
+            file_format = options['file_format'] or ImportService.detect_format(options['path'])
+        except ValueError as e:
+            raise CommandError(f'{e}, or pass --format')
+
+        job = ImportJob.objects.create(user=user, file_format=file_format)
+        try:
+            with open(options['path'], 'rb') as source:
+                ImportService.run(job, source=source, progress=self.report)
+        except OSError as e:
+            job.delete()
+            raise CommandError(str(e))
+
+        if job.status == ImportJob.STATUS_FAILED:
+            raise CommandError(job.error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {job.imported} songs from {job.rows_read} rows '
+            f'({job.duplicates} duplicates, {job.skipped} skipped)'
+        ))
+
+    def report(self, job):
+        if not job.is_finished:
+            self.stdout.write(f'  {job.rows_read} rows read, {job.imported} imported')
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0004_remove_daily_limit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='songlog',
+            index=models.Index(fields=['user', '-elo_rating'], name='songlog_user_elo_idx'),
+        ),
+    ]
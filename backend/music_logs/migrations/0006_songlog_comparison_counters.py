@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0005_songlog_user_elo_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='songlog',
+            name='comparisons',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='songlog',
+            name='last_compared_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='songlog',
+            name='wins',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
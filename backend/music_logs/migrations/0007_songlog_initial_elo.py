@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0006_songlog_comparison_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='songlog',
+            name='initial_elo',
+            field=models.FloatField(default=1500.0),
+        ),
+    ]
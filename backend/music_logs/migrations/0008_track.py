@@ -0,0 +1,41 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0007_songlog_initial_elo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Track',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('artist', models.CharField(max_length=255)),
+                ('album', models.CharField(blank=True, max_length=255)),
+                ('spotify_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('album_art_url', models.URLField(blank=True, max_length=500, null=True)),
+                ('preview_url', models.URLField(blank=True, max_length=500, null=True)),
+                ('duration_ms', models.IntegerField(blank=True, null=True)),
+                ('popularity', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['title'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='track',
+            constraint=models.UniqueConstraint(condition=models.Q(('spotify_id__isnull', True)), fields=('title', 'artist', 'album'), name='unique_track_without_spotify_id'),
+        ),
+        migrations.AddField(
+            model_name='songlog',
+            name='track',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='song_logs', to='music_logs.track'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:20
+
+from django.db import migrations
+
+TRACK_FIELDS = ['album_art_url', 'preview_url', 'duration_ms', 'popularity']
+
+
+def populate_tracks(apps, schema_editor):
+    """
+    Create one Track per distinct song and point every log at it.
+    Logs are matched on their Spotify ID, or on title/artist/album when they have none.
+    """
+    SongLog = apps.get_model('music_logs', 'SongLog')
+    Track = apps.get_model('music_logs', 'Track')
+
+    tracks = {}
+    for song_log in SongLog.objects.order_by('id').iterator(chunk_size=2000):
+        spotify_id = song_log.spotify_id or None
+        key = ('spotify', spotify_id) if spotify_id else ('manual', song_log.song_title, song_log.artist, song_log.album)
+
+        track = tracks.get(key)
+        if track is None:
+            track = Track.objects.create(
+                spotify_id=spotify_id,
+                title=song_log.song_title,
+                artist=song_log.artist,
+                album=song_log.album,
+                **{field: getattr(song_log, field) for field in TRACK_FIELDS}
+            )
+            tracks[key] = track
+
+        song_log.track_id = track.id
+        song_log.save(update_fields=['track'])
+
+
+def restore_song_metadata(apps, schema_editor):
+    SongLog = apps.get_model('music_logs', 'SongLog')
+
+    for song_log in SongLog.objects.select_related('track').iterator(chunk_size=2000):
+        track = song_log.track
+        song_log.song_title = track.title
+        song_log.artist = track.artist
+        song_log.album = track.album
+        song_log.spotify_id = track.spotify_id
+        for field in TRACK_FIELDS:
+            setattr(song_log, field, getattr(track, field))
+        song_log.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0008_track'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_tracks, restore_song_metadata),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0009_populate_tracks'),
+    ]
+
+    operations = [
+        # Defaults let the columns be re-added when migrating backwards
+        migrations.AlterField(
+            model_name='songlog',
+            name='song_title',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='songlog',
+            name='artist',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RemoveField(
+            model_name='songlog',
+            name='album',
+        ),
+        migrations.RemoveField(
+            model_name='songlog',
+            name='album_art_url',
+        ),
+        migrations.RemoveField(
+            model_name='songlog',
+            name='artist',
+        ),
+        migrations.RemoveField(
+            model_name='songlog',
+            name='duration_ms',
+        ),
+        migrations.RemoveField(
+            model_name='songlog',
+            name='popularity',
+        ),
+        migrations.RemoveField(
+            model_name='songlog',
+            name='preview_url',
+        ),
+        migrations.RemoveField(
+            model_name='songlog',
+            name='song_title',
+        ),
+        migrations.RemoveField(
+            model_name='songlog',
+            name='spotify_id',
+        ),
+        migrations.AlterField(
+            model_name='songlog',
+            name='track',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='song_logs', to='music_logs.track'),
+        ),
+    ]
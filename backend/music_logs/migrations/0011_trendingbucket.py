@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0010_remove_songlog_track_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('track', 'Track'), ('artist', 'Artist')], max_length=10)),
+                ('key', models.CharField(max_length=255)),
+                ('hour', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['kind', 'hour'], name='trending_kind_hour_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trendingbucket',
+            constraint=models.UniqueConstraint(fields=('kind', 'key', 'hour'), name='unique_trending_bucket'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:06
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import CharField, Count, F
+from django.db.models.functions import Cast, TruncHour
+from django.utils import timezone
+
+
+def populate_trending_buckets(apps, schema_editor):
+    SongLog = apps.get_model('music_logs', 'SongLog')
+    TrendingBucket = apps.get_model('music_logs', 'TrendingBucket')
+
+    # Only the longest trending window (7 days) is kept
+    recent_logs = SongLog.objects.filter(created_at__gte=timezone.now() - timedelta(days=7)).order_by()
+    for kind, key in (('track', Cast('track_id', CharField())), ('artist', F('track__artist'))):
+        totals = recent_logs.annotate(key=key, hour=TruncHour('created_at')).values('key', 'hour').annotate(
+            count=Count('id')
+        )
+        TrendingBucket.objects.bulk_create(
+            (TrendingBucket(kind=kind, **row) for row in totals.iterator()),
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0011_trendingbucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_trending_buckets, migrations.RunPython.noop),
+    ]
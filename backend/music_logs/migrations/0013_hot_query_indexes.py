@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0012_populate_trending_buckets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='songlog',
+            index=models.Index(fields=['user', '-date', '-created_at'], name='songlog_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='songlog',
+            index=models.Index(fields=['user', '-created_at'], name='songlog_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='songlog',
+            index=models.Index(fields=['-created_at'], name='songlog_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='songlog',
+            index=models.Index(fields=['user', 'comparisons'], name='songlog_user_comparisons_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='songlog',
+            index=models.Index(fields=['track', 'user'], name='songlog_track_user_idx'),
+        ),
+    ]
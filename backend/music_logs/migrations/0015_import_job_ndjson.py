@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0014_importjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='file_format',
+            field=models.CharField(choices=[('json', 'JSON'), ('ndjson', 'NDJSON'), ('csv', 'CSV')], max_length=10),
+        ),
+    ]
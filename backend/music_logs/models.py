@@ -1,17 +1,60 @@
+import math
 from django.db import models
+from django.db.models import Case, When, Value, F, FloatField, ExpressionWrapper
+from django.db.models.functions import Floor
 from django.conf import settings
 
 # Create your models here.
 
-class SongLog(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='song_logs')
-    song_title = models.CharField(max_length=255)
+# ELO range mapped onto the 1-10 display scale
+RATING_MIN_ELO = 800
+RATING_MAX_ELO = 2000
+
+def elo_to_rating(elo_rating, min_elo=RATING_MIN_ELO, max_elo=RATING_MAX_ELO):
+    """
+    Convert ELO score to 1-10 scale for display
+    ELO 800 → 1.0, ELO 1200 → 5.0, ELO 2000+ → 10.0
+    """
+    if elo_rating <= min_elo:
+        return 1.0
+    elif elo_rating >= max_elo:
+        return 10.0
+    else:
+        # Linear mapping: 800 → 1.0, 2000 → 10.0
+        normalized = (elo_rating - min_elo) / (max_elo - min_elo)
+        # Round half up to one decimal with the same arithmetic as elo_to_rating_expression,
+        # so Python and database ratings always agree
+        return math.floor((1.0 + (normalized * 9.0)) * 10.0 + 0.5) / 10.0
+
+def elo_to_rating_expression(field='elo_rating', min_elo=RATING_MIN_ELO, max_elo=RATING_MAX_ELO):
+    """
+    Database-side equivalent of elo_to_rating, usable in annotate(), filter() and aggregate()
+    """
+    normalized = ExpressionWrapper(
+        (F(field) - Value(float(min_elo))) / Value(float(max_elo - min_elo)),
+        output_field=FloatField()
+    )
+    return Case(
+        When(**{f'{field}__lte': min_elo}, then=Value(1.0)),
+        When(**{f'{field}__gte': max_elo}, then=Value(10.0)),
+        default=Floor((Value(1.0) + normalized * Value(9.0)) * Value(10.0) + Value(0.5)) / Value(10.0),
+        output_field=FloatField()
+    )
+
+class SongLogQuerySet(models.QuerySet):
+    def with_rating(self):
+        """
+        Annotate each song with its 1-10 rating computed by the database
+        """
+        return self.annotate(db_rating=elo_to_rating_expression())
+
+class Track(models.Model):
+    """
+    Catalog entry for a song, shared by every log of it across users
+    """
+    title = models.CharField(max_length=255)
     artist = models.CharField(max_length=255)
     album = models.CharField(max_length=255, blank=True)
-    note = models.TextField(blank=True)
-    date = models.DateField()
-    created_at = models.DateTimeField(auto_now_add=True)
-    elo_rating = models.FloatField(default=1500.0)
     
     # Spotify specific fields
     spotify_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
@@ -19,27 +62,161 @@ class SongLog(models.Model):
     preview_url = models.URLField(max_length=500, blank=True, null=True)
     duration_ms = models.IntegerField(null=True, blank=True)
     popularity = models.IntegerField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['title']
+        constraints = [
+            # Songs logged by hand have no Spotify ID and are matched on their metadata
+            models.UniqueConstraint(
+                fields=['title', 'artist', 'album'],
+                condition=models.Q(spotify_id__isnull=True),
+                name='unique_track_without_spotify_id'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.title} by {self.artist}"
+
+class SongLog(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='song_logs')
+    track = models.ForeignKey(Track, on_delete=models.PROTECT, related_name='song_logs')
+    note = models.TextField(blank=True)
+    date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    elo_rating = models.FloatField(default=1500.0)
+    # Rating the song started from before any comparison, replayed from when ratings are rolled back
+    initial_elo = models.FloatField(default=1500.0)
+    
+    # Comparison counters, maintained by RatingService.create_rating
+    comparisons = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    last_compared_at = models.DateTimeField(null=True, blank=True)
+
+    objects = SongLogQuerySet.as_manager()
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Rankings: a user's songs ordered by ELO
+            models.Index(fields=['user', '-elo_rating'], name='songlog_user_elo_idx'),
+            # A user's logs in the default ordering: song log list, home_status, user_profile
+            models.Index(fields=['user', '-date', '-created_at'], name='songlog_user_date_idx'),
+            # A user's most recent logs: social feed of similar users, discovery previews
+            models.Index(fields=['user', '-created_at'], name='songlog_user_created_idx'),
+            # Most recent logs across all users: social feed fallback
+            models.Index(fields=['-created_at'], name='songlog_created_idx'),
+            # Comparison pairs: a user's least compared songs
+            models.Index(fields=['user', 'comparisons'], name='songlog_user_comparisons_idx'),
+            # Leaderboard: whether a user has another log of a track
+            models.Index(fields=['track', 'user'], name='songlog_track_user_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.song_title} by {self.artist} ({self.date})"
+        return f"{self.track.title} by {self.track.artist} ({self.date})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The ELO rating a with_rating() annotation was computed from, None when deferred
+        instance._loaded_elo_rating = instance.__dict__.get('elo_rating')
+        return instance
     
     @property
     def rating(self):
         """
         Convert ELO score to 1-10 scale for display
-        ELO 800 → 1.0, ELO 1200 → 5.0, ELO 2000+ → 10.0
         """
-        min_elo = 800
-        max_elo = 2000
-        
-        if self.elo_rating <= min_elo:
-            return 1.0
-        elif self.elo_rating >= max_elo:
-            return 10.0
-        else:
-            # Linear mapping: 800 → 1.0, 2000 → 10.0
-            normalized = (self.elo_rating - min_elo) / (max_elo - min_elo)
-            return round(1.0 + (normalized * 9.0), 1)
+        # Use the database value when the queryset was annotated with with_rating(),
+        # unless the ELO rating changed since it was loaded
+        if 'db_rating' in self.__dict__ and self.__dict__.get('elo_rating') == getattr(self, '_loaded_elo_rating', None):
+            return self.db_rating
+        return elo_to_rating(self.elo_rating)
+
+
+class TrendingBucket(models.Model):
+    """
+    Number of songs logged in one hour for a track or an artist. Trending lists
+    are computed from these counters instead of the log table.
+    """
+    KIND_TRACK = 'track'
+    KIND_ARTIST = 'artist'
+    KIND_CHOICES = [
+        (KIND_TRACK, 'Track'),
+        (KIND_ARTIST, 'Artist'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Track id or artist name
+    key = models.CharField(max_length=255)
+    # Start of the hour, in UTC
+    hour = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key', 'hour'], name='unique_trending_bucket'),
+        ]
+        indexes = [
+            # Window scans: every bucket of a kind since a given hour
+            models.Index(fields=['kind', 'hour'], name='trending_kind_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.key} at {self.hour:%Y-%m-%d %H:00}: {self.count}"
+
+
+class ImportJob(models.Model):
+    """
+    Bulk import of a listening history file. Counters are updated after every
+    chunk so clients can poll the job for progress.
+    """
+    FORMAT_JSON = 'json'
+    FORMAT_NDJSON = 'ndjson'
+    FORMAT_CSV = 'csv'
+    FORMAT_CHOICES = [
+        (FORMAT_JSON, 'JSON'),
+        (FORMAT_NDJSON, 'NDJSON'),
+        (FORMAT_CSV, 'CSV'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='import_jobs')
+    # Uploaded file, removed once the import finished
+    file = models.FileField(upload_to='imports/', blank=True)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    rows_read = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    duplicates = models.PositiveIntegerField(default=0)
+    # Records without a song or date, or played too briefly to count
+    skipped = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='importjob_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import {self.id} for {self.user} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
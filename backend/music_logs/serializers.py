@@ -1,12 +1,110 @@
 from rest_framework import serializers
-from .models import SongLog
+from core.fast_serializers import FastSerializer
+from core.fieldsets import SparseFieldsetMixin
+from .models import SongLog, ImportJob
+from .services import CatalogService
+
+class SongLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Song metadata lives on the shared Track, exposed flat for API compatibility
+    song_title = serializers.CharField(source='track.title', max_length=255)
+    artist = serializers.CharField(source='track.artist', max_length=255)
+    album = serializers.CharField(source='track.album', max_length=255, required=False, allow_blank=True)
+    spotify_id = serializers.CharField(source='track.spotify_id', max_length=255, required=False, allow_blank=True, allow_null=True)
+    album_art_url = serializers.URLField(source='track.album_art_url', max_length=500, required=False, allow_blank=True, allow_null=True)
+    preview_url = serializers.URLField(source='track.preview_url', max_length=500, required=False, allow_blank=True, allow_null=True)
+    duration_ms = serializers.IntegerField(source='track.duration_ms', required=False, allow_null=True)
+    popularity = serializers.IntegerField(source='track.popularity', required=False, allow_null=True)
+
+    # API names of the Track fields that are named differently
+    TRACK_FIELD_NAMES = {'title': 'song_title'}
 
-class SongLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = SongLog
         fields = [
             'id', 'user', 'song_title', 'artist', 'album', 'note', 
             'date', 'created_at', 'elo_rating', 'rating', 'spotify_id', 
-            'album_art_url', 'preview_url', 'duration_ms', 'popularity'
+            'album_art_url', 'preview_url', 'duration_ms', 'popularity',
+            'comparisons', 'wins', 'last_compared_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'elo_rating', 'rating', 'comparisons', 'wins', 'last_compared_at']
+
+    def validate(self, attrs):
+        track_data = attrs.get('track')
+        if self.instance is not None and track_data:
+            self.validate_track_edit(self.instance.track, track_data)
+        return attrs
+
+    @classmethod
+    def validate_track_edit(cls, track, track_data):
+        """
+        Reject metadata edits the shared catalog track would not take. Edited
+        values must match the track the log ends up pointing at: songs are
+        matched on their Spotify ID, or on their title, artist and album.
+        """
+        current = {field: getattr(track, field) for field in CatalogService.TRACK_FIELDS}
+        target = CatalogService.find_track({**current, **track_data})
+        if target is None:
+            # A new track is created from the edited values
+            return
+
+        errors = {}
+        for field, value in track_data.items():
+            if (getattr(target, field) or None) != (value or None):
+                name = cls.TRACK_FIELD_NAMES.get(field, field)
+                errors[name] = (
+                    "Comes from Spotify and can't be edited" if target.spotify_id else
+                    "Shared by every log of this song and can't be edited"
+                )
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def create(self, validated_data):
+        validated_data['track'] = CatalogService.resolve_track(validated_data.pop('track'))
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        track_data = validated_data.pop('track', None)
+        if track_data:
+            # Changing the song's metadata points the log at the matching track,
+            # validate() made sure it has the edited values
+            current = {field: getattr(instance.track, field) for field in CatalogService.TRACK_FIELDS}
+            validated_data['track'] = CatalogService.resolve_track({**current, **track_data})
+        return super().update(instance, validated_data)
+
+class SongLogFastSerializer(FastSerializer):
+    """
+    Read-only SongLogSerializer for list endpoints. Expects a queryset annotated
+    with with_rating(), so ratings are computed by the database for every row at once.
+    """
+    model = SongLog
+    fields = [
+        ('id', 'id'),
+        ('user', 'user_id'),
+        ('song_title', 'track__title'),
+        ('artist', 'track__artist'),
+        ('album', 'track__album'),
+        ('note', 'note'),
+        ('date', 'date'),
+        ('created_at', 'created_at'),
+        ('elo_rating', 'elo_rating'),
+        ('rating', 'db_rating'),
+        ('spotify_id', 'track__spotify_id'),
+        ('album_art_url', 'track__album_art_url'),
+        ('preview_url', 'track__preview_url'),
+        ('duration_ms', 'track__duration_ms'),
+        ('popularity', 'track__popularity'),
+        ('comparisons', 'comparisons'),
+        ('wins', 'wins'),
+        ('last_compared_at', 'last_compared_at'),
+    ]
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    is_finished = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'file_format', 'status', 'is_finished', 'rows_read', 'imported',
+            'duplicates', 'skipped', 'error', 'created_at', 'started_at', 'finished_at'
         ]
-        read_only_fields = ['id', 'created_at', 'elo_rating', 'rating'] 
\ No newline at end of file
+        read_only_fields = fields
@@ -1,13 +1,24 @@
 import os
+import heapq
 import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
 from typing import List, Dict, Optional, Any
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 from django.conf import settings
-from django.db.models import Q, Count, Avg
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Count, Avg, F, CharField, Window
+from django.db.models.functions import Cast, TruncHour
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
-from .models import SongLog
+from core.fieldsets import FieldSelection
+from core.memoize import memoize, GLOBAL, USER
+from .importers import iter_history_records, normalize_record
+from .models import SongLog, Track, TrendingBucket, ImportJob, elo_to_rating
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -126,25 +137,150 @@ class SpotifyService:
             logger.error("Error searching Spotify for artists: %s", str(e), exc_info=True)
             return []
 
+class CatalogService:
+    """
+    Service for the shared Track catalog
+    """
+    
+    TRACK_FIELDS = ['title', 'artist', 'album', 'spotify_id', 'album_art_url', 'preview_url', 'duration_ms', 'popularity']
+    
+    @classmethod
+    def find_track(cls, data: Dict[str, Any]) -> Optional[Track]:
+        """
+        The catalog track resolve_track would use for a song, None if it would create one
+        """
+        spotify_id = data.get('spotify_id') or None
+        if spotify_id:
+            return Track.objects.filter(spotify_id=spotify_id).first()
+        return Track.objects.filter(
+            spotify_id=None,
+            title=data['title'],
+            artist=data['artist'],
+            album=data.get('album') or ''
+        ).first()
+    
+    @classmethod
+    def resolve_track(cls, data: Dict[str, Any]) -> Track:
+        """
+        Find or create the catalog track for a song. Songs with a Spotify ID are
+        matched on it, others on their title, artist and album.
+        """
+        spotify_id = data.get('spotify_id') or None
+        defaults = {
+            field: data.get(field) for field in cls.TRACK_FIELDS
+            if field not in ('spotify_id', 'title', 'artist', 'album')
+        }
+        
+        if spotify_id:
+            track, _ = Track.objects.get_or_create(
+                spotify_id=spotify_id,
+                defaults={
+                    'title': data['title'],
+                    'artist': data['artist'],
+                    'album': data.get('album') or '',
+                    **defaults
+                }
+            )
+        else:
+            track, _ = Track.objects.get_or_create(
+                spotify_id=None,
+                title=data['title'],
+                artist=data['artist'],
+                album=data.get('album') or '',
+                defaults=defaults
+            )
+        return track
+    
+    @classmethod
+    def resolve_tracks(cls, songs: List[Dict[str, Any]]) -> List[int]:
+        """
+        Batch version of resolve_track for imports: the track id of every song,
+        found or created with a few bulk queries. Songs without a Spotify ID reuse
+        a catalog track with the same title and artist, preferring the same album.
+        """
+        found = cls._find_tracks(songs)
+        missing = {}
+        for song in songs:
+            if cls._match_track(song, *found) is None:
+                key = song.get('spotify_id') or (song['title'], song['artist'], song.get('album') or '')
+                missing[key] = Track(
+                    spotify_id=song.get('spotify_id') or None,
+                    title=song['title'],
+                    artist=song['artist'],
+                    album=song.get('album') or ''
+                )
+        
+        if missing:
+            # A concurrent import may have created some of them meanwhile
+            Track.objects.bulk_create(missing.values(), ignore_conflicts=True)
+            found = cls._find_tracks(songs)
+        return [cls._match_track(song, *found) for song in songs]
+    
+    @staticmethod
+    def _find_tracks(songs: List[Dict[str, Any]]):
+        spotify_ids = {song['spotify_id'] for song in songs if song.get('spotify_id')}
+        by_spotify_id = dict(
+            Track.objects.filter(spotify_id__in=spotify_ids).values_list('spotify_id', 'id')
+        ) if spotify_ids else {}
+        
+        named = [song for song in songs if not song.get('spotify_id')]
+        by_album, by_name = {}, {}
+        if named:
+            candidates = Track.objects.filter(
+                title__in={song['title'] for song in named},
+                artist__in={song['artist'] for song in named}
+            ).order_by(F('spotify_id').asc(nulls_last=True), 'id').values_list('id', 'title', 'artist', 'album')
+            for track_id, title, artist, album in candidates:
+                by_album.setdefault((title, artist, album), track_id)
+                by_name.setdefault((title, artist), track_id)
+        return by_spotify_id, by_album, by_name
+    
+    @staticmethod
+    def _match_track(song: Dict[str, Any], by_spotify_id: Dict, by_album: Dict, by_name: Dict) -> Optional[int]:
+        if song.get('spotify_id'):
+            return by_spotify_id.get(song['spotify_id'])
+        return (
+            by_album.get((song['title'], song['artist'], song.get('album') or '')) or
+            by_name.get((song['title'], song['artist']))
+        )
+    
+    @classmethod
+    def get_spotify_track(cls, spotify_id: str) -> Optional[Track]:
+        """
+        Get a track by Spotify ID, only calling the Spotify API for songs
+        that are not in the local catalog yet
+        """
+        track = Track.objects.filter(spotify_id=spotify_id).first()
+        if track:
+            return track
+        
+        song_data = SpotifyService().get_song_details(spotify_id)
+        if not song_data:
+            return None
+        
+        return cls.resolve_track({
+            'spotify_id': song_data['spotify_id'],
+            'title': song_data['title'],
+            'artist': song_data['artist'],
+            'album': song_data['album'],
+            'album_art_url': song_data['album_art'],
+            'preview_url': song_data['preview_url'],
+            'duration_ms': song_data['duration_ms'],
+            'popularity': song_data['popularity']
+        })
+
 class SocialFeedService:
     """
     Service for handling social feed and user discovery based on music taste
     """
     
     @staticmethod
-    def elo_to_rating_scale(elo_score, min_elo=800, max_elo=2000):
+    def elo_to_rating_scale(elo_score):
         """
-        Convert ELO score to 1-10 scale for display
-        ELO 800 → 1.0, ELO 1200 → 5.0, ELO 2000+ → 10.0
+        Convert ELO score to 1-10 scale for display.
+        Querysets should prefer SongLog.objects.with_rating() so this runs in the database.
         """
-        if elo_score <= min_elo:
-            return 1.0
-        elif elo_score >= max_elo:
-            return 10.0
-        else:
-            # Linear mapping: 800 → 1.0, 2000 → 10.0
-            normalized = (elo_score - min_elo) / (max_elo - min_elo)
-            return round(1.0 + (normalized * 9.0), 1)
+        return elo_to_rating(elo_score)
     
     @classmethod
     def calculate_taste_similarity(cls, user1: User, user2: User) -> float:
@@ -215,8 +351,8 @@ class SocialFeedService:
                 total_weight += 0.2
         
         # Compare actual logged songs (weight: 0.1)
-        user1_songs = set(SongLog.objects.filter(user=user1).values_list('artist', flat=True))
-        user2_songs = set(SongLog.objects.filter(user=user2).values_list('artist', flat=True))
+        user1_songs = set(SongLog.objects.filter(user=user1).values_list('track__artist', flat=True))
+        user2_songs = set(SongLog.objects.filter(user=user2).values_list('track__artist', flat=True))
         if user1_songs and user2_songs:
             song_overlap = len(user1_songs & user2_songs)
             song_total = len(user1_songs | user2_songs)
@@ -232,6 +368,7 @@ class SocialFeedService:
         return 0.0
     
     @classmethod
+    @memoize(scope=GLOBAL)
     def get_similar_users(cls, user: User, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Get users with similar music taste
@@ -255,59 +392,98 @@ class SocialFeedService:
         # Return top users with their similarity scores
         return user_similarities[:limit]
     
+    # Fields of a feed item and of a discovery card's user and recent songs, with the
+    # columns each one reads, so a FieldSelection can leave the others unfetched
+    FEED_USER_COLUMNS = {
+        'id': ['user__id'],
+        'username': ['user__username'],
+        'favorite_genres': ['user__favorite_genres'],
+        'favorite_artists': ['user__favorite_artists'],
+    }
+    FEED_ITEM_COLUMNS = {
+        'id': ['id'],
+        'song_title': ['track__title'],
+        'artist': ['track__artist'],
+        'album': ['track__album'],
+        'note': ['note'],
+        'date': ['date'],
+        'created_at': ['created_at'],
+        'album_art_url': ['track__album_art_url'],
+        'elo_rating': ['elo_rating'],
+        # Annotated by with_rating()
+        'rating': [],
+        'user': FEED_USER_COLUMNS,
+        'similarity_score': [],
+        'taste_match': [],
+    }
+    RECENT_SONG_COLUMNS = {
+        'title': ['track__title'],
+        'artist': ['track__artist'],
+        'album': ['track__album'],
+        'album_art_url': ['track__album_art_url'],
+        'date': ['date'],
+        'rating': [],
+    }
+    
+    USER_GETTERS = {
+        'id': lambda user: user.id,
+        'username': lambda user: user.username,
+        'favorite_genres': lambda user: user.favorite_genres,
+        'favorite_artists': lambda user: user.favorite_artists[:3],  # Show first 3
+    }
+    RECENT_SONG_GETTERS = {
+        'title': lambda log: log.track.title,
+        'artist': lambda log: log.track.artist,
+        'album': lambda log: log.track.album,
+        'album_art_url': lambda log: log.track.album_art_url,
+        'date': lambda log: log.date,
+        'rating': lambda log: log.rating,  # 1-10 scale, computed by the database
+    }
+    
     @classmethod
-    def get_social_feed(cls, user: User, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+    def get_social_feed(cls, user: User, page: int = 1, page_size: int = 20,
+                        selection: FieldSelection = FieldSelection()) -> Dict[str, Any]:
         """
-        Get a social feed of song logs from users with similar taste
+        Get a social feed of song logs from users with similar taste, with the
+        feed item fields in `selection`
         """
         # Get similar users
         similar_users = cls.get_similar_users(user, limit=20)
         
         if not similar_users:
             # If no similar users, get recent logs from all users
-            recent_logs = SongLog.objects.exclude(user=user).order_by('-created_at')
+            recent_logs = SongLog.objects.exclude(user=user).with_rating().order_by('-created_at')
         else:
             # Get logs from similar users
             similar_user_ids = [u['user'].id for u in similar_users]
             recent_logs = SongLog.objects.filter(
                 user_id__in=similar_user_ids
-            ).order_by('-created_at')
+            ).with_rating().order_by('-created_at')
         
         # Paginate results
         start = (page - 1) * page_size
         end = start + page_size
-        paginated_logs = recent_logs[start:end]
-        
-        # Prepare feed items with user info and similarity scores
-        feed_items = []
-        for log in paginated_logs:
-            # Find similarity score for this user
-            similarity_score = 0.0
-            for similar_user in similar_users:
-                if similar_user['user'].id == log.user.id:
-                    similarity_score = similar_user['similarity_score']
-                    break
-            
-            feed_items.append({
-                'id': log.id,
-                'song_title': log.song_title,
-                'artist': log.artist,
-                'album': log.album,
-                'note': log.note,
-                'date': log.date,
-                'created_at': log.created_at,
-                'album_art_url': log.album_art_url,
-                'elo_rating': log.elo_rating,
-                'rating': cls.elo_to_rating_scale(log.elo_rating),  # 1-10 scale
-                'user': {
-                    'id': log.user.id,
-                    'username': log.user.username,
-                    'favorite_genres': log.user.favorite_genres,
-                    'favorite_artists': log.user.favorite_artists[:3],  # Show first 3
-                },
-                'similarity_score': similarity_score,
-                'taste_match': cls._get_taste_match_label(similarity_score)
-            })
+        columns = selection.lookups(cls.FEED_ITEM_COLUMNS, always=['user_id'])
+        paginated_logs = cls._only(recent_logs, columns)[start:end]
+        
+        similarity_scores = {u['user'].id: u['similarity_score'] for u in similar_users}
+        user_selection = selection.nested('user')
+        getters = {
+            'id': lambda log: log.id,
+            'song_title': lambda log: log.track.title,
+            'artist': lambda log: log.track.artist,
+            'album': lambda log: log.track.album,
+            'note': lambda log: log.note,
+            'date': lambda log: log.date,
+            'created_at': lambda log: log.created_at,
+            'album_art_url': lambda log: log.track.album_art_url,
+            'elo_rating': lambda log: log.elo_rating,
+            'rating': lambda log: log.rating,  # 1-10 scale, computed by the database
+            'user': lambda log: user_selection.build(cls.USER_GETTERS, log.user),
+            'similarity_score': lambda log: similarity_scores.get(log.user_id, 0.0),
+            'taste_match': lambda log: cls._get_taste_match_label(similarity_scores.get(log.user_id, 0.0)),
+        }
+        feed_items = [selection.build(getters, log) for log in paginated_logs]
         
         return {
             'feed_items': feed_items,
@@ -318,6 +494,17 @@ class SocialFeedService:
             'has_previous': page > 1
         }
     
+    @staticmethod
+    def _only(queryset, columns: List[str]):
+        """
+        Fetch only `columns`, joining the relations they go through
+        """
+        relations = list(dict.fromkeys(column.split('__')[0] for column in columns if '__' in column))
+        if relations:
+            # select_related() without arguments would join every relation
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
+    
     @classmethod
     def _get_taste_match_label(cls, similarity_score: float) -> str:
         """
@@ -335,40 +522,417 @@ class SocialFeedService:
             return "Different Taste"
     
     @classmethod
-    def get_user_discovery(cls, user: User, limit: int = 10) -> List[Dict[str, Any]]:
+    @memoize(scope=GLOBAL)
+    def get_user_discovery(cls, user: User, limit: int = 10,
+                           selection: FieldSelection = FieldSelection()) -> List[Dict[str, Any]]:
         """
-        Get users to discover based on music taste
+        Get users to discover based on music taste, with the card fields in `selection`
         """
         similar_users = cls.get_similar_users(user, limit=limit)
         
-        discovery_users = []
-        for similar_user in similar_users:
-            other_user = similar_user['user']
-            
-            # Get their recent song logs
-            recent_logs = SongLog.objects.filter(user=other_user).order_by('-created_at')[:3]
-            
-            discovery_users.append({
-                'user': {
-                    'id': other_user.id,
-                    'username': other_user.username,
-                    'favorite_genres': other_user.favorite_genres,
-                    'favorite_artists': other_user.favorite_artists[:3],
-                },
-                'similarity_score': similar_user['similarity_score'],
-                'taste_match': cls._get_taste_match_label(similar_user['similarity_score']),
-                'recent_songs': [
-                    {
-                        'title': log.song_title,
-                        'artist': log.artist,
-                        'album': log.album,
-                        'album_art_url': log.album_art_url,
-                        'date': log.date,
-                        'rating': cls.elo_to_rating_scale(log.elo_rating)  # 1-10 scale
-                    }
-                    for log in recent_logs
-                ],
-                'total_songs': SongLog.objects.filter(user=other_user).count()
+        user_selection = selection.nested('user')
+        song_selection = selection.nested('recent_songs')
+        song_columns = song_selection.lookups(cls.RECENT_SONG_COLUMNS, always=['id'])
+        getters = {
+            'user': lambda similar_user: user_selection.build(cls.USER_GETTERS, similar_user['user']),
+            'similarity_score': lambda similar_user: similar_user['similarity_score'],
+            'taste_match': lambda similar_user: cls._get_taste_match_label(similar_user['similarity_score']),
+            # Their recent song logs
+            'recent_songs': lambda similar_user: [
+                song_selection.build(cls.RECENT_SONG_GETTERS, log)
+                for log in cls._only(
+                    SongLog.objects.filter(user=similar_user['user']).with_rating(), song_columns
+                ).order_by('-created_at')[:3]
+            ],
+            'total_songs': lambda similar_user: SongLog.objects.filter(user=similar_user['user']).count(),
+        }
+        
+        return [selection.build(getters, similar_user) for similar_user in similar_users]
+
+
+class TrendingService:
+    """
+    Service for trending tracks and artists, computed from hourly TrendingBucket
+    counters. A bucket's count decays with its age so recent logs weigh more
+    than older ones in the same window.
+    """
+    
+    # Window: (length in hours, half-life of a logged song's weight in hours)
+    WINDOWS = {
+        '24h': (24, 6),
+        '7d': (24 * 7, 48),
+    }
+    MAX_LIMIT = 50
+    # Top lists are kept in memory for this long, per process
+    CACHE_SECONDS = 300
+    # Buckets written per transaction when counting bulk inserted logs
+    BATCH_SIZE = 1000
+    
+    _cache = {}
+    _cache_lock = threading.Lock()
+    
+    @staticmethod
+    def bucket_hour(moment):
+        return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    
+    @classmethod
+    def song_logged(cls, song_log: SongLog) -> None:
+        cls._count(song_log.track_id, song_log.track.artist, song_log.created_at, 1)
+    
+    @classmethod
+    def song_unlogged(cls, song_log: SongLog) -> None:
+        cls._count(song_log.track_id, song_log.track.artist, song_log.created_at, -1)
+    
+    @classmethod
+    def track_changed(cls, song_log: SongLog, old_track_id: int) -> None:
+        """
+        Move a song log whose metadata now points at another track
+        """
+        old_artist = Track.objects.filter(pk=old_track_id).values_list('artist', flat=True).first()
+        with transaction.atomic():
+            if old_artist is not None:
+                cls._count(old_track_id, old_artist, song_log.created_at, -1)
+            cls._count(song_log.track_id, song_log.track.artist, song_log.created_at, 1)
+    
+    @classmethod
+    def logs_imported(cls, user: User, since) -> None:
+        """
+        Count the user's song logs created since `since` by a bulk insert, which
+        sends no per-row signals
+        """
+        logs = SongLog.objects.filter(user=user, created_at__gte=since).order_by()
+        cls._add_counts(cls._totals(logs))
+    
+    @classmethod
+    def get_trending(cls, kind: str, window: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Get the top tracks or artists of the window, highest decayed score first
+        """
+        cache_key = (kind, window)
+        with cls._cache_lock:
+            cached = cls._cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1][:limit]
+        
+        results = cls._compute(kind, window)
+        with cls._cache_lock:
+            cls._cache[cache_key] = (time.monotonic() + cls.CACHE_SECONDS, results)
+        return results[:limit]
+    
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._cache_lock:
+            cls._cache.clear()
+    
+    @classmethod
+    def compact(cls) -> int:
+        """
+        Delete buckets that fell out of the longest window, and emptied ones
+        """
+        longest = max(hours for hours, _ in cls.WINDOWS.values())
+        since = cls.bucket_hour(timezone.now()) - timedelta(hours=longest - 1)
+        deleted, _ = TrendingBucket.objects.filter(Q(hour__lt=since) | Q(count=0)).delete()
+        return deleted
+    
+    @classmethod
+    def rebuild(cls) -> int:
+        """
+        Recount every bucket of the longest window from the song logs, for logs
+        written without signals such as bulk inserts
+        """
+        longest = max(hours for hours, _ in cls.WINDOWS.values())
+        since = cls.bucket_hour(timezone.now()) - timedelta(hours=longest - 1)
+        recent_logs = SongLog.objects.filter(created_at__gte=since).order_by()
+        
+        with transaction.atomic():
+            TrendingBucket.objects.all().delete()
+            created = len(TrendingBucket.objects.bulk_create(
+                (TrendingBucket(kind=kind, key=key, hour=hour, count=count)
+                 for (kind, key, hour), count in cls._totals(recent_logs).items()),
+                batch_size=cls.BATCH_SIZE
+            ))
+        cls.clear_cache()
+        return created
+    
+    @staticmethod
+    def _totals(logs) -> Dict[tuple, int]:
+        """
+        Count song logs per bucket, as {(kind, key, hour): count}
+        """
+        totals = {}
+        for kind, key in ((TrendingBucket.KIND_TRACK, Cast('track_id', CharField())),
+                          (TrendingBucket.KIND_ARTIST, F('track__artist'))):
+            rows = logs.annotate(key=key, hour=TruncHour('created_at', tzinfo=dt_timezone.utc)).values(
+                'key', 'hour'
+            ).annotate(count=Count('id')).values_list('key', 'hour', 'count')
+            for key, hour, count in rows.iterator():
+                totals[(kind, key, hour)] = count
+        return totals
+    
+    @classmethod
+    def _count(cls, track_id: int, artist: str, created_at, delta: int) -> None:
+        hour = cls.bucket_hour(created_at)
+        for kind, key in ((TrendingBucket.KIND_TRACK, str(track_id)), (TrendingBucket.KIND_ARTIST, artist)):
+            cls._increment(kind, key, hour, delta)
+    
+    @classmethod
+    def _increment(cls, kind: str, key: str, hour, delta: int) -> None:
+        buckets = TrendingBucket.objects.filter(kind=kind, key=key, hour=hour)
+        if delta < 0:
+            buckets.filter(count__gte=-delta).update(count=F('count') + delta)
+            return
+        if buckets.update(count=F('count') + delta):
+            return
+        try:
+            with transaction.atomic():
+                TrendingBucket.objects.create(kind=kind, key=key, hour=hour, count=delta)
+        except IntegrityError:
+            # Another request created the bucket first
+            buckets.update(count=F('count') + delta)
+    
+    @classmethod
+    def _add_counts(cls, totals: Dict[tuple, int]) -> None:
+        """
+        Add {(kind, key, hour): count} to the buckets, a batch per transaction
+        with the existing buckets locked and the missing ones created in bulk
+        """
+        totals = list(totals.items())
+        for start in range(0, len(totals), cls.BATCH_SIZE):
+            batch = dict(totals[start:start + cls.BATCH_SIZE])
+            with transaction.atomic():
+                existing = {
+                    (bucket.kind, bucket.key, bucket.hour): bucket
+                    for bucket in TrendingBucket.objects.select_for_update().filter(
+                        key__in={key for _, key, _ in batch},
+                        hour__in={hour for _, _, hour in batch}
+                    ).order_by('id')
+                }
+                updated, missing = [], []
+                for (kind, key, hour), count in batch.items():
+                    bucket = existing.get((kind, key, hour))
+                    if bucket is None:
+                        missing.append(TrendingBucket(kind=kind, key=key, hour=hour, count=count))
+                    else:
+                        bucket.count += count
+                        updated.append(bucket)
+                TrendingBucket.objects.bulk_update(updated, ['count'])
+                try:
+                    with transaction.atomic():
+                        TrendingBucket.objects.bulk_create(missing)
+                except IntegrityError:
+                    # A concurrent write created some of them first
+                    for bucket in missing:
+                        cls._increment(bucket.kind, bucket.key, bucket.hour, bucket.count)
+    
+    @classmethod
+    def _compute(cls, kind: str, window: str) -> List[Dict[str, Any]]:
+        hours, half_life = cls.WINDOWS[window]
+        current_hour = cls.bucket_hour(timezone.now())
+        buckets = TrendingBucket.objects.filter(
+            kind=kind,
+            hour__gte=current_hour - timedelta(hours=hours - 1),
+            count__gt=0
+        ).values_list('key', 'hour', 'count')
+        
+        scores = defaultdict(float)
+        counts = defaultdict(int)
+        for key, hour, count in buckets.iterator():
+            age = (current_hour - hour).total_seconds() / 3600
+            scores[key] += count * 0.5 ** (age / half_life)
+            counts[key] += count
+        
+        top = heapq.nlargest(cls.MAX_LIMIT, scores, key=lambda key: (scores[key], counts[key]))
+        
+        if kind == TrendingBucket.KIND_ARTIST:
+            return [
+                {'artist': key, 'log_count': counts[key], 'score': round(scores[key], 3)}
+                for key in top
+            ]
+        
+        tracks = Track.objects.in_bulk([int(key) for key in top])
+        results = []
+        for key in top:
+            track = tracks.get(int(key))
+            if track is None:
+                continue
+            results.append({
+                'track_id': track.id,
+                'title': track.title,
+                'artist': track.artist,
+                'album': track.album,
+                'spotify_id': track.spotify_id,
+                'album_art_url': track.album_art_url,
+                'log_count': counts[key],
+                'score': round(scores[key], 3)
             })
+        return results
+
+
+class DashboardService:
+    """
+    Service for the song log summary behind home_status and setup_guide. The
+    summary is read in one query and memoized per user, so it is reused until
+    the user's data changes.
+    """
+    
+    RECENT_LOGS = 5
+    
+    @classmethod
+    @memoize(scope=USER)
+    def get_summary(cls, user: User) -> Dict[str, Any]:
+        """
+        The user's song log count and most recent song logs, as
+        {'total_songs', 'has_logged_songs', 'recent_logs'}
+        """
+        # Imported here, the serializers module imports this one
+        from .serializers import SongLogFastSerializer
         
-        return discovery_users 
\ No newline at end of file
+        # The window count is over all of the user's logs, before the LIMIT applies
+        recent_logs = SongLog.objects.filter(user=user).with_rating().annotate(
+            total_songs=Window(Count('id'))
+        ).order_by('-date')[:cls.RECENT_LOGS]
+        rows = list(SongLogFastSerializer.project(recent_logs, 'total_songs'))
+        total_songs = rows[0]['total_songs'] if rows else 0
+        return {
+            'total_songs': total_songs,
+            'has_logged_songs': total_songs > 0,
+            'recent_logs': SongLogFastSerializer.serialize_rows(rows),
+        }
+
+
+class ImportService:
+    """
+    Service for bulk imports of listening history files. Files are read as a
+    stream, tracks are resolved against the local catalog and the new song logs
+    are inserted a chunk at a time, skipping songs already logged that day.
+    """
+    
+    CHUNK_SIZE = 1000
+    # Plays shorter than this are skips, not listens
+    MIN_MS_PLAYED = 30000
+    
+    @staticmethod
+    def detect_format(filename: str) -> str:
+        extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+        if extension not in dict(ImportJob.FORMAT_CHOICES):
+            raise ValueError('Only .json, .ndjson and .csv files can be imported')
+        return extension
+    
+    @classmethod
+    def create_job(cls, user: User, uploaded_file) -> ImportJob:
+        job = ImportJob(user=user, file_format=cls.detect_format(uploaded_file.name))
+        job.file.save(os.path.basename(uploaded_file.name), uploaded_file, save=False)
+        job.save()
+        return job
+    
+    @classmethod
+    def start(cls, job: ImportJob) -> None:
+        """
+        Run the import in a background thread once the job is committed
+        """
+        def launch():
+            threading.Thread(target=cls._run_in_background, args=(job.id,), daemon=True).start()
+        transaction.on_commit(launch)
+    
+    @classmethod
+    def _run_in_background(cls, job_id: int) -> None:
+        from django.db import connection
+        try:
+            cls.run(ImportJob.objects.select_related('user').get(id=job_id))
+        except Exception:
+            logger.exception("Import job %s crashed", job_id)
+        finally:
+            connection.close()
+    
+    @classmethod
+    def run(cls, job: ImportJob, source=None, progress=None) -> ImportJob:
+        """
+        Import the job's file, or `source` (a binary stream) when given. Counters
+        are saved after every chunk and `progress(job)` is called if provided.
+        """
+        from .signals import song_logs_imported
+        
+        job.status = ImportJob.STATUS_RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+        
+        seen = set()
+        track_ids = set()
+        try:
+            stream = source if source is not None else job.file.open('rb')
+            try:
+                chunk = []
+                for record in iter_history_records(stream, job.file_format):
+                    job.rows_read += 1
+                    song = normalize_record(record)
+                    if song is None or (song['ms_played'] is not None and song['ms_played'] < cls.MIN_MS_PLAYED):
+                        job.skipped += 1
+                        continue
+                    chunk.append(song)
+                    if len(chunk) >= cls.CHUNK_SIZE:
+                        track_ids.update(cls._import_chunk(job, chunk, seen))
+                        chunk = []
+                        cls._save_progress(job, progress)
+                if chunk:
+                    track_ids.update(cls._import_chunk(job, chunk, seen))
+            finally:
+                if source is None:
+                    stream.close()
+            job.status = ImportJob.STATUS_COMPLETED
+        except (ValueError, UnicodeDecodeError) as e:
+            job.status = ImportJob.STATUS_FAILED
+            job.error = str(e)
+        except Exception as e:
+            logger.exception("Import job %s failed", job.id)
+            job.status = ImportJob.STATUS_FAILED
+            job.error = f"Import failed: {e}"
+        
+        job.finished_at = timezone.now()
+        cls._save_progress(job, progress, extra_fields=['status', 'error', 'finished_at'])
+        if job.file:
+            job.file.delete(save=False)
+            job.save(update_fields=['file'])
+        
+        if job.imported:
+            # Chunks are committed as they go, so even a failed import may have added songs
+            song_logs_imported.send(sender=ImportJob, user=job.user, track_ids=track_ids, since=job.started_at)
+        return job
+    
+    @classmethod
+    def _save_progress(cls, job: ImportJob, progress=None, extra_fields=()) -> None:
+        job.save(update_fields=['rows_read', 'imported', 'duplicates', 'skipped', *extra_fields])
+        if progress:
+            progress(job)
+    
+    @classmethod
+    def _import_chunk(cls, job: ImportJob, chunk: List[Dict[str, Any]], seen: set) -> set:
+        """
+        Insert the chunk's songs that the user hasn't logged on that day yet,
+        returning the ids of the tracks that got new logs
+        """
+        chunk_track_ids = CatalogService.resolve_tracks(chunk)
+        
+        keys = []
+        for song, track_id in zip(chunk, chunk_track_ids):
+            key = (track_id, song['date'])
+            if key in seen:
+                job.duplicates += 1
+                continue
+            seen.add(key)
+            keys.append(key)
+        
+        existing = set(SongLog.objects.filter(
+            user=job.user,
+            track_id__in={track_id for track_id, _ in keys},
+            date__in={played_on for _, played_on in keys}
+        ).values_list('track_id', 'date'))
+        new_keys = [key for key in keys if key not in existing]
+        job.duplicates += len(keys) - len(new_keys)
+        
+        with transaction.atomic():
+            SongLog.objects.bulk_create(
+                [SongLog(user=job.user, track_id=track_id, date=played_on) for track_id, played_on in new_keys],
+                batch_size=cls.CHUNK_SIZE
+            )
+        job.imported += len(new_keys)
+        return {track_id for track_id, _ in new_keys}
@@ -0,0 +1,40 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver, Signal
+from user_management.services import DataVersionService
+from .models import SongLog
+from .services import TrendingService
+
+# Sent after ImportService bulk inserted song logs, which skips the per-row signals.
+# Arguments: user, track_ids (the tracks that got new logs), since (when the
+# import started, every new log was created after it)
+song_logs_imported = Signal()
+
+
+@receiver(pre_save, sender=SongLog)
+def song_log_saving(sender, instance, update_fields=None, **kwargs):
+    # Remember the stored track so counters can follow a metadata edit
+    if instance.pk is not None and (update_fields is None or 'track' in update_fields):
+        instance._stored_track_id = SongLog.objects.filter(pk=instance.pk).values_list('track_id', flat=True).first()
+
+
+@receiver(post_save, sender=SongLog)
+def song_log_saved(sender, instance, created, **kwargs):
+    if created:
+        TrendingService.song_logged(instance)
+    else:
+        stored_track_id = getattr(instance, '_stored_track_id', None)
+        if stored_track_id is not None and stored_track_id != instance.track_id:
+            TrendingService.track_changed(instance, stored_track_id)
+    DataVersionService.bump(instance.user_id)
+
+
+@receiver(post_delete, sender=SongLog)
+def song_log_deleted(sender, instance, **kwargs):
+    TrendingService.song_unlogged(instance)
+    DataVersionService.bump(instance.user_id)
+
+
+@receiver(song_logs_imported)
+def song_logs_bulk_imported(sender, user, since, **kwargs):
+    TrendingService.logs_imported(user, since)
+    DataVersionService.bump(user.pk)
@@ -1,3 +1,696 @@
-from django.test import TestCase
+import io
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from core.memoize import get_cache
+from core.renderers import FastJSONRenderer
+from core.testing import AggregateConsistencyMixin, EndpointBudgetMixin, QueryPlanMixin, create_rated_users, create_user_with_songs
+from music_ratings.services import RatingService
+from user_management.authentication import CachedTokenAuthentication
+from user_management.models import User
+from .importers import iter_json_array
+from .models import ImportJob, SongLog, Track, TrendingBucket
+from .serializers import SongLogSerializer, SongLogFastSerializer
+from .services import ImportService, TrendingService
+from .views import SongLogViewSet
 
-# Create your tests here.
+
+class SongLogQueryPlanTests(QueryPlanMixin, TestCase):
+    """
+    Every song log endpoint reads SongLog and Rating through an index
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user_with_songs(f'user{i}', song_count=8) for i in range(3)]
+        for user in cls.users:
+            song_ids = list(user.song_logs.order_by('id').values_list('id', flat=True))
+            RatingService.create_rating(user, song_ids[0], song_ids[1], song_ids[0])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def assertEndpointUsesIndexes(self, url):
+        with self.assertUsesIndexes():
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_list(self):
+        self.assertEndpointUsesIndexes('/api/song-logs/')
+
+    def test_list_filtered_by_rating(self):
+        self.assertEndpointUsesIndexes('/api/song-logs/?min_rating=5&max_rating=8')
+
+    # Memoized results would skip the queries being checked
+    @override_settings(MEMOIZE_ENABLED=False)
+    def test_home_status(self):
+        self.assertEndpointUsesIndexes('/api/song-logs/home_status/')
+
+    @override_settings(MEMOIZE_ENABLED=False)
+    def test_setup_guide(self):
+        self.assertEndpointUsesIndexes('/api/song-logs/setup_guide/')
+
+    def test_social_feed(self):
+        self.assertEndpointUsesIndexes('/api/song-logs/social_feed/')
+
+    def test_user_discovery(self):
+        self.assertEndpointUsesIndexes('/api/song-logs/user_discovery/')
+
+    def test_similar_users(self):
+        self.assertEndpointUsesIndexes('/api/song-logs/similar_users/')
+
+    def test_user_profile(self):
+        self.assertEndpointUsesIndexes(f'/api/song-logs/user_profile/?user_id={self.users[1].id}')
+
+    def test_trending(self):
+        self.assertEndpointUsesIndexes('/api/song-logs/trending/?kind=artists&window=7d')
+
+
+class SongLogEndpointBudgetTests(EndpointBudgetMixin, TestCase):
+    """
+    Query count and latency budgets of the song log endpoints
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_rated_users(user_count=10, song_count=30, rating_count=40)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def get(self, url):
+        return lambda i: self.client.get(url)
+
+    # Taste similarity runs two queries per other user
+    def test_social_feed(self):
+        self.assertEndpointBudget('social_feed', 22, self.get('/api/song-logs/social_feed/'))
+
+    def test_user_discovery(self):
+        self.assertEndpointBudget('user_discovery', 37, self.get('/api/song-logs/user_discovery/'))
+
+    def test_similar_users(self):
+        self.assertEndpointBudget('similar_users', 19, self.get('/api/song-logs/similar_users/'))
+
+    @override_settings(MEMOIZE_ENABLED=False)
+    def test_home_status(self):
+        self.assertEndpointBudget('home_status', 1, self.get('/api/song-logs/home_status/'))
+
+    @override_settings(MEMOIZE_ENABLED=False)
+    def test_setup_guide(self):
+        self.assertEndpointBudget('setup_guide', 1, self.get('/api/song-logs/setup_guide/'))
+
+    def test_user_profile(self):
+        # Includes reading the profile user's data version for the ETag
+        self.assertEndpointBudget(
+            'user_profile', 4, self.get(f'/api/song-logs/user_profile/?user_id={self.users[1].id}')
+        )
+
+
+class SongLogUpdateTests(TestCase):
+    """
+    Metadata edits point the log at the matching catalog track, and are
+    rejected when that track would not take them
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user_with_songs('user0', song_count=2)
+        cls.other = create_user_with_songs('user1', song_count=2)
+        cls.spotify_track = Track.objects.create(
+            title='Spotify Song', artist='Spotify Artist', album='Album', spotify_id='spotify-1', popularity=50
+        )
+        cls.spotify_log = SongLog.objects.create(user=cls.user, track=cls.spotify_track, date=date(2024, 3, 1))
+        cls.named_log = cls.user.song_logs.get(track__title='Song 0')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def patch(self, song_log, data):
+        return self.client.patch(f'/api/song-logs/{song_log.id}/', data, format='json')
+
+    def test_spotify_track(self):
+        response = self.patch(self.spotify_log, {'song_title': 'Renamed', 'popularity': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'song_title', 'popularity'})
+        self.assertEqual(Track.objects.get(id=self.spotify_track.id).title, 'Spotify Song')
+
+        # Unchanged values and the log's own fields are fine
+        response = self.patch(self.spotify_log, {'song_title': 'Spotify Song', 'album_art_url': '', 'note': 'Great'})
+        self.assertEqual(response.status_code, 200, response.json())
+        self.assertEqual(response.json()['note'], 'Great')
+
+        # Another Spotify ID is another song
+        response = self.patch(self.spotify_log, {'spotify_id': 'spotify-2'})
+        self.assertEqual(response.status_code, 200, response.json())
+        self.spotify_log.refresh_from_db()
+        self.assertEqual(self.spotify_log.track.spotify_id, 'spotify-2')
+        self.assertEqual(self.spotify_log.track.title, 'Spotify Song')
+
+    def test_track_without_spotify_id(self):
+        shared_track = self.named_log.track
+        response = self.patch(self.named_log, {'song_title': 'Renamed', 'album_art_url': 'https://example.com/art.png'})
+        self.assertEqual(response.status_code, 200, response.json())
+        self.assertEqual(response.json()['song_title'], 'Renamed')
+        self.assertEqual(response.json()['album_art_url'], 'https://example.com/art.png')
+        # The other user's log of the song is untouched
+        self.assertEqual(self.other.song_logs.get(track=shared_track).track.title, 'Song 0')
+
+        # Details of an existing track can't be changed through one log
+        response = self.patch(self.named_log, {'album_art_url': 'https://example.com/other.png', 'duration_ms': 1000})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'album_art_url', 'duration_ms'})
+
+        # Back to the shared track
+        response = self.patch(self.named_log, {'song_title': 'Song 0'})
+        self.assertEqual(response.status_code, 200, response.json())
+        self.assertEqual(SongLog.objects.get(id=self.named_log.id).track_id, shared_track.id)
+
+
+class TrendingTests(TestCase):
+    """
+    Trending buckets count every log, however it was written, and recent logs weigh more
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user_with_songs('user0', song_count=6)
+
+    def setUp(self):
+        TrendingService.clear_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def buckets(self):
+        return {
+            (bucket.kind, bucket.key, bucket.hour): bucket.count
+            for bucket in TrendingBucket.objects.filter(count__gt=0)
+        }
+
+    def assertMatchesRebuild(self):
+        buckets = self.buckets()
+        TrendingService.rebuild()
+        self.assertEqual(buckets, self.buckets())
+
+    def test_counts(self):
+        song_log = self.user.song_logs.order_by('id').first()
+        track_buckets = TrendingBucket.objects.filter(kind=TrendingBucket.KIND_TRACK, key=str(song_log.track_id))
+        self.assertEqual(sum(track_buckets.values_list('count', flat=True)), 1)
+        self.assertMatchesRebuild()
+
+        self.user.song_logs.order_by('id').last().delete()
+        self.assertMatchesRebuild()
+
+    def test_track_moves(self):
+        song_log = self.user.song_logs.order_by('id').first()
+        response = self.client.patch(
+            f'/api/song-logs/{song_log.id}/', {'song_title': 'Moved', 'artist': 'New Artist'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.json())
+        self.assertMatchesRebuild()
+        self.assertEqual(TrendingService.get_trending(TrendingBucket.KIND_ARTIST, '24h')[0]['log_count'], 2)
+
+    def test_imported_logs(self):
+        history = [
+            {'song_title': f'Imported {i % 3}', 'artist': 'Import Artist', 'date': f'2024-05-0{i + 1}'}
+            for i in range(6)
+        ]
+        job = ImportJob.objects.create(user=self.user, file_format=ImportJob.FORMAT_JSON)
+        ImportService.run(job, source=io.BytesIO(json.dumps(history).encode()))
+        self.assertEqual(job.imported, 6)
+        self.assertMatchesRebuild()
+        top_artist = TrendingService.get_trending(TrendingBucket.KIND_ARTIST, '24h')[0]
+        self.assertEqual(top_artist, {'artist': 'Import Artist', 'log_count': 6, 'score': 6.0})
+
+    def test_decay(self):
+        TrendingBucket.objects.all().delete()
+        hour = TrendingService.bucket_hour(timezone.now())
+        for key, age, count in (('Now', 0, 2), ('Earlier', 6, 2), ('Yesterday', 30, 5), ('Last month', 24 * 30, 50)):
+            TrendingBucket.objects.create(kind=TrendingBucket.KIND_ARTIST, key=key, hour=hour - timedelta(hours=age), count=count)
+
+        # A log's weight halves every 6 hours in the 24h window, and every 48 hours in the 7d one
+        day = TrendingService.get_trending(TrendingBucket.KIND_ARTIST, '24h')
+        self.assertEqual([(artist['artist'], artist['score']) for artist in day], [('Now', 2.0), ('Earlier', 1.0)])
+        TrendingService.clear_cache()
+        week = TrendingService.get_trending(TrendingBucket.KIND_ARTIST, '7d')
+        self.assertEqual(
+            [(artist['artist'], artist['score']) for artist in week],
+            [('Yesterday', round(5 * 0.5 ** (30 / 48), 3)), ('Now', 2.0), ('Earlier', round(2 * 0.5 ** (6 / 48), 3))]
+        )
+
+        TrendingBucket.objects.filter(key='Now').update(count=0)
+        self.assertEqual(TrendingService.compact(), 2)
+        self.assertEqual(set(TrendingBucket.objects.values_list('key', flat=True)), {'Earlier', 'Yesterday'})
+
+
+class ImportServiceTests(AggregateConsistencyMixin, TestCase):
+    """
+    Listening history imports stream the file a chunk at a time and skip songs already logged that day
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_rated_users(2, 6, 8)[0]
+
+    def run_import(self, content, **kwargs):
+        if not isinstance(content, bytes):
+            content = json.dumps(content).encode()
+        job = ImportJob.objects.create(user=self.user, file_format=ImportJob.FORMAT_JSON)
+        return ImportService.run(job, source=io.BytesIO(content), **kwargs)
+
+    def test_invalid_files(self):
+        for content, error in (
+            (b'{"song_title": "Song"}', 'Expected a JSON array of listening history entries'),
+            (b'[{"song_title": "Song", "artist": "Artist", "date": "2024-05-01"}', 'Unexpected end of file, the JSON array is not closed'),
+            (b'[{"song_title": "Song", "artist": }]', 'Invalid JSON in listening history file'),
+            (b'[{"song_title": "\xff"}]', "codec can't decode byte 0xff"),
+        ):
+            with self.subTest(content=content):
+                job = self.run_import(content)
+                self.assertEqual((job.status, job.imported), (ImportJob.STATUS_FAILED, 0))
+                self.assertIn(error, job.error)
+
+    def test_read_boundaries(self):
+        history = [{'song_title': f'Song {i}', 'artist': 'Artist', 'ms_played': 10 ** i} for i in range(8)]
+        content = json.dumps(history, indent=2)
+        for read_size in (1, 2, 7, len(content)):
+            with self.subTest(read_size=read_size):
+                self.assertEqual(list(iter_json_array(io.StringIO(content), read_size=read_size)), history)
+
+    def test_chunks(self):
+        history = [
+            {'song_title': f'Imported {i}', 'artist': 'Import Artist', 'date': '2024-05-01', 'ms_played': 60000}
+            for i in range(5)
+        ]
+        history.insert(2, {'song_title': 'Skipped', 'artist': 'Import Artist', 'date': '2024-05-01', 'ms_played': 1000})
+        progress = []
+        with mock.patch.object(ImportService, 'CHUNK_SIZE', 2):
+            job = self.run_import(history, progress=lambda job: progress.append((job.rows_read, job.imported)))
+
+        self.assertEqual((job.status, job.rows_read, job.imported, job.skipped), (ImportJob.STATUS_COMPLETED, 6, 5, 1))
+        # Progress is saved after every full chunk, then once more when the job finishes
+        self.assertEqual(progress, [(2, 2), (5, 4), (6, 5)])
+        self.assertEqual(
+            sorted(self.user.song_logs.filter(track__artist='Import Artist').values_list('track__title', flat=True)),
+            [f'Imported {i}' for i in range(5)]
+        )
+
+    def test_duplicates(self):
+        logged = self.user.song_logs.select_related('track').order_by('id').first()
+        # Repeats are found in the same chunk as well as in earlier ones
+        for chunk_size in (1, 1000):
+            with self.subTest(chunk_size=chunk_size):
+                artist = f'Import Artist {chunk_size}'
+                history = [
+                    {'song_title': 'Imported', 'artist': artist, 'date': '2024-05-01'},
+                    {'song_title': logged.track.title, 'artist': logged.track.artist, 'date': logged.date.isoformat()},
+                    {'song_title': 'Imported', 'artist': artist, 'date': '2024-05-02'},
+                    {'song_title': 'Imported', 'artist': artist, 'date': '2024-05-01'},
+                ]
+                with mock.patch.object(ImportService, 'CHUNK_SIZE', chunk_size):
+                    job = self.run_import(history)
+                self.assertEqual((job.imported, job.duplicates), (2, 2))
+                self.assertEqual(self.user.song_logs.filter(track__artist=artist).count(), 2)
+
+                # Importing the same file again only finds duplicates
+                job = self.run_import(history)
+                self.assertEqual((job.imported, job.duplicates), (0, 4))
+
+    def test_side_effects(self):
+        shared = SongLog.objects.exclude(user=self.user).select_related('track').order_by('id').first().track
+        self.user.song_logs.filter(track=shared).delete()
+        data_version = User.objects.get(pk=self.user.pk).data_version
+        history = [
+            {'song_title': shared.title, 'artist': shared.artist, 'album': shared.album, 'date': '2024-05-01'},
+            {'song_title': 'Imported', 'artist': 'Import Artist', 'date': '2024-05-01'},
+        ]
+        with mock.patch.object(ImportService, 'CHUNK_SIZE', 1):
+            job = self.run_import(history)
+
+        self.assertEqual(job.imported, 2)
+        self.assertRatingStatsConsistent(self.user)
+        self.assertLeaderboardConsistent()
+        self.assertGreater(User.objects.get(pk=self.user.pk).data_version, data_version)
+
+        # Nothing new was imported, so nothing needs to be rebuilt
+        data_version = User.objects.get(pk=self.user.pk).data_version
+        self.run_import(history)
+        self.assertEqual(User.objects.get(pk=self.user.pk).data_version, data_version)
+
+
+class SongLogExportTests(TestCase):
+    """
+    Song log exports stream every log, and can be imported back
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_rated_users(1, 5, 4)[0]
+        track = Track.objects.create(title='Song, "quoted" é', artist='Artist', album='Album', spotify_id='spotify-1')
+        SongLog.objects.create(user=cls.user, track=track, date=date(2024, 2, 1), note='Line\nbreak')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, file_format):
+        response = self.client.get('/api/song-logs/export/', {'file_format': file_format})
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def logged_songs(self, user):
+        return sorted(user.song_logs.values_list('track__title', 'track__artist', 'track__album', 'track__spotify_id', 'date'))
+
+    def test_formats(self):
+        response, content = self.export('ndjson')
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(rows), self.user.song_logs.count())
+        self.assertEqual(set(rows[0]), set(SongLogViewSet.EXPORT_FIELDS))
+
+        response, content = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(content.decode().splitlines()[0], ','.join(SongLogViewSet.EXPORT_FIELDS))
+
+        response = self.client.get('/api/song-logs/export/', {'file_format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_round_trip(self):
+        for file_format in ('ndjson', 'csv'):
+            with self.subTest(file_format=file_format):
+                response, content = self.export(file_format)
+                filename = response['Content-Disposition'].split('filename=')[1].strip('"')
+                other = create_user_with_songs(f'importer-{file_format}', song_count=0)
+                job = ImportJob.objects.create(user=other, file_format=ImportService.detect_format(filename))
+                ImportService.run(job, source=io.BytesIO(content))
+
+                self.assertEqual((job.status, job.imported, job.skipped), (ImportJob.STATUS_COMPLETED, 6, 0))
+                self.assertEqual(self.logged_songs(other), self.logged_songs(self.user))
+
+                # Importing an export into the same account only finds duplicates
+                job = ImportJob.objects.create(user=self.user, file_format=ImportService.detect_format(filename))
+                ImportService.run(job, source=io.BytesIO(content))
+                self.assertEqual((job.imported, job.duplicates), (0, 6))
+
+    def test_invalid_ndjson(self):
+        job = ImportJob.objects.create(user=self.user, file_format=ImportJob.FORMAT_NDJSON)
+        ImportService.run(job, source=io.BytesIO(b'{"song_title": "Song"}\n\n{"song_title": \n'))
+        self.assertEqual((job.status, job.error), (ImportJob.STATUS_FAILED, 'Invalid JSON on line 3 of listening history file'))
+
+
+class FastSerializerTests(TestCase):
+    """
+    The fast read path renders exactly the bytes SongLogSerializer and JSONRenderer did
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user_with_songs('user0', song_count=6)
+        track = Track.objects.create(
+            title='Ünïcødé "quoted" \u2028 😀', artist='Artist\\', album='',
+            spotify_id='spotify-1', album_art_url='https://example.com/art.png',
+            preview_url='https://example.com/preview.mp3', duration_ms=215000, popularity=87
+        )
+        SongLog.objects.create(user=cls.user, track=track, date=date(2024, 2, 29), note='line\nbreak\u2029')
+        song_ids = list(cls.user.song_logs.order_by('id').values_list('id', flat=True))
+        for song_log_id, compared_song_log_id in zip(song_ids, song_ids[1:]):
+            RatingService.create_rating(cls.user, song_log_id, compared_song_log_id, song_log_id)
+        # Ratings at both ends of the 1-10 scale
+        SongLog.objects.filter(id=song_ids[0]).update(elo_rating=2150.123456789)
+        SongLog.objects.filter(id=song_ids[1]).update(elo_rating=799.5)
+        SongLog.objects.filter(id=song_ids[2]).update(
+            last_compared_at=datetime(2024, 3, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def render_with_serializer(self, queryset):
+        return JSONRenderer().render(SongLogSerializer(queryset, many=True).data)
+
+    def test_song_log_list(self):
+        queryset = SongLog.objects.filter(user=self.user).select_related('track').with_rating()
+        response = self.client.get('/api/song-logs/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.content, self.render_with_serializer(queryset))
+
+    def test_song_log_list_filtered(self):
+        queryset = SongLog.objects.filter(user=self.user).select_related('track').with_rating().filter(db_rating__gte=5)
+        response = self.client.get('/api/song-logs/?min_rating=5', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.content, self.render_with_serializer(queryset))
+
+    def test_serializer(self):
+        queryset = SongLog.objects.filter(user=self.user).with_rating().order_by('id')
+        self.assertEqual(
+            FastJSONRenderer().render(SongLogFastSerializer.serialize(queryset)),
+            self.render_with_serializer(queryset.select_related('track'))
+        )
+
+    def test_renderer(self):
+        data = {
+            'text': 'é 😀 \u2028 \u2029 "\\ \x01 1e5 0.00001',
+            'numbers': [0, -1, 2 ** 40, 1.5, 1e16, 1e-05, 0.1 + 0.2, Decimal('1.10')],
+            'dates': [date(2024, 1, 1), timezone.now(), datetime(2024, 1, 1, 12, 0)],
+            'nested': {'empty': [], 'none': None, 'bool': True},
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        data.pop('numbers')
+        data['text'] = 'é 😀 \u2028 \u2029'
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class DashboardServiceTests(TestCase):
+    """
+    home_status and setup_guide read the song log summary in one query, and
+    reuse it until the user's data changes
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user_with_songs('user0', song_count=8)
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+
+    def authenticate(self):
+        # A freshly loaded user, as token authentication would
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_home_status(self):
+        self.authenticate()
+        with self.assertNumQueries(1):
+            data = self.get('/api/song-logs/home_status/')
+        self.assertEqual(data['recent_activity']['total_logs'], 8)
+        recent_logs = SongLog.objects.filter(user=self.user).with_rating().order_by('-date')[:5]
+        self.assertEqual(data['recent_activity']['recent_logs'], SongLogFastSerializer.serialize(recent_logs))
+
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('/api/song-logs/home_status/'), data)
+
+    def test_setup_guide(self):
+        self.authenticate()
+        with self.assertNumQueries(1):
+            data = self.get('/api/song-logs/setup_guide/')
+        self.assertEqual(data['user_progress']['total_songs'], 8)
+        self.assertTrue(data['user_progress']['has_logged_songs'])
+        self.assertTrue(data['steps'][2]['completed'])
+
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('/api/song-logs/setup_guide/'), data)
+
+    def test_no_song_logs(self):
+        self.user.song_logs.all().delete()
+        self.authenticate()
+        data = self.get('/api/song-logs/setup_guide/')
+        self.assertEqual(data['user_progress']['total_songs'], 0)
+        self.assertFalse(data['user_progress']['has_logged_songs'])
+        self.assertEqual(self.get('/api/song-logs/home_status/')['recent_activity']['recent_logs'], [])
+
+    def test_writes_invalidate(self):
+        self.authenticate()
+        self.get('/api/song-logs/home_status/')
+        self.user.song_logs.first().delete()
+        self.authenticate()
+        with self.assertNumQueries(1):
+            data = self.get('/api/song-logs/home_status/')
+        self.assertEqual(data['recent_activity']['total_logs'], 7)
+
+
+class SparseFieldsetTests(TestCase):
+    """
+    ?fields= and ?omit= trim responses, and the columns of unselected fields are not fetched
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, *_ = create_rated_users(4, 6, 4)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def test_song_log_list(self):
+        data, sql = self.get('/api/song-logs/?fields=id,song_title')
+        self.assertEqual(list(data[0]), ['id', 'song_title'])
+        self.assertNotIn('"note"', sql)
+        self.assertNotIn('"preview_url"', sql)
+
+        data, sql = self.get('/api/song-logs/?omit=note')
+        self.assertNotIn('note', data[0])
+        self.assertIn('preview_url', data[0])
+        self.assertNotIn('"note"', sql)
+
+    def test_song_log_retrieve(self):
+        song_log = self.user.song_logs.first()
+        data, sql = self.get(f'/api/song-logs/{song_log.id}/?fields=id,artist,rating')
+        self.assertEqual(data, {'id': song_log.id, 'artist': song_log.track.artist, 'rating': song_log.rating})
+        self.assertNotIn('"title"', sql)
+        self.assertNotIn('"note"', sql)
+
+    def test_social_feed(self):
+        data, sql = self.get('/api/song-logs/social_feed/?fields=id,song_title,user.username')
+        item = data['feed_items'][0]
+        self.assertEqual(list(item), ['id', 'song_title', 'user'])
+        self.assertEqual(list(item['user']), ['username'])
+        # Similar users are still loaded in full to score them, the feed query only reads usernames
+        feed_sql = next(query for query in sql.split('SELECT') if 'LIMIT 20' in query)
+        self.assertNotIn('"favorite_genres"', feed_sql)
+        self.assertNotIn('"album_art_url"', feed_sql)
+
+    def test_user_discovery(self):
+        full, _ = self.get('/api/song-logs/user_discovery/')
+        data, sql = self.get('/api/song-logs/user_discovery/?omit=recent_songs,total_songs,user.favorite_artists')
+        self.assertEqual(list(data[0]), ['user', 'similarity_score', 'taste_match'])
+        self.assertNotIn('favorite_artists', data[0]['user'])
+        self.assertEqual(data[0]['user']['username'], full[0]['user']['username'])
+        self.assertNotIn('LIMIT 3', sql)
+        self.assertNotIn('COUNT(*)', sql)
+
+    def test_writes_return_every_field(self):
+        song_log = self.user.song_logs.first()
+        response = self.client.patch(f'/api/song-logs/{song_log.id}/?fields=id', {'note': 'updated'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['note'], 'updated')
+        self.assertIn('song_title', response.json())
+
+
+class BatchViewTests(TestCase):
+    """
+    /api/batch/ returns what each sub-request's route returns on its own
+    """
+
+    PATHS = [
+        '/api/song-logs/home_status/',
+        '/api/song-logs/check_preferences/',
+        '/api/ratings/stats/',
+        '/api/song-logs/social_feed/',
+        '/api/song-logs/?fields=id,song_title',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, *_ = create_rated_users(4, 6, 4)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        CachedTokenAuthentication.clear_cache()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def batch(self, paths, **options):
+        return self.client.post('/api/batch/', {'requests': [{'path': path} for path in paths], **options}, format='json')
+
+    def test_responses(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.batch(self.PATHS)
+        self.assertEqual(response.status_code, 200)
+        # The token is looked up once for the whole batch
+        self.assertEqual(sum('authtoken_token' in query['sql'] for query in queries.captured_queries), 1)
+
+        results = response.json()['responses']
+        self.assertEqual([result['path'] for result in results], self.PATHS)
+        for result in results:
+            direct = self.client.get(result['path'])
+            self.assertEqual(result['status'], direct.status_code)
+            self.assertEqual(result['body'], direct.json())
+
+    def test_unknown_route(self):
+        result, = self.batch(['/api/unknown/']).json()['responses']
+        self.assertEqual(result['status'], 404)
+
+    def test_invalid(self):
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch(['/api/batch/']).status_code, 400)
+        self.assertEqual(self.batch(['/admin/']).status_code, 400)
+        response = self.client.post('/api/batch/', {'requests': [{'method': 'DELETE', 'path': self.PATHS[0]}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_authentication(self):
+        self.client.credentials()
+        self.assertEqual(self.batch(self.PATHS).status_code, 401)
+
+
+class BatchParallelTests(TransactionTestCase):
+    """
+    Parallel sub-requests run on their own threads and connections, so the data
+    is committed rather than kept in a test transaction
+    """
+
+    PATHS = BatchViewTests.PATHS + [
+        # Fails validation, and doesn't exist
+        '/api/song-logs/user_profile/',
+        '/api/song-logs/0/',
+    ]
+
+    def setUp(self):
+        CachedTokenAuthentication.clear_cache()
+        self.user = create_rated_users(4, 6, 4)[0]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+
+    def batch(self, paths, parallel):
+        response = self.client.post(
+            '/api/batch/', {'requests': [{'path': path} for path in paths], 'parallel': parallel}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['responses']
+
+    def test_same_as_serial(self):
+        with mock.patch('core.batch.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as executor:
+            parallel = self.batch(self.PATHS, parallel=True)
+        executor.assert_called_once()
+        serial = self.batch(self.PATHS, parallel=False)
+        self.assertEqual([result['path'] for result in parallel], self.PATHS)
+        self.assertEqual(parallel, serial)
+        self.assertEqual([result['status'] for result in parallel[-2:]], [400, 404])
+
+    def test_single_request_runs_serially(self):
+        with mock.patch('core.batch.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as executor:
+            result, = self.batch(self.PATHS[:1], parallel=True)
+        executor.assert_not_called()
+        self.assertEqual(result['status'], 200)
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SongLogViewSet
+from .views import SongLogViewSet, ImportJobViewSet
 
 router = DefaultRouter()
 router.register(r'song-logs', SongLogViewSet, basename='songlog')
+router.register(r'imports', ImportJobViewSet, basename='importjob')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -3,11 +3,18 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.permissions import IsAuthenticated
-from .models import SongLog
-from .serializers import SongLogSerializer
-from .services import SpotifyService, SocialFeedService
+from .models import SongLog, TrendingBucket, ImportJob
+from .filters import SongLogFilter
+from .serializers import SongLogSerializer, SongLogFastSerializer, ImportJobSerializer
+from .services import SpotifyService, SocialFeedService, CatalogService, TrendingService, ImportService, DashboardService
+from core.conditional import data_version_etag
+from core.fieldsets import FieldSelection
+from core.renderers import FastJSONRenderer
+from .exporters import export_response, CONTENT_TYPES, FORMAT_NDJSON
 from rest_framework import serializers
+from django.db.models import F
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -17,10 +24,35 @@ logger = logging.getLogger(__name__)
 class SongLogViewSet(viewsets.ModelViewSet):
     serializer_class = SongLogSerializer
     permission_classes = [IsAuthenticated]
+    filterset_class = SongLogFilter
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    EXPORT_FIELDS = [
+        'id', 'song_title', 'artist', 'album', 'spotify_id', 'date', 'note', 'elo_rating',
+        'rating', 'comparisons', 'wins', 'last_compared_at', 'created_at'
+    ]
 
     def get_queryset(self):
         # Users can only see their own song logs
-        return SongLog.objects.filter(user=self.request.user)
+        queryset = SongLog.objects.filter(user=self.request.user).select_related('track').with_rating()
+        if self.action == 'retrieve':
+            # Only fetch the columns of the fields selected with ?fields= / ?omit=
+            selection = FieldSelection.from_request(self.request)
+            if selection:
+                # track__id keeps the select_related join valid when no track field is selected
+                lookups = SongLogFastSerializer.restrict(selection).model_lookups()
+                queryset = queryset.only('track__id', *lookups)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        # Read-only fast path with the same output as SongLogSerializer, limited
+        # to the fields selected with ?fields= / ?omit=
+        serializer = SongLogFastSerializer.restrict(FieldSelection.from_request(request))
+        rows = serializer.project(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize_rows(page))
+        return Response(serializer.serialize_rows(rows))
 
     def perform_create(self, serializer):
         # Check if user has set their music preferences
@@ -100,26 +132,22 @@ class SongLogViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            spotify_service = SpotifyService()
-            song_data = spotify_service.get_song_details(spotify_id)
+            # Songs already in the catalog don't need a Spotify API call
+            track = CatalogService.get_spotify_track(spotify_id)
             
-            if not song_data:
+            if not track:
                 return Response(
                     {'error': 'Song not found on Spotify'}, 
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Create song log entry with Spotify data
+            # Create song log entry for the catalog track
             song_log_data = {
                 'user': request.user.id,
-                'song_title': song_data['title'],
-                'artist': song_data['artist'],
-                'album': song_data['album'],
-                'spotify_id': song_data['spotify_id'],
-                'album_art_url': song_data['album_art'],
-                'preview_url': song_data['preview_url'],
-                'duration_ms': song_data['duration_ms'],
-                'popularity': song_data['popularity'],
+                'song_title': track.title,
+                'artist': track.artist,
+                'album': track.album,
+                'spotify_id': track.spotify_id,
                 'date': request.data.get('date'),  # Required field from request
                 'note': request.data.get('note', '')  # Optional note
             }
@@ -140,7 +168,8 @@ class SongLogViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def social_feed(self, request):
         """
-        Get social feed of song logs from users with similar taste
+        Get social feed of song logs from users with similar taste.
+        Feed items can be trimmed with ?fields= and ?omit=
         """
         try:
             page = int(request.query_params.get('page', 1))
@@ -149,7 +178,8 @@ class SongLogViewSet(viewsets.ModelViewSet):
             feed_data = SocialFeedService.get_social_feed(
                 user=request.user,
                 page=page,
-                page_size=page_size
+                page_size=page_size,
+                selection=FieldSelection.from_request(request)
             )
             
             return Response(feed_data)
@@ -160,17 +190,49 @@ class SongLogViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """
+        Get the tracks or artists logged most across all users in the last 24h or 7d
+        """
+        kind = request.query_params.get('kind', 'tracks')
+        window = request.query_params.get('window', '24h')
+        kinds = {'tracks': TrendingBucket.KIND_TRACK, 'artists': TrendingBucket.KIND_ARTIST}
+        if kind not in kinds or window not in TrendingService.WINDOWS:
+            return Response(
+                {'error': f"kind must be one of {', '.join(kinds)} and window one of {', '.join(TrendingService.WINDOWS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), TrendingService.MAX_LIMIT)
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'limit must be a positive integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'kind': kind,
+            'window': window,
+            'results': TrendingService.get_trending(kinds[kind], window, limit)
+        })
+
     @action(detail=False, methods=['get'])
     def user_discovery(self, request):
         """
-        Get users to discover based on music taste
+        Get users to discover based on music taste.
+        Cards can be trimmed with ?fields= and ?omit=
         """
         try:
             limit = int(request.query_params.get('limit', 10))
             
             discovery_users = SocialFeedService.get_user_discovery(
                 user=request.user,
-                limit=limit
+                limit=limit,
+                selection=FieldSelection.from_request(request)
             )
             
             return Response(discovery_users)
@@ -286,6 +348,7 @@ class SongLogViewSet(viewsets.ModelViewSet):
     # Removed today_log method - users can now log multiple songs per day
 
     @action(detail=False, methods=['get'])
+    @data_version_etag()
     def home_status(self, request):
         """
         Get user's home page status and guidance
@@ -295,9 +358,8 @@ class SongLogViewSet(viewsets.ModelViewSet):
         # Check if user has set preferences
         has_preferences = bool(user.favorite_genres or user.favorite_artists or user.mood_preferences)
         
-        # Get user's recent song logs
-        recent_logs = SongLog.objects.filter(user=user).order_by('-date')[:5]
-        recent_logs_data = self.get_serializer(recent_logs, many=True).data
+        # Song log count and recent song logs
+        summary = DashboardService.get_summary(user)
         
         # Determine what guidance to show
         if not has_preferences:
@@ -334,8 +396,8 @@ class SongLogViewSet(viewsets.ModelViewSet):
                 'missing_preferences': not has_preferences
             },
             'recent_activity': {
-                'total_logs': SongLog.objects.filter(user=user).count(),
-                'recent_logs': recent_logs_data
+                'total_logs': summary['total_songs'],
+                'recent_logs': summary['recent_logs']
             },
             'guidance': guidance
         })
@@ -347,7 +409,9 @@ class SongLogViewSet(viewsets.ModelViewSet):
         """
         user = request.user
         has_preferences = bool(user.favorite_genres or user.favorite_artists or user.mood_preferences)
-        has_logged_songs = SongLog.objects.filter(user=user).exists()
+        summary = DashboardService.get_summary(user)
+        has_logged_songs = summary['has_logged_songs']
+        can_rate = summary['total_songs'] >= 2
         
         steps = []
         
@@ -393,9 +457,9 @@ class SongLogViewSet(viewsets.ModelViewSet):
             'step': 3,
             'title': 'Rate Songs & Discover',
             'description': 'Compare your songs with others and discover new music through our rating system!',
-            'completed': has_logged_songs and SongLog.objects.filter(user=user).count() >= 2,
-            'action': 'Rate Songs' if has_logged_songs and SongLog.objects.filter(user=user).count() >= 2 else None,
-            'url': '/rate-songs' if has_logged_songs and SongLog.objects.filter(user=user).count() >= 2 else None
+            'completed': can_rate,
+            'action': 'Rate Songs' if can_rate else None,
+            'url': '/rate-songs' if can_rate else None
         })
         
         steps.append({
@@ -411,7 +475,7 @@ class SongLogViewSet(viewsets.ModelViewSet):
             'user_progress': {
                 'has_preferences': has_preferences,
                 'has_logged_songs': has_logged_songs,
-                'total_songs': SongLog.objects.filter(user=user).count(),
+                'total_songs': summary['total_songs'],
                 'completion_percentage': len([s for s in steps if s['completed']]) / len(steps) * 100
             },
             'steps': steps,
@@ -419,6 +483,7 @@ class SongLogViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @data_version_etag(user_id_param='user_id')
     def user_profile(self, request):
         """
         Get another user's profile data for viewing their profile
@@ -440,7 +505,7 @@ class SongLogViewSet(viewsets.ModelViewSet):
             )
 
         # Get user's recent song logs
-        recent_logs = SongLog.objects.filter(user=target_user).order_by('-date', '-created_at')[:10]
+        recent_logs = SongLog.objects.filter(user=target_user).select_related('track').with_rating().order_by('-date', '-created_at')[:10]
         
         # Serialize the data
         profile_data = {
@@ -456,13 +521,13 @@ class SongLogViewSet(viewsets.ModelViewSet):
                 'recent_logs': [
                     {
                         'id': log.id,
-                        'song_title': log.song_title,
-                        'artist': log.artist,
-                        'album': log.album,
-                        'album_art_url': log.album_art_url,
+                        'song_title': log.track.title,
+                        'artist': log.track.artist,
+                        'album': log.track.album,
+                        'album_art_url': log.track.album_art_url,
                         'date': log.date.isoformat(),
                         'note': log.note or '',
-                        'rating': SocialFeedService.elo_to_rating_scale(log.elo_rating),  # Add 1-10 rating
+                        'rating': log.rating,  # Add 1-10 rating
                     }
                     for log in recent_logs
                 ]
@@ -470,3 +535,59 @@ class SongLogViewSet(viewsets.ModelViewSet):
         }
 
         return Response(profile_data)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Download all of the user's song logs as NDJSON (default) or CSV, streamed
+        so libraries of any size export in constant memory
+        """
+        file_format = request.query_params.get('file_format', FORMAT_NDJSON)
+        if file_format not in CONTENT_TYPES:
+            return Response(
+                {'error': f"file_format must be one of {', '.join(CONTENT_TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Column names match what the import endpoint reads back, so either format can be re-imported
+        song_logs = SongLog.objects.filter(user=request.user).annotate(
+            song_title=F('track__title'),
+            artist=F('track__artist'),
+            album=F('track__album'),
+            spotify_id=F('track__spotify_id'),
+        ).with_rating().annotate(rating=F('db_rating'))
+        return export_response(song_logs, self.EXPORT_FIELDS, file_format, f'song-logs-{timezone.localdate()}')
+
+
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Import a listening history file in the background, then poll the job for progress
+    """
+    serializer_class = ImportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # Users can only see their own imports
+        return ImportJob.objects.filter(user=self.request.user)
+
+    def create(self, request):
+        """
+        Upload a JSON, NDJSON or CSV history file as the multipart field "file"
+        """
+        uploaded_file = request.FILES.get('file')
+        if not uploaded_file:
+            return Response(
+                {'error': 'file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            job = ImportService.create_job(request.user, uploaded_file)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ImportService.start(job)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
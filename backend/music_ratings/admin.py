@@ -1,10 +1,40 @@
 from django.contrib import admin
-from .models import Rating
+from .models import Rating, InsertionSession, UserRatingStats, EloCheckpoint, TrackLeaderboardEntry
 
 @admin.register(Rating)
 class RatingAdmin(admin.ModelAdmin):
     list_display = ('user', 'song_log', 'compared_song_log', 'winner_song_log', 'created_at')
     list_filter = ('user', 'created_at')
-    search_fields = ('song_log__song_title', 'compared_song_log__song_title')
+    search_fields = ('song_log__track__title', 'compared_song_log__track__title')
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
+
+
+@admin.register(InsertionSession)
+class InsertionSessionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'song_log', 'status', 'final_position', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('song_log__track__title',)
+    ordering = ('-created_at',)
+
+
+@admin.register(UserRatingStats)
+class UserRatingStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total_songs', 'total_ratings', 'rating_sum', 'updated_at')
+    raw_id_fields = ('highest_rated_song', 'lowest_rated_song')
+    search_fields = ('user__username',)
+
+
+@admin.register(EloCheckpoint)
+class EloCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('user', 'last_rating_id', 'created_at')
+    list_filter = ('created_at',)
+    exclude = ('song_states',)
+    ordering = ('-created_at',)
+
+
+@admin.register(TrackLeaderboardEntry)
+class TrackLeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ('track', 'logger_count', 'song_log_count', 'mean_rating', 'mean_elo', 'last_logged_at')
+    raw_id_fields = ('track',)
+    search_fields = ('track__title', 'track__artist')
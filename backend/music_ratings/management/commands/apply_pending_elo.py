@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from music_ratings.services import EloWriteBehindService
+
+
+class Command(BaseCommand):
+    help = 'Apply comparisons still waiting for the write-behind ELO applier'
+
+    def handle(self, *args, **options):
+        applied = EloWriteBehindService.flush()
+        self.stdout.write(self.style.SUCCESS(f'Applied {applied} buffered comparison(s)'))
@@ -0,0 +1,255 @@
+import json
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from music_logs.fake_spotify import FakeSpotifyService
+from user_management.authentication import CachedTokenAuthentication
+from music_ratings.services import RatingService
+
+User = get_user_model()
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every API endpoint with the users of a seed_bench dataset and report throughput '
+        'and latency percentiles. Runs in-process through the test client by default, with '
+        'Spotify stubbed out and every write rolled back, or against a running server with --base-url, '
+        'where the Spotify endpoints are skipped and writes are kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--prefix', default='bench', help='Username prefix of the seed_bench dataset')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help='Only run this endpoint (can be repeated)')
+        parser.add_argument('--base-url', help='Benchmark a running server, e.g. http://localhost:8000')
+        parser.add_argument('--concurrency', type=int, default=1, help='Parallel requests with --base-url')
+        parser.add_argument(
+            '--token-auth', action='store_true',
+            help='In-process, authenticate every request with its token instead of skipping authentication, '
+                 'and report the token cache hit rate'
+        )
+        parser.add_argument(
+            '--full-middleware', action='store_true',
+            help='Run token-authenticated API requests through the whole middleware stack, '
+                 'to compare against the lean one'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.users = list(User.objects.filter(username__startswith=f"{options['prefix']}-").order_by('id'))
+        if len(self.users) < 2:
+            raise CommandError(f"No '{options['prefix']}' dataset found, run seed_bench first")
+
+        endpoints = self.get_endpoints()
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - set(endpoints)
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            endpoints = {name: endpoints[name] for name in options['endpoints']}
+
+        if options['base_url']:
+            # The server calls the real Spotify API, leave those endpoints out
+            endpoints = {name: endpoint for name, endpoint in endpoints.items() if not endpoint.get('spotify')}
+            results = self.run_server(endpoints, options)
+        else:
+            results = self.run_in_process(endpoints, options)
+
+        self.report(results)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def get_endpoints(self):
+        """
+        Each endpoint builds a (method, path, data) request for a user outside the timed part,
+        or None when that user can't make the request
+        """
+        def other_user(user):
+            return self.rng.choice([candidate for candidate in self.users[:50] if candidate != user])
+
+        def comparison(user):
+            pair = RatingService.get_comparison_pair(user)
+            if pair is None:
+                return None
+            winner = self.rng.choice((pair['song1']['id'], pair['song2']['id']))
+            return 'post', '/api/ratings/create_comparison/', {
+                'song_log_id': pair['song1']['id'],
+                'compared_song_log_id': pair['song2']['id'],
+                'winner_song_log_id': winner
+            }
+
+        def get(path):
+            return {'build': lambda user: ('get', path(user) if callable(path) else path, None)}
+
+        return {
+            'song_logs': get('/api/song-logs/'),
+            'song_logs_by_rating': get('/api/song-logs/?min_rating=7'),
+            'home_status': get('/api/song-logs/home_status/'),
+            'setup_guide': get('/api/song-logs/setup_guide/'),
+            # Reads only the authenticated user, so it is mostly authentication and middleware
+            'check_preferences': get('/api/song-logs/check_preferences/'),
+            'social_feed': get('/api/song-logs/social_feed/'),
+            'user_discovery': get('/api/song-logs/user_discovery/'),
+            'similar_users': get('/api/song-logs/similar_users/'),
+            'user_profile': get(lambda user: f'/api/song-logs/user_profile/?user_id={other_user(user).id}'),
+            'trending': get('/api/song-logs/trending/?window=7d'),
+            'search_spotify': {**get('/api/song-logs/search_spotify/?q=love'), 'spotify': True},
+            'search_artist': {**get('/api/song-logs/search_artist/?q=stub'), 'spotify': True},
+            'create_from_spotify': {
+                'build': lambda user: ('post', '/api/song-logs/create_from_spotify/', {
+                    'spotify_id': f'stub-{self.rng.randrange(100000)}',
+                    'date': date.today().isoformat()
+                }),
+                'status': 201,
+                'spotify': True,
+            },
+            'ratings': get('/api/ratings/'),
+            'ratings_flat': get('/api/ratings/?flat=1'),
+            # 404 once a user has compared every pair among their least compared songs
+            'comparison_pair': {**get('/api/ratings/comparison_pair/'), 'status': (200, 404)},
+            'create_comparison': {'build': comparison, 'status': 201},
+            'rankings': get('/api/ratings/rankings/'),
+            'rankings_deep_page': get(lambda user: '/api/ratings/rankings/?cursor=' + RatingService.rankings_cursor(
+                self.rng.uniform(1200, 1500), 0
+            )),
+            'stats': get('/api/ratings/stats/'),
+            'leaderboard': get('/api/leaderboard/'),
+            'insertion_sessions': get('/api/insertion-sessions/'),
+        }
+
+    def build_request(self, endpoint, attempts=100):
+        for _ in range(attempts):
+            user = self.rng.choice(self.users)
+            request = endpoint['build'](user)
+            if request is not None:
+                return user, request
+        raise CommandError('No user in the dataset can make this request')
+
+    @staticmethod
+    def is_expected(endpoint, status):
+        expected = endpoint.get('status', 200)
+        return status in expected if isinstance(expected, tuple) else status == expected
+
+    def run_in_process(self, endpoints, options):
+        client = APIClient()
+        results = {}
+        if options['token_auth']:
+            tokens = {user.id: Token.objects.get_or_create(user=user)[0].key for user in self.users}
+            CachedTokenAuthentication.clear_cache()
+        lean_paths = [] if options['full_middleware'] else settings.LEAN_MIDDLEWARE_PATHS
+        with mock.patch('music_logs.views.SpotifyService', FakeSpotifyService), \
+                mock.patch('music_logs.services.SpotifyService', FakeSpotifyService), \
+                override_settings(LEAN_MIDDLEWARE_PATHS=lean_paths), \
+                transaction.atomic():
+            for name, endpoint in endpoints.items():
+                timings, queries, errors = [], [], 0
+                started = time.perf_counter()
+                for _ in range(options['requests']):
+                    user, (method, path, data) = self.build_request(endpoint)
+                    if options['token_auth']:
+                        client.credentials(HTTP_AUTHORIZATION=f'Token {tokens[user.id]}')
+                    else:
+                        client.force_authenticate(user)
+
+                    with CaptureQueriesContext(connection) as context:
+                        request_started = time.perf_counter()
+                        response = getattr(client, method)(path, data, format='json')
+                        timings.append((time.perf_counter() - request_started) * 1000)
+                    queries.append(len(context.captured_queries))
+                    if not self.is_expected(endpoint, response.status_code):
+                        errors += 1
+
+                results[name] = self.summarize(timings, time.perf_counter() - started, errors)
+                results[name]['mean_queries'] = round(statistics.mean(queries), 1)
+                self.stdout.write(f'  {name} done')
+            # Leave the dataset as seeded
+            transaction.set_rollback(True)
+        if options['token_auth']:
+            stats = CachedTokenAuthentication.cache_stats()
+            self.stdout.write(f"Token cache: {stats['hits']} hits, {stats['misses']} misses, hit rate {stats['hit_rate']}")
+        return results
+
+    def run_server(self, endpoints, options):
+        base_url = options['base_url'].rstrip('/')
+        tokens = {user.id: Token.objects.get_or_create(user=user)[0].key for user in self.users}
+
+        def send(request):
+            user, (method, path, data) = request
+            body = json.dumps(data).encode() if data is not None else None
+            http_request = urllib.request.Request(
+                base_url + path,
+                data=body,
+                method=method.upper(),
+                headers={'Authorization': f'Token {tokens[user.id]}', 'Content-Type': 'application/json'}
+            )
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(http_request) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            return (time.perf_counter() - started) * 1000, status
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            for name, endpoint in endpoints.items():
+                requests = [self.build_request(endpoint) for _ in range(options['requests'])]
+
+                started = time.perf_counter()
+                responses = list(executor.map(send, requests))
+                elapsed = time.perf_counter() - started
+
+                errors = sum(1 for _, status in responses if not self.is_expected(endpoint, status))
+                results[name] = self.summarize([timing for timing, _ in responses], elapsed, errors)
+                self.stdout.write(f'  {name} done')
+        return results
+
+    def summarize(self, timings, elapsed, errors):
+        timings = sorted(timings)
+        return {
+            'requests': len(timings),
+            'errors': errors,
+            'throughput_rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+        }
+
+    def report(self, results):
+        with_queries = any('mean_queries' in result for result in results.values())
+        header = f"{'endpoint':<22}{'reqs':>6}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        if with_queries:
+            header += f"{'queries':>9}"
+        self.stdout.write(header)
+        for name, result in results.items():
+            line = (
+                f"{name:<22}{result['requests']:>6}{result['errors']:>8}{result['throughput_rps']:>9}"
+                f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+            )
+            if with_queries:
+                line += f"{result['mean_queries']:>9}"
+            self.stdout.write(line)
@@ -0,0 +1,83 @@
+import itertools
+import random
+import time
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from music_logs.models import SongLog, Track
+from music_ratings.models import Rating, EloCheckpoint
+from music_ratings.services import EloHistoryService, RatingService, RatingStatsService
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark deleting a rating for a user with a long history, replaying from '
+        'the nearest checkpoint versus replaying the whole history. '
+        'All data is created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--songs', type=int, default=300)
+        parser.add_argument('--ratings', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        songs_count = options['songs']
+        ratings_count = min(options['ratings'], songs_count * (songs_count - 1) // 2)
+
+        with transaction.atomic():
+            user = User.objects.create_user(username=f'benchmark-{rng.getrandbits(32)}', password=None)
+            tracks = Track.objects.bulk_create(
+                Track(title=f'Song {i}', artist=f'Artist {i % 40}', album=user.username)
+                for i in range(songs_count)
+            )
+            SongLog.objects.bulk_create(
+                SongLog(user=user, track=track, date=date(2024, 1, 1))
+                for track in tracks
+            )
+            song_ids = list(SongLog.objects.filter(user=user).values_list('id', flat=True))
+
+            pairs = rng.sample(list(itertools.combinations(song_ids, 2)), ratings_count)
+            Rating.objects.bulk_create(
+                (
+                    Rating(user=user, song_log_id=a, compared_song_log_id=b, winner_song_log_id=rng.choice((a, b)))
+                    for a, b in pairs
+                ),
+                batch_size=2000
+            )
+            RatingStatsService.rebuild(user)
+
+            started = time.perf_counter()
+            EloHistoryService.rebuild(user)
+            self.stdout.write(
+                f'Replayed {ratings_count} ratings over {songs_count} songs in '
+                f'{(time.perf_counter() - started) * 1000:.1f} ms, '
+                f'{EloCheckpoint.objects.filter(user=user).count()} checkpoints kept'
+            )
+
+            checkpointed = self._time_deletes(user, options['repeat'])
+
+            EloCheckpoint.objects.filter(user=user).delete()
+            full_replay = self._time_deletes(user, options['repeat'])
+
+            self.stdout.write(self.style.SUCCESS(
+                f'Delete latest rating: {checkpointed:.1f} ms with checkpoints, '
+                f'{full_replay:.1f} ms with a full replay ({full_replay / checkpointed:.1f}x)'
+            ))
+
+            transaction.set_rollback(True)
+
+    def _time_deletes(self, user, repeat):
+        timings = []
+        for _ in range(repeat):
+            rating = Rating.objects.filter(user=user).order_by('-id').first()
+            started = time.perf_counter()
+            RatingService.delete_rating(rating)
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)[len(timings) // 2]
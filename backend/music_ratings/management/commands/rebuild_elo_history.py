@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from music_ratings.services import EloHistoryService
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Replay rating histories from the initial song ratings and recreate the ELO checkpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='usernames',
+            action='append',
+            help='Only rebuild this username (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+
+        for user in users.iterator():
+            replayed = EloHistoryService.rebuild(user)
+            self.stdout.write(f'{user.username}: replayed {replayed} rating(s)')
+
+        self.stdout.write(self.style.SUCCESS('Done'))
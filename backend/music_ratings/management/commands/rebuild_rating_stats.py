@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from music_ratings.services import RatingStatsService
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user rating stats rows from the song logs and ratings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='usernames',
+            action='append',
+            help='Only rebuild stats for this username (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+
+        count = 0
+        for user in users.iterator():
+            RatingStatsService.rebuild(user)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating stats for {count} user(s)'))
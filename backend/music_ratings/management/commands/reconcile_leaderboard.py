@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from music_ratings.services import LeaderboardService
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the community track leaderboard from the song logs, fixing any drift '
+        'in the incrementally maintained entries. Meant to run nightly, e.g. from cron.'
+    )
+
+    def handle(self, *args, **options):
+        counts = LeaderboardService.reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled leaderboard: {counts['created']} created, "
+            f"{counts['updated']} updated, {counts['deleted']} deleted"
+        ))
@@ -0,0 +1,229 @@
+import itertools
+import math
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from music_logs import signals as log_signals
+from music_logs.models import SongLog, Track
+from music_logs.services import TrendingService
+from music_ratings import signals as rating_signals
+from music_ratings.models import Rating, EloCheckpoint
+from music_ratings.services import EloRatingService, LeaderboardService, RatingStatsService
+
+User = get_user_model()
+
+GENRES = [
+    'pop', 'hip-hop', 'rock', 'r&b', 'indie', 'electronic', 'country', 'latin', 'k-pop', 'jazz',
+    'alternative', 'metal', 'soul', 'folk', 'classical', 'reggae', 'punk', 'blues', 'house', 'afrobeats',
+]
+MOODS = [
+    'happy', 'chill', 'energetic', 'sad', 'romantic', 'focused', 'nostalgic', 'angry', 'dreamy', 'party',
+]
+
+
+def zipf_cum_weights(n, exponent):
+    """
+    Cumulative weights for random.choices, the item at rank r drawn with probability ~ 1 / r^exponent
+    """
+    return list(itertools.accumulate(1.0 / rank ** exponent for rank in range(1, n + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic benchmark dataset: users with Zipf-distributed genres, artists '
+        'and moods, a shared track catalog, song logs and comparisons. Rows are written with '
+        'bulk_create in chunks, then the derived tables are rebuilt.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--songs-per-user', type=int, default=200, help='Mean number of songs per user')
+        parser.add_argument('--ratings-per-user', type=int, default=300, help='Mean number of comparisons per user')
+        parser.add_argument('--tracks', type=int, default=50000, help='Size of the shared track catalog')
+        parser.add_argument('--artists', type=int, default=5000)
+        parser.add_argument('--zipf-exponent', type=float, default=1.1)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='bench', help='Username and Spotify ID prefix of the generated rows')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Delete a previously generated dataset first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        prefix = options['prefix']
+        started = time.perf_counter()
+
+        if options['clear']:
+            self.clear(prefix)
+        elif User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f"A '{prefix}' dataset already exists, pass --clear to replace it")
+
+        artist_weights = zipf_cum_weights(options['artists'], options['zipf_exponent'])
+        track_ids = self.create_tracks(prefix, artist_weights)
+        users = self.create_users(prefix, artist_weights)
+        song_count, rating_count = self.create_song_logs(users, track_ids)
+
+        self.stdout.write('Rebuilding derived tables...')
+        for user in users:
+            RatingStatsService.rebuild(user)
+        LeaderboardService.reconcile()
+        TrendingService.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users, {len(track_ids)} tracks, {song_count} song logs and '
+            f'{rating_count} ratings in {time.perf_counter() - started:.1f} s'
+        ))
+
+    def clear(self, prefix):
+        users = User.objects.filter(username__startswith=f'{prefix}-')
+        # Per-row delete signals would update the derived tables one log at a time,
+        # they are rebuilt once at the end instead
+        receivers = [
+            (log_signals.song_log_deleted, SongLog),
+            (rating_signals.song_log_deleted, SongLog),
+            (rating_signals.rating_deleted, Rating),
+        ]
+        for receiver, sender in receivers:
+            post_delete.disconnect(receiver, sender=sender)
+        try:
+            with transaction.atomic():
+                EloCheckpoint.objects.filter(user__in=users).delete()
+                Rating.objects.filter(user__in=users).delete()
+                SongLog.objects.filter(user__in=users).delete()
+                users.delete()
+                Track.objects.filter(spotify_id__startswith=f'{prefix}-', song_logs__isnull=True).delete()
+        finally:
+            for receiver, sender in receivers:
+                post_delete.connect(receiver, sender=sender)
+        self.stdout.write('Deleted the previous dataset')
+
+    def create_tracks(self, prefix, artist_weights):
+        artists = self.rng.choices(range(len(artist_weights)), cum_weights=artist_weights, k=self.options['tracks'])
+        tracks = (
+            Track(
+                title=f'Track {i}',
+                artist=f'Artist {artist}',
+                album=f'Album {artist}-{i % 12}',
+                spotify_id=f'{prefix}-{i}',
+                duration_ms=self.rng.randint(90000, 360000),
+                popularity=self.rng.randint(0, 100),
+            )
+            for i, artist in enumerate(artists)
+        )
+        Track.objects.bulk_create(tracks, batch_size=self.options['chunk_size'])
+        # Catalog rank order, the most popular track first
+        return list(
+            Track.objects.filter(spotify_id__startswith=f'{prefix}-').order_by('id').values_list('id', flat=True)
+        )
+
+    def create_users(self, prefix, artist_weights):
+        genre_weights = zipf_cum_weights(len(GENRES), self.options['zipf_exponent'])
+        mood_weights = zipf_cum_weights(len(MOODS), self.options['zipf_exponent'])
+        # Hashing a password per user would dominate the run, every user shares one
+        password = make_password(prefix)
+
+        def pick(population, cum_weights, count):
+            return sorted(set(self.rng.choices(population, cum_weights=cum_weights, k=count)))
+
+        users = (
+            User(
+                username=f'{prefix}-{i}',
+                email=f'{prefix}-{i}@example.com',
+                password=password,
+                favorite_genres=pick(GENRES, genre_weights, self.rng.randint(1, 4)),
+                favorite_artists=[
+                    {'id': f'{prefix}-artist-{artist}', 'name': f'Artist {artist}', 'image': None}
+                    for artist in pick(range(len(artist_weights)), artist_weights, self.rng.randint(1, 5))
+                ],
+                mood_preferences=pick(MOODS, mood_weights, self.rng.randint(1, 3)),
+            )
+            for i in range(self.options['users'])
+        )
+        User.objects.bulk_create(users, batch_size=self.options['chunk_size'])
+        return list(User.objects.filter(username__startswith=f'{prefix}-').order_by('id'))
+
+    def create_song_logs(self, users, track_ids):
+        track_weights = zipf_cum_weights(len(track_ids), self.options['zipf_exponent'])
+        chunk_size = self.options['chunk_size']
+        song_count = rating_count = 0
+        pending_songs, pending_ratings = [], []
+
+        def flush():
+            with transaction.atomic():
+                SongLog.objects.bulk_create(pending_songs, batch_size=chunk_size)
+                Rating.objects.bulk_create(
+                    (
+                        Rating(
+                            user_id=songs[a].user_id,
+                            song_log_id=songs[a].id,
+                            compared_song_log_id=songs[b].id,
+                            winner_song_log_id=songs[winner].id,
+                        )
+                        for songs, a, b, winner in pending_ratings
+                    ),
+                    batch_size=chunk_size
+                )
+            pending_songs.clear()
+            pending_ratings.clear()
+
+        for number, user in enumerate(users, 1):
+            songs, ratings = self.generate_library(user, track_ids, track_weights)
+            pending_songs.extend(songs)
+            pending_ratings.extend((songs, a, b, winner) for a, b, winner in ratings)
+            song_count += len(songs)
+            rating_count += len(ratings)
+
+            if len(pending_songs) + len(pending_ratings) >= chunk_size:
+                flush()
+                self.stdout.write(f'  {number}/{len(users)} users, {song_count} songs, {rating_count} ratings')
+        flush()
+        return song_count, rating_count
+
+    def generate_library(self, user, track_ids, track_weights):
+        """
+        One user's songs and comparisons. Each song gets a hidden quality that decides
+        who wins, and the ELO state is simulated exactly as RatingService applies it.
+        """
+        rng = self.rng
+        size = min(max(2, round(rng.expovariate(1 / self.options['songs_per_user']))), len(track_ids))
+        picked = set()
+        while len(picked) < size:
+            picked.update(rng.choices(track_ids, cum_weights=track_weights, k=size - len(picked)))
+
+        first_day = date.today() - timedelta(days=3 * 365)
+        songs = [
+            SongLog(user=user, track_id=track_id, date=first_day + timedelta(days=rng.randrange(3 * 365)))
+            for track_id in picked
+        ]
+        quality = [rng.gauss(0, 1) for _ in songs]
+
+        max_pairs = size * (size - 1) // 2
+        wanted = min(round(rng.expovariate(1 / self.options['ratings_per_user'])), max_pairs)
+        pairs = set()
+        while len(pairs) < wanted:
+            a, b = rng.sample(range(size), 2)
+            if (b, a) not in pairs:
+                pairs.add((a, b))
+
+        compared_at = timezone.now()
+        ratings = []
+        for a, b in pairs:
+            win_probability = 1 / (1 + math.exp(quality[b] - quality[a]))
+            winner, loser = (a, b) if rng.random() < win_probability else (b, a)
+            songs[winner].elo_rating, songs[loser].elo_rating = EloRatingService.update_ratings(
+                songs[winner].elo_rating, songs[loser].elo_rating,
+                songs[winner].comparisons, songs[loser].comparisons
+            )
+            songs[winner].comparisons += 1
+            songs[winner].wins += 1
+            songs[loser].comparisons += 1
+            songs[winner].last_compared_at = songs[loser].last_compared_at = compared_at
+            ratings.append((a, b, winner))
+        return songs, ratings
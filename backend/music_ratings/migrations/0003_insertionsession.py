@@ -0,0 +1,40 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0004_remove_daily_limit'),
+        ('music_ratings', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InsertionSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranked_song_ids', models.JSONField(default=list)),
+                ('low', models.PositiveIntegerField(default=0)),
+                ('high', models.PositiveIntegerField(default=0)),
+                ('steps', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('completed', 'Completed')], default='active', max_length=20)),
+                ('final_position', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('song_log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='insertion_sessions', to='music_logs.songlog')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='insertion_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='insertionsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'active')), fields=('song_log',), name='unique_active_insertion_session'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0005_songlog_user_elo_idx'),
+        ('music_ratings', '0003_insertionsession'),
+        ('user_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRatingStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_ratings', models.PositiveIntegerField(default=0)),
+                ('total_songs', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('highest_rated_song', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='music_logs.songlog')),
+                ('lowest_rated_song', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='music_logs.songlog')),
+            ],
+            options={
+                'verbose_name_plural': 'user rating stats',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:02
+
+from django.db import migrations
+from django.db.models import Count, IntegerField, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_comparison_counters(apps, schema_editor):
+    SongLog = apps.get_model('music_logs', 'SongLog')
+    Rating = apps.get_model('music_ratings', 'Rating')
+
+    involved = Rating.objects.filter(
+        Q(song_log=OuterRef('pk')) | Q(compared_song_log=OuterRef('pk'))
+    ).order_by().values('user')
+
+    SongLog.objects.update(
+        comparisons=Coalesce(
+            Subquery(involved.annotate(total=Count('id')).values('total')[:1], output_field=IntegerField()),
+            Value(0)
+        ),
+        wins=Coalesce(
+            Subquery(
+                Rating.objects.filter(winner_song_log=OuterRef('pk')).order_by().values('user')
+                .annotate(total=Count('id')).values('total')[:1],
+                output_field=IntegerField()
+            ),
+            Value(0)
+        ),
+        last_compared_at=Subquery(involved.annotate(latest=Max('created_at')).values('latest')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0006_songlog_comparison_counters'),
+        ('music_ratings', '0004_userratingstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_comparison_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_ratings', '0005_backfill_comparison_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EloCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_rating_id', models.BigIntegerField()),
+                ('song_states', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elo_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_rating_id'],
+                'indexes': [models.Index(fields=['user', '-last_rating_id'], name='elocheckpoint_user_rating_idx')],
+            },
+        ),
+    ]
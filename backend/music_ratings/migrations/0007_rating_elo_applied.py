@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0007_songlog_initial_elo'),
+        ('music_ratings', '0006_elocheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rating',
+            name='elo_applied',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(condition=models.Q(('elo_applied', False)), fields=['user', 'id'], name='rating_pending_elo_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0010_remove_songlog_track_metadata'),
+        ('music_ratings', '0007_rating_elo_applied'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackLeaderboardEntry',
+            fields=[
+                ('track', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to='music_logs.track')),
+                ('logger_count', models.PositiveIntegerField(default=0)),
+                ('song_log_count', models.PositiveIntegerField(default=0)),
+                ('elo_sum', models.FloatField(default=0.0)),
+                ('rating_sum', models.FloatField(default=0.0)),
+                ('mean_elo', models.FloatField(default=0.0)),
+                ('mean_rating', models.FloatField(default=0.0)),
+                ('last_logged_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'track leaderboard entries',
+                'ordering': ['-mean_rating', '-logger_count', '-track_id'],
+                'indexes': [models.Index(fields=['-mean_rating', '-logger_count', '-track'], name='leaderboard_rank_idx')],
+            },
+        ),
+    ]
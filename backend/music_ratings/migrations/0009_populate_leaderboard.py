@@ -0,0 +1,55 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:04
+
+from django.db import migrations
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Max, Sum, Value, When
+from django.db.models.functions import Floor
+
+
+def elo_to_rating_expression():
+    # Frozen copy of music_logs.models.elo_to_rating_expression, so later changes
+    # to the helper don't change what this migration computes
+    normalized = ExpressionWrapper(
+        (F('elo_rating') - Value(800.0)) / Value(1200.0),
+        output_field=FloatField()
+    )
+    return Case(
+        When(elo_rating__lte=800, then=Value(1.0)),
+        When(elo_rating__gte=2000, then=Value(10.0)),
+        default=Floor((Value(1.0) + normalized * Value(9.0)) * Value(10.0) + Value(0.5)) / Value(10.0),
+        output_field=FloatField()
+    )
+
+
+def populate_leaderboard(apps, schema_editor):
+    SongLog = apps.get_model('music_logs', 'SongLog')
+    TrackLeaderboardEntry = apps.get_model('music_ratings', 'TrackLeaderboardEntry')
+
+    totals = SongLog.objects.order_by().values('track_id').annotate(
+        logger_count=Count('user', distinct=True),
+        song_log_count=Count('id'),
+        elo_sum=Sum('elo_rating'),
+        rating_sum=Sum(elo_to_rating_expression()),
+        last_logged_at=Max('created_at')
+    )
+    TrackLeaderboardEntry.objects.bulk_create(
+        (
+            TrackLeaderboardEntry(
+                mean_elo=row['elo_sum'] / row['song_log_count'],
+                mean_rating=row['rating_sum'] / row['song_log_count'],
+                **row
+            )
+            for row in totals.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_ratings', '0008_trackleaderboardentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
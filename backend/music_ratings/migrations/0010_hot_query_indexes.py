@@ -0,0 +1,24 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_logs', '0013_hot_query_indexes'),
+        ('music_ratings', '0009_populate_leaderboard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['user', '-created_at'], name='rating_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['user', 'id'], name='rating_user_id_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
+import math
 from django.db import models
 from django.conf import settings
-from music_logs.models import SongLog
+from music_logs.models import SongLog, Track
 
 class Rating(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ratings')
@@ -8,10 +9,164 @@ class Rating(models.Model):
     compared_song_log = models.ForeignKey(SongLog, on_delete=models.CASCADE, related_name='compared_ratings')
     winner_song_log = models.ForeignKey(SongLog, on_delete=models.CASCADE, related_name='winning_ratings')
     created_at = models.DateTimeField(auto_now_add=True)
+    # False while the comparison waits for the write-behind ELO applier
+    elo_applied = models.BooleanField(default=True)
 
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'song_log', 'compared_song_log']
+        indexes = [
+            # A user's ratings in the default ordering: ratings list
+            models.Index(fields=['user', '-created_at'], name='rating_user_created_idx'),
+            # A user's ratings in the order they were applied: ELO history replay
+            models.Index(fields=['user', 'id'], name='rating_user_id_idx'),
+            models.Index(
+                fields=['user', 'id'],
+                condition=models.Q(elo_applied=False),
+                name='rating_pending_elo_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Rating: {self.song_log} vs {self.compared_song_log} by {self.user}"
+
+
+class InsertionSession(models.Model):
+    """
+    Binary-search placement of a newly logged song into the user's Elo-ordered list.
+    `ranked_song_ids` is a snapshot of the list (highest Elo first) taken when the
+    session starts, so the search stays consistent while the user answers.
+    """
+    STATUS_ACTIVE = 'active'
+    STATUS_COMPLETED = 'completed'
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, 'Active'),
+        (STATUS_COMPLETED, 'Completed'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='insertion_sessions')
+    song_log = models.ForeignKey(SongLog, on_delete=models.CASCADE, related_name='insertion_sessions')
+    ranked_song_ids = models.JSONField(default=list)
+    low = models.PositiveIntegerField(default=0)
+    high = models.PositiveIntegerField(default=0)
+    # List of {"compared_song_log": id, "won": bool} in the order they were answered
+    steps = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    final_position = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['song_log'],
+                condition=models.Q(status='active'),
+                name='unique_active_insertion_session',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Insertion of {self.song_log} for {self.user} ({self.status})"
+
+    @property
+    def is_active(self):
+        return self.status == self.STATUS_ACTIVE
+
+    @property
+    def max_comparisons(self):
+        """
+        Upper bound on the number of comparisons: ceil(log2(n + 1))
+        """
+        return math.ceil(math.log2(len(self.ranked_song_ids) + 1))
+
+    @property
+    def next_compared_song_log_id(self):
+        if not self.is_active or self.low >= self.high:
+            return None
+        return self.ranked_song_ids[(self.low + self.high) // 2]
+
+
+class UserRatingStats(models.Model):
+    """
+    Per-user rating statistics, kept up to date as songs and ratings are written
+    so the stats endpoint is a single row fetch.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='rating_stats')
+    total_ratings = models.PositiveIntegerField(default=0)
+    total_songs = models.PositiveIntegerField(default=0)
+    # Running sum of the songs' 1-10 scale ratings
+    rating_sum = models.FloatField(default=0.0)
+    highest_rated_song = models.ForeignKey(SongLog, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    lowest_rated_song = models.ForeignKey(SongLog, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'user rating stats'
+
+    def __str__(self):
+        return f"Rating stats for {self.user}"
+
+    @property
+    def avg_rating(self):
+        if not self.total_songs:
+            return 0
+        return self.rating_sum / self.total_songs
+
+
+class EloCheckpoint(models.Model):
+    """
+    Snapshot of every song's ELO state for a user after the rating `last_rating_id`.
+    Rolling back a rating restores the nearest earlier checkpoint and replays only
+    the ratings that came after it.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='elo_checkpoints')
+    last_rating_id = models.BigIntegerField()
+    # {song_log_id: [elo_rating, comparisons, wins, last_compared_at (ISO string or null)]}
+    song_states = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-last_rating_id']
+        indexes = [
+            models.Index(fields=['user', '-last_rating_id'], name='elocheckpoint_user_rating_idx'),
+        ]
+
+    def __str__(self):
+        return f"ELO checkpoint for {self.user} at rating {self.last_rating_id}"
+
+
+class TrackLeaderboardEntry(models.Model):
+    """
+    Community-wide aggregate for a track over every user's log of it, kept up to
+    date as songs and ratings are written and reconciled nightly.
+    """
+    track = models.OneToOneField(Track, on_delete=models.CASCADE, primary_key=True, related_name='leaderboard_entry')
+    # Distinct users who logged the track, and their logs of it
+    logger_count = models.PositiveIntegerField(default=0)
+    song_log_count = models.PositiveIntegerField(default=0)
+    # Running sums behind the means
+    elo_sum = models.FloatField(default=0.0)
+    rating_sum = models.FloatField(default=0.0)
+    mean_elo = models.FloatField(default=0.0)
+    mean_rating = models.FloatField(default=0.0)
+    last_logged_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'track leaderboard entries'
+        ordering = ['-mean_rating', '-logger_count', '-track_id']
+        indexes = [
+            # Matches the leaderboard ordering so pages are read straight off the index
+            models.Index(fields=['-mean_rating', '-logger_count', '-track'], name='leaderboard_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"Leaderboard entry for {self.track}"
+
+    def set_means(self):
+        if self.song_log_count:
+            self.mean_elo = self.elo_sum / self.song_log_count
+            self.mean_rating = self.rating_sum / self.song_log_count
+        else:
+            self.mean_elo = self.mean_rating = 0.0
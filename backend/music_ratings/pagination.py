@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class RatingHistoryPagination(CursorPagination):
+    """
+    Newest comparisons first. Keyset pagination on the (user, id) index, so deep
+    pages cost the same as the first and no count query is needed.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import Rating
-from music_logs.serializers import SongLogSerializer
+from .models import Rating, InsertionSession, TrackLeaderboardEntry
+from .services import RatingService
+from music_logs.models import SongLog
+from music_logs.serializers import SongLogSerializer, SongLogFastSerializer
 
 class RatingSerializer(serializers.ModelSerializer):
     # Include full song log details when retrieving ratings
@@ -16,4 +18,95 @@ class RatingSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Automatically set the user to the current user
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data) 
+
+class FlatRatingSerializer(serializers.ModelSerializer):
+    # Song logs as IDs, for clients that already have the user's songs
+    class Meta:
+        model = Rating
+        fields = ['id', 'song_log', 'compared_song_log', 'winner_song_log', 'created_at']
+        read_only_fields = fields
+
+class RankedSongLogSerializer(SongLogSerializer):
+    rank = serializers.IntegerField(read_only=True)
+    percentile = serializers.SerializerMethodField()
+
+    class Meta(SongLogSerializer.Meta):
+        fields = SongLogSerializer.Meta.fields + ['rank', 'percentile']
+
+    def get_percentile(self, obj):
+        # Share of the user's other songs ranked below this one, 0-100
+        return round(obj.percentile * 100, 1)
+
+
+class RankedSongLogFastSerializer(SongLogFastSerializer):
+    """
+    Read-only RankedSongLogSerializer over RatingService.get_ranked_songs rows
+    """
+    fields = SongLogFastSerializer.fields + [
+        ('rank', 'rank'),
+        ('percentile', 'percentile', lambda percentile: round(percentile * 100, 1)),
+    ]
+
+
+class InsertionSessionSerializer(serializers.ModelSerializer):
+    song = serializers.SerializerMethodField()
+    next_comparison = serializers.SerializerMethodField()
+    comparisons_made = serializers.SerializerMethodField()
+    max_comparisons = serializers.IntegerField(read_only=True)
+    seeded_elo_rating = serializers.SerializerMethodField()
+
+    class Meta:
+        model = InsertionSession
+        fields = [
+            'id', 'song_log', 'song', 'status', 'next_comparison', 'comparisons_made',
+            'max_comparisons', 'final_position', 'seeded_elo_rating', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+    def get_song(self, obj):
+        return RatingService.song_summary(obj.song_log)
+
+    def get_next_comparison(self, obj):
+        compared_song_log_id = obj.next_compared_song_log_id
+        if compared_song_log_id is None:
+            return None
+        compared_song_log = SongLog.objects.filter(id=compared_song_log_id).first()
+        if compared_song_log is None:
+            return None
+        return {
+            'song_log_id': obj.song_log_id,
+            'compared_song_log_id': compared_song_log_id,
+            'compared_song': RatingService.song_summary(compared_song_log)
+        }
+
+    def get_comparisons_made(self, obj):
+        return len(obj.steps)
+
+    def get_seeded_elo_rating(self, obj):
+        # Only meaningful once the song has been placed
+        return obj.song_log.elo_rating if not obj.is_active else None
+
+
+class TrackLeaderboardEntrySerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='track.title', read_only=True)
+    artist = serializers.CharField(source='track.artist', read_only=True)
+    album = serializers.CharField(source='track.album', read_only=True)
+    spotify_id = serializers.CharField(source='track.spotify_id', read_only=True)
+    album_art_url = serializers.URLField(source='track.album_art_url', read_only=True)
+    mean_rating = serializers.SerializerMethodField()
+    mean_elo = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrackLeaderboardEntry
+        fields = [
+            'track', 'title', 'artist', 'album', 'spotify_id', 'album_art_url',
+            'logger_count', 'song_log_count', 'mean_rating', 'mean_elo', 'last_logged_at'
+        ]
+        read_only_fields = fields
+
+    def get_mean_rating(self, obj):
+        return round(obj.mean_rating, 2)
+
+    def get_mean_elo(self, obj):
+        return round(obj.mean_elo, 1)
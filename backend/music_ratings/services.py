@@ -1,8 +1,19 @@
+import logging
 import math
-from typing import Tuple, Dict, Any
-from django.db import transaction, models
-from .models import Rating
-from music_logs.models import SongLog
+import threading
+from typing import Tuple, Dict, Any, Iterable, Optional
+from django.utils.dateparse import parse_datetime
+from django.conf import settings
+from django.db import transaction, models, connection
+from django.db.models import F, Q, Window, Count, Sum, Max
+from django.db.models.functions import Rank, PercentRank, RowNumber
+from django.utils import timezone
+from .models import Rating, InsertionSession, UserRatingStats, EloCheckpoint, TrackLeaderboardEntry
+from music_logs.models import SongLog, Track, elo_to_rating, elo_to_rating_expression
+from core.memoize import memoize, USER
+from user_management.services import DataVersionService
+
+logger = logging.getLogger(__name__)
 
 class EloRatingService:
     """
@@ -13,6 +24,20 @@ class EloRatingService:
     K_FACTOR = 32  # Maximum rating change per game
     INITIAL_RATING = 1500.0
     
+    # Adaptive K-factor (settings.ELO_ADAPTIVE_K_FACTOR): K shrinks from K_FACTOR towards
+    # MIN_K_FACTOR as a song is compared more, halving after K_FACTOR_HALF_LIFE comparisons
+    MIN_K_FACTOR = 10
+    K_FACTOR_HALF_LIFE = 20
+    
+    @classmethod
+    def get_k_factor(cls, comparisons: int = 0) -> float:
+        """
+        Get the K-factor for a song that has been compared `comparisons` times
+        """
+        if not getattr(settings, 'ELO_ADAPTIVE_K_FACTOR', False):
+            return cls.K_FACTOR
+        return max(cls.MIN_K_FACTOR, cls.K_FACTOR * cls.K_FACTOR_HALF_LIFE / (cls.K_FACTOR_HALF_LIFE + comparisons))
+    
     @classmethod
     def calculate_expected_score(cls, rating_a: float, rating_b: float) -> float:
         """
@@ -21,14 +46,18 @@ class EloRatingService:
         return 1.0 / (1.0 + math.pow(10, (rating_b - rating_a) / 400.0))
     
     @classmethod
-    def calculate_new_rating(cls, current_rating: float, expected_score: float, actual_score: float) -> float:
+    def calculate_new_rating(cls, current_rating: float, expected_score: float, actual_score: float,
+                             k_factor: Optional[float] = None) -> float:
         """
         Calculate new rating based on expected vs actual score
         """
-        return current_rating + cls.K_FACTOR * (actual_score - expected_score)
+        if k_factor is None:
+            k_factor = cls.K_FACTOR
+        return current_rating + k_factor * (actual_score - expected_score)
     
     @classmethod
-    def update_ratings(cls, winner_rating: float, loser_rating: float) -> Tuple[float, float]:
+    def update_ratings(cls, winner_rating: float, loser_rating: float,
+                       winner_comparisons: int = 0, loser_comparisons: int = 0) -> Tuple[float, float]:
         """
         Update ELO ratings for winner and loser
         Returns: (new_winner_rating, new_loser_rating)
@@ -38,8 +67,12 @@ class EloRatingService:
         loser_expected = cls.calculate_expected_score(loser_rating, winner_rating)
         
         # Calculate new ratings
-        new_winner_rating = cls.calculate_new_rating(winner_rating, winner_expected, 1.0)
-        new_loser_rating = cls.calculate_new_rating(loser_rating, loser_expected, 0.0)
+        new_winner_rating = cls.calculate_new_rating(
+            winner_rating, winner_expected, 1.0, cls.get_k_factor(winner_comparisons)
+        )
+        new_loser_rating = cls.calculate_new_rating(
+            loser_rating, loser_expected, 0.0, cls.get_k_factor(loser_comparisons)
+        )
         
         return new_winner_rating, new_loser_rating
 
@@ -53,7 +86,13 @@ class RatingService:
         """
         Create a new rating comparison and update ELO ratings
         """
+        if EloWriteBehindService.is_enabled():
+            return EloWriteBehindService.record_rating(user, song_log_id, compared_song_log_id, winner_song_log_id)
+        
         with transaction.atomic():
+            # Serialize rating writes per user on their stats row
+            stats = RatingStatsService.lock(user)
+            
             # Get the song logs
             song_log = SongLog.objects.get(id=song_log_id, user=user)
             compared_song_log = SongLog.objects.get(id=compared_song_log_id, user=user)
@@ -68,15 +107,15 @@ class RatingService:
             # Update ELO ratings
             new_winner_rating, new_loser_rating = EloRatingService.update_ratings(
                 winner_song_log.elo_rating,
-                loser_song_log.elo_rating
+                loser_song_log.elo_rating,
+                winner_song_log.comparisons,
+                loser_song_log.comparisons
             )
             
-            # Save the new ratings
-            winner_song_log.elo_rating = new_winner_rating
-            winner_song_log.save()
-            
-            loser_song_log.elo_rating = new_loser_rating
-            loser_song_log.save()
+            elo_changes = [
+                (winner_song_log, winner_song_log.elo_rating),
+                (loser_song_log, loser_song_log.elo_rating)
+            ]
             
             # Create the rating record
             rating = Rating.objects.create(
@@ -86,6 +125,64 @@ class RatingService:
                 winner_song_log=winner_song_log
             )
             
+            # Save the new ratings, counters are incremented in the database. The songs
+            # are stamped with the rating's time, as a replay of the history would
+            compared_at = rating.created_at
+            SongLog.objects.filter(id=winner_song_log.id).update(
+                elo_rating=new_winner_rating,
+                comparisons=F('comparisons') + 1,
+                wins=F('wins') + 1,
+                last_compared_at=compared_at
+            )
+            SongLog.objects.filter(id=loser_song_log.id).update(
+                elo_rating=new_loser_rating,
+                comparisons=F('comparisons') + 1,
+                last_compared_at=compared_at
+            )
+            
+            winner_song_log.elo_rating = new_winner_rating
+            winner_song_log.comparisons += 1
+            winner_song_log.wins += 1
+            winner_song_log.last_compared_at = compared_at
+            
+            loser_song_log.elo_rating = new_loser_rating
+            loser_song_log.comparisons += 1
+            loser_song_log.last_compared_at = compared_at
+            
+            RatingStatsService.rating_added(user, elo_changes)
+            
+            if (stats.total_ratings + 1) % EloHistoryService.get_checkpoint_interval() == 0:
+                EloHistoryService.create_checkpoint(user, rating.id)
+            
+            return rating
+    
+    @classmethod
+    def delete_rating(cls, rating: Rating) -> None:
+        """
+        Delete a rating and revert the ELO changes it caused
+        """
+        with transaction.atomic():
+            RatingStatsService.lock(rating.user)
+            # The write-behind applier may have applied it since it was loaded
+            rating.refresh_from_db(fields=['elo_applied'])
+            rating_id = rating.id
+            rating.delete()
+            EloHistoryService.replay_from(rating.user, rating_id)
+    
+    @classmethod
+    def update_rating_winner(cls, rating: Rating, winner_song_log_id: int) -> Rating:
+        """
+        Change which song won a comparison and recompute the ELO ratings from that point
+        """
+        if winner_song_log_id not in [rating.song_log_id, rating.compared_song_log_id]:
+            raise ValueError('winner_song_log_id must be one of the compared songs')
+        
+        with transaction.atomic():
+            RatingStatsService.lock(rating.user)
+            if rating.winner_song_log_id != winner_song_log_id:
+                rating.winner_song_log_id = winner_song_log_id
+                rating.save(update_fields=['winner_song_log'])
+                EloHistoryService.replay_from(rating.user, rating.id)
             return rating
     
     @classmethod
@@ -93,8 +190,8 @@ class RatingService:
         """
         Get a random pair of songs for comparison
         """
-        # Get songs that haven't been compared yet
-        user_songs = SongLog.objects.filter(user=user).order_by('?')[:10]
+        # Prefer the least compared songs, their ratings are the least certain
+        user_songs = SongLog.objects.filter(user=user).select_related('track').order_by('comparisons', '?')[:10]
         
         if len(user_songs) < 2:
             return None
@@ -106,52 +203,138 @@ class RatingService:
                 song2 = user_songs[j]
                 
                 # Check if this pair has already been rated
-                existing_rating = Rating.objects.filter(
+                # Served by the (user, song_log, compared_song_log) unique index
+                already_rated = Rating.objects.filter(
                     user=user,
                     song_log__in=[song1, song2],
                     compared_song_log__in=[song1, song2]
-                ).first()
+                ).exists()
                 
-                if not existing_rating:
+                if not already_rated:
                     return {
-                        'song1': {
-                            'id': song1.id,
-                            'title': song1.song_title,
-                            'artist': song1.artist,
-                            'album': song1.album,
-                            'album_art_url': song1.album_art_url,
-                            'elo_rating': song1.elo_rating,
-                            'date': song1.date
-                        },
-                        'song2': {
-                            'id': song2.id,
-                            'title': song2.song_title,
-                            'artist': song2.artist,
-                            'album': song2.album,
-                            'album_art_url': song2.album_art_url,
-                            'elo_rating': song2.elo_rating,
-                            'date': song2.date
-                        }
+                        'song1': cls.song_summary(song1),
+                        'song2': cls.song_summary(song2)
                     }
         
         return None
     
+    @staticmethod
+    def song_summary(song_log: SongLog) -> Dict[str, Any]:
+        """
+        Compact representation of a song used by the comparison screens
+        """
+        return {
+            'id': song_log.id,
+            'title': song_log.track.title,
+            'artist': song_log.track.artist,
+            'album': song_log.track.album,
+            'album_art_url': song_log.track.album_art_url,
+            'elo_rating': song_log.elo_rating,
+            'comparisons': song_log.comparisons,
+            'date': song_log.date
+        }
+    
+    RANKINGS_PAGE_SIZE = 50
+    MAX_RANKINGS_PAGE_SIZE = 200
+    
     @classmethod
-    def get_user_rankings(cls, user) -> list:
+    def get_ranked_songs(cls, user) -> models.QuerySet:
         """
-        Get user's songs ranked by ELO rating
+        Get user's songs ranked by ELO rating, with rank numbers computed in the database.
+        `position` is a unique row number, ties are broken by id.
         """
-        return SongLog.objects.filter(user=user).order_by('-elo_rating')
+        return SongLog.objects.filter(user=user).select_related('track').with_rating().annotate(
+            rank=Window(Rank(), order_by=F('elo_rating').desc()),
+            percentile=Window(PercentRank(), order_by=F('elo_rating').asc()),
+            position=Window(RowNumber(), order_by=[F('elo_rating').desc(), F('id').desc()])
+        ).order_by('position')
     
     @classmethod
+    @memoize(scope=USER)
+    def get_user_rankings(cls, user, cursor: Optional[str] = None, page_size: int = RANKINGS_PAGE_SIZE,
+                          values: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Get one page of the user's rankings, the first one or the one `cursor` from
+        a previous page points at. Cursors are keyed on the (elo_rating, id) of the
+        song the page continues from, so songs rated or removed between requests
+        never make a page skip or repeat a song. Raises ValueError for an invalid cursor.
+        With `values`, results are .values() dicts of those lookups instead of SongLogs.
+        """
+        songs = cls.get_ranked_songs(user)
+        backwards = False
+        if cursor is not None:
+            backwards, elo_rating, song_id = cls.parse_rankings_cursor(cursor)
+            if backwards:
+                ranked = Q(elo_rating__gt=elo_rating) | Q(elo_rating=elo_rating, id__gt=song_id)
+            else:
+                ranked = Q(elo_rating__lt=elo_rating) | Q(elo_rating=elo_rating, id__lt=song_id)
+            # The position condition never holds, but as part of the OR it makes the ORM apply
+            # the whole filter to the ranked query wrapped in a subquery, so ranks are still
+            # computed over the whole library and not just the songs after the cursor
+            songs = songs.filter(ranked | Q(position__lt=1))
+            if backwards:
+                songs = songs.order_by('-position')
+        if values is not None:
+            songs = songs.values(*dict.fromkeys(['position', 'elo_rating', 'id', *values]))
+        songs = list(songs[:page_size + 1])
+        has_more = len(songs) > page_size
+        songs = songs[:page_size]
+        if backwards:
+            songs.reverse()
+        if not songs:
+            return {'results': [], 'next_cursor': None, 'previous_cursor': None}
+        
+        def key(song):
+            return (song['elo_rating'], song['id']) if values is not None else (song.elo_rating, song.id)
+        
+        def position(song):
+            return song['position'] if values is not None else song.position
+        
+        # A backward page was fetched from a song that comes after it
+        has_next = has_more if not backwards else True
+        has_previous = has_more if backwards else position(songs[0]) > 1
+        return {
+            'results': songs,
+            'next_cursor': cls.rankings_cursor(*key(songs[-1])) if has_next else None,
+            'previous_cursor': cls.rankings_cursor(*key(songs[0]), backwards=True) if has_previous else None
+        }
+    
+    @staticmethod
+    def rankings_cursor(elo_rating: float, song_id: int, backwards: bool = False) -> str:
+        """
+        Cursor of the rankings page right after the song with this ELO rating and
+        id, or right before it when `backwards`
+        """
+        return f"{'b' if backwards else 'a'}{elo_rating!r}_{song_id}"
+    
+    @staticmethod
+    def parse_rankings_cursor(cursor: str) -> Tuple[bool, float, int]:
+        """
+        (backwards, elo_rating, song_id) of a rankings cursor, ValueError if it isn't one
+        """
+        direction, elo_rating, song_id = cursor[:1], *cursor[1:].split('_')
+        if direction not in ('a', 'b') or not math.isfinite(float(elo_rating)):
+            raise ValueError('Invalid rankings cursor')
+        return direction == 'b', float(elo_rating), int(song_id)
+    
+    @classmethod
+    def get_song_cursor(cls, user, song_log_id: int) -> str:
+        """
+        Cursor of the rankings page that starts with the given song
+        """
+        song_log = SongLog.objects.only('id', 'elo_rating').get(id=song_log_id, user=user)
+        # Right after a song that would rank just above it, ids being integers
+        return cls.rankings_cursor(song_log.elo_rating, song_log.id + 1)
+    
+    @classmethod
+    @memoize(scope=USER)
     def get_rating_stats(cls, user) -> Dict[str, Any]:
         """
         Get rating statistics for a user
         """
-        total_ratings = Rating.objects.filter(user=user).count()
-        total_songs = SongLog.objects.filter(user=user).count()
+        stats = RatingStatsService.get(user)
         
-        if total_songs == 0:
+        if stats.total_songs == 0:
             return {
                 'total_ratings': 0,
                 'total_songs': 0,
@@ -160,24 +343,858 @@ class RatingService:
                 'lowest_rated_song': None
             }
         
-        songs = SongLog.objects.filter(user=user)
-        # Calculate average using 1-10 scale ratings instead of raw ELO
-        avg_rating = sum(song.rating for song in songs) / total_songs if total_songs > 0 else 0
-        highest_rated = songs.order_by('-elo_rating').first()
-        lowest_rated = songs.order_by('elo_rating').first()
+        highest_rated = stats.highest_rated_song
+        lowest_rated = stats.lowest_rated_song
+        avg_rating = stats.avg_rating
         
         return {
-            'total_ratings': total_ratings,
-            'total_songs': total_songs,
+            'total_ratings': stats.total_ratings,
+            'total_songs': stats.total_songs,
             'avg_rating': round(avg_rating, 2) if avg_rating else 0,
             'highest_rated_song': {
-                'title': highest_rated.song_title,
-                'artist': highest_rated.artist,
-                'rating': highest_rated.rating  # Use 1-10 scale rating
+                'title': highest_rated.track.title,
+                'artist': highest_rated.track.artist,
+                'rating': highest_rated.rating,  # Use 1-10 scale rating
+                'comparisons': highest_rated.comparisons,
+                'wins': highest_rated.wins
             } if highest_rated else None,
             'lowest_rated_song': {
-                'title': lowest_rated.song_title,
-                'artist': lowest_rated.artist,
-                'rating': lowest_rated.rating  # Use 1-10 scale rating
+                'title': lowest_rated.track.title,
+                'artist': lowest_rated.track.artist,
+                'rating': lowest_rated.rating,  # Use 1-10 scale rating
+                'comparisons': lowest_rated.comparisons,
+                'wins': lowest_rated.wins
             } if lowest_rated else None
-        } 
\ No newline at end of file
+        }
+
+
+class RatingStatsService:
+    """
+    Service for maintaining the per-user UserRatingStats row.
+    Writers call these hooks inside their transaction; the row is locked with
+    SELECT ... FOR UPDATE so concurrent writes for the same user apply in order.
+    """
+    
+    @classmethod
+    def get(cls, user) -> UserRatingStats:
+        """
+        Fetch the user's stats row, building it the first time it is needed
+        """
+        try:
+            return UserRatingStats.objects.select_related(
+                'highest_rated_song__track', 'lowest_rated_song__track'
+            ).get(pk=user.pk)
+        except UserRatingStats.DoesNotExist:
+            return cls.rebuild(user)
+    
+    @classmethod
+    def rebuild(cls, user) -> UserRatingStats:
+        """
+        Recompute the user's stats row from scratch
+        """
+        return cls._rebuild(user.pk)
+    
+    @classmethod
+    def _rebuild(cls, user_id: int) -> UserRatingStats:
+        songs = SongLog.objects.filter(user_id=user_id)
+        totals = songs.aggregate(
+            total_songs=Count('id'),
+            rating_sum=Sum(elo_to_rating_expression())
+        )
+        
+        stats, _ = UserRatingStats.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                # Buffered write-behind comparisons are counted when the applier runs
+                'total_ratings': Rating.objects.filter(user_id=user_id, elo_applied=True).count(),
+                'total_songs': totals['total_songs'],
+                'rating_sum': totals['rating_sum'] or 0.0,
+                'highest_rated_song': songs.order_by('-elo_rating').first(),
+                'lowest_rated_song': songs.order_by('elo_rating').first(),
+            }
+        )
+        return stats
+    
+    @classmethod
+    def lock(cls, user) -> UserRatingStats:
+        """
+        Lock the user's stats row for the rest of the current transaction,
+        creating it first so writers always have a row to serialize on
+        """
+        return cls._lock(user.pk, create_missing=True)
+    
+    @classmethod
+    def _lock(cls, user_id: int, create_missing: bool = False) -> Optional[UserRatingStats]:
+        rows = UserRatingStats.objects.select_for_update().select_related('highest_rated_song', 'lowest_rated_song')
+        stats = rows.filter(pk=user_id).first()
+        if stats is None and create_missing:
+            # A concurrent writer may create it first, then only one of them builds it
+            _, created = UserRatingStats.objects.get_or_create(user_id=user_id)
+            if created:
+                cls._rebuild(user_id)
+            stats = rows.filter(pk=user_id).first()
+        return stats
+    
+    @classmethod
+    def song_added(cls, song_log: SongLog) -> None:
+        cls._apply(
+            song_log.user_id,
+            songs_delta=1,
+            rating_sum_delta=song_log.rating,
+            changed_songs=[song_log]
+        )
+    
+    @classmethod
+    def song_removed(cls, song_log: SongLog) -> None:
+        # Rows are never created while deleting, the user may be going away too
+        cls._apply(
+            song_log.user_id,
+            songs_delta=-1,
+            rating_sum_delta=-song_log.rating,
+            removed_song_id=song_log.id,
+            create_missing=False
+        )
+    
+    @classmethod
+    def rating_added(cls, user, elo_changes: Iterable[Tuple[SongLog, float]]) -> None:
+        cls.elo_changed(user.pk, elo_changes, ratings_delta=1)
+    
+    @classmethod
+    def rating_removed(cls, user_id: int) -> None:
+        cls._apply(user_id, ratings_delta=-1, create_missing=False)
+    
+    @classmethod
+    def elo_changed(cls, user_id: int, elo_changes: Iterable[Tuple[SongLog, float]], ratings_delta: int = 0) -> None:
+        """
+        Apply ELO updates that were already saved. `elo_changes` holds
+        (song_log with its new elo_rating, previous elo_rating) pairs.
+        """
+        elo_changes = list(elo_changes)
+        cls._apply(
+            user_id,
+            ratings_delta=ratings_delta,
+            rating_sum_delta=sum(
+                song_log.rating - elo_to_rating(old_elo_rating)
+                for song_log, old_elo_rating in elo_changes
+            ),
+            changed_songs=[song_log for song_log, _ in elo_changes]
+        )
+        # Every ELO write comes through here, so the community leaderboard follows along
+        LeaderboardService.elo_changed(elo_changes)
+        DataVersionService.bump(user_id, global_results=False)
+    
+    @classmethod
+    def _apply(cls, user_id: int, songs_delta: int = 0, ratings_delta: int = 0, rating_sum_delta: float = 0.0,
+               changed_songs: Iterable[SongLog] = (), removed_song_id: Optional[int] = None,
+               create_missing: bool = True) -> None:
+        with transaction.atomic():
+            stats = cls._lock(user_id)
+            if stats is None:
+                if create_missing:
+                    # The changes are already saved, so a rebuild includes them
+                    cls._rebuild(user_id)
+                return
+            
+            stats.total_songs = max(stats.total_songs + songs_delta, 0)
+            stats.total_ratings = max(stats.total_ratings + ratings_delta, 0)
+            stats.rating_sum = stats.rating_sum + rating_sum_delta if stats.total_songs else 0.0
+            
+            changed_songs = list(changed_songs)
+            stats.highest_rated_song = cls._pick_extreme(
+                user_id, stats.highest_rated_song, changed_songs, removed_song_id, highest=True
+            )
+            stats.lowest_rated_song = cls._pick_extreme(
+                user_id, stats.lowest_rated_song, changed_songs, removed_song_id, highest=False
+            )
+            stats.save()
+    
+    @classmethod
+    def _pick_extreme(cls, user_id: int, current: Optional[SongLog], changed_songs: list,
+                      removed_song_id: Optional[int], highest: bool) -> Optional[SongLog]:
+        """
+        Keep the highest or lowest rated song up to date. Only falls back to an
+        index lookup when the current extreme was removed or was itself changed.
+        """
+        changed_ids = {song_log.id for song_log in changed_songs}
+        if current is None or current.id == removed_song_id or current.id in changed_ids:
+            ordering = '-elo_rating' if highest else 'elo_rating'
+            return SongLog.objects.filter(user_id=user_id).order_by(ordering).first()
+        
+        for song_log in changed_songs:
+            if (song_log.elo_rating > current.elo_rating) if highest else (song_log.elo_rating < current.elo_rating):
+                current = song_log
+        return current
+
+class LeaderboardService:
+    """
+    Service for the community track leaderboard. Entries hold running sums that
+    writers adjust inside their transaction, locking the affected entries in track
+    order so concurrent writes to the same track apply one after the other.
+    """
+    
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    RECONCILE_BATCH_SIZE = 1000
+    
+    @classmethod
+    def get_page(cls, after: Optional[int] = None, page_size: int = PAGE_SIZE, min_loggers: int = 1) -> Dict[str, Any]:
+        """
+        Get one page of the leaderboard, starting after the entry for track `after`.
+        Keyset pagination on the leaderboard index, so deep pages cost the same as the first.
+        """
+        entries = TrackLeaderboardEntry.objects.select_related('track').filter(logger_count__gte=min_loggers)
+        if after is not None:
+            cursor = TrackLeaderboardEntry.objects.only('mean_rating', 'logger_count').get(pk=after)
+            entries = entries.filter(
+                Q(mean_rating__lt=cursor.mean_rating) |
+                Q(mean_rating=cursor.mean_rating, logger_count__lt=cursor.logger_count) |
+                Q(mean_rating=cursor.mean_rating, logger_count=cursor.logger_count, track_id__lt=after)
+            )
+        
+        entries = list(entries.order_by('-mean_rating', '-logger_count', '-track_id')[:page_size + 1])
+        has_next = len(entries) > page_size
+        entries = entries[:page_size]
+        
+        return {
+            'results': entries,
+            'next_cursor': entries[-1].track_id if has_next else None
+        }
+    
+    @classmethod
+    def song_added(cls, song_log: SongLog) -> None:
+        cls._add(song_log.track_id, song_log)
+    
+    @classmethod
+    def song_removed(cls, song_log: SongLog) -> None:
+        cls._remove(song_log.track_id, song_log)
+    
+    @classmethod
+    def track_changed(cls, song_log: SongLog, old_track_id: int) -> None:
+        """
+        Move a song log whose metadata now points at another track
+        """
+        with transaction.atomic():
+            cls._remove(old_track_id, song_log)
+            cls._add(song_log.track_id, song_log)
+    
+    @classmethod
+    def elo_changed(cls, elo_changes: Iterable[Tuple[SongLog, float]]) -> None:
+        """
+        Apply ELO updates that were already saved, as (song_log, previous elo_rating) pairs
+        """
+        deltas = {}
+        for song_log, old_elo_rating in elo_changes:
+            elo_delta, rating_delta = deltas.get(song_log.track_id, (0.0, 0.0))
+            deltas[song_log.track_id] = (
+                elo_delta + song_log.elo_rating - old_elo_rating,
+                rating_delta + song_log.rating - elo_to_rating(old_elo_rating)
+            )
+        if not deltas:
+            return
+        
+        with transaction.atomic():
+            entries = cls._lock(deltas)
+            for track_id, (elo_delta, rating_delta) in deltas.items():
+                entry = entries.get(track_id)
+                if entry is None:
+                    cls._rebuild(track_id)
+                    continue
+                entry.elo_sum += elo_delta
+                entry.rating_sum += rating_delta
+                entry.set_means()
+                entry.updated_at = timezone.now()
+            TrackLeaderboardEntry.objects.bulk_update(
+                entries.values(), ['elo_sum', 'rating_sum', 'mean_elo', 'mean_rating', 'updated_at']
+            )
+    
+    @classmethod
+    def reconcile(cls, track_ids: Optional[Iterable[int]] = None) -> Dict[str, int]:
+        """
+        Recompute the entries from the song logs, fixing any drift in the running
+        sums. Covers every track unless `track_ids` is given, in batches that each
+        run in their own transaction.
+        """
+        counts = {'created': 0, 'updated': 0, 'deleted': 0}
+        if track_ids is None:
+            batches = cls._all_track_batches()
+        else:
+            track_ids = sorted(set(track_ids))
+            batches = (
+                track_ids[start:start + cls.RECONCILE_BATCH_SIZE]
+                for start in range(0, len(track_ids), cls.RECONCILE_BATCH_SIZE)
+            )
+        
+        for batch in batches:
+            with transaction.atomic():
+                entries = cls._lock(batch)
+                totals = {row['track_id']: row for row in cls._aggregate(batch)}
+                
+                created, updated = [], []
+                for track_id, row in totals.items():
+                    entry = entries.pop(track_id, None)
+                    if entry is None:
+                        entry = TrackLeaderboardEntry(**row)
+                        entry.set_means()
+                        created.append(entry)
+                    elif cls._differs(entry, row):
+                        for field, value in row.items():
+                            setattr(entry, field, value)
+                        entry.set_means()
+                        entry.updated_at = timezone.now()
+                        updated.append(entry)
+                
+                # Entries left over belong to tracks nobody has logged anymore
+                if entries:
+                    TrackLeaderboardEntry.objects.filter(pk__in=entries.keys()).delete()
+                # A concurrent writer may have created an entry meanwhile, its values are current
+                TrackLeaderboardEntry.objects.bulk_create(created, ignore_conflicts=True)
+                TrackLeaderboardEntry.objects.bulk_update(
+                    updated,
+                    ['logger_count', 'song_log_count', 'elo_sum', 'rating_sum', 'mean_elo',
+                     'mean_rating', 'last_logged_at', 'updated_at']
+                )
+            
+            counts['created'] += len(created)
+            counts['updated'] += len(updated)
+            counts['deleted'] += len(entries)
+        return counts
+    
+    @classmethod
+    def _all_track_batches(cls) -> Iterable[list]:
+        track_ids = Track.objects.order_by('id').values_list('id', flat=True)
+        last_id = 0
+        while True:
+            batch = list(track_ids.filter(id__gt=last_id)[:cls.RECONCILE_BATCH_SIZE])
+            if not batch:
+                return
+            last_id = batch[-1]
+            yield batch
+    
+    @classmethod
+    def _add(cls, track_id: int, song_log: SongLog) -> None:
+        with transaction.atomic():
+            entry = cls._lock([track_id]).get(track_id)
+            if entry is None:
+                # The log is already saved, so a rebuild includes it
+                cls._rebuild(track_id)
+                return
+            
+            entry.song_log_count += 1
+            if not cls._logged_elsewhere(track_id, song_log):
+                entry.logger_count += 1
+            entry.elo_sum += song_log.elo_rating
+            entry.rating_sum += song_log.rating
+            if entry.last_logged_at is None or song_log.created_at > entry.last_logged_at:
+                entry.last_logged_at = song_log.created_at
+            entry.set_means()
+            entry.save()
+    
+    @classmethod
+    def _remove(cls, track_id: int, song_log: SongLog) -> None:
+        with transaction.atomic():
+            entry = cls._lock([track_id]).get(track_id)
+            if entry is None:
+                return
+            
+            entry.song_log_count = max(entry.song_log_count - 1, 0)
+            if not entry.song_log_count:
+                entry.delete()
+                return
+            
+            if not cls._logged_elsewhere(track_id, song_log):
+                entry.logger_count = max(entry.logger_count - 1, 0)
+            entry.elo_sum -= song_log.elo_rating
+            entry.rating_sum -= song_log.rating
+            if entry.last_logged_at == song_log.created_at:
+                entry.last_logged_at = SongLog.objects.filter(track_id=track_id).aggregate(
+                    latest=Max('created_at')
+                )['latest']
+            entry.set_means()
+            entry.save()
+    
+    @classmethod
+    def _lock(cls, track_ids: Iterable[int]) -> Dict[int, TrackLeaderboardEntry]:
+        return {
+            entry.track_id: entry
+            for entry in TrackLeaderboardEntry.objects.select_for_update().filter(
+                track_id__in=list(track_ids)
+            ).order_by('track_id')
+        }
+    
+    @classmethod
+    def _rebuild(cls, track_id: int) -> None:
+        row = next(iter(cls._aggregate([track_id])), None)
+        if row is None:
+            TrackLeaderboardEntry.objects.filter(pk=track_id).delete()
+            return
+        
+        entry = TrackLeaderboardEntry(**row)
+        entry.set_means()
+        TrackLeaderboardEntry.objects.update_or_create(
+            track_id=track_id,
+            defaults={
+                field.name: getattr(entry, field.name)
+                for field in TrackLeaderboardEntry._meta.concrete_fields
+                if not field.primary_key
+            }
+        )
+    
+    @classmethod
+    def _aggregate(cls, track_ids: Iterable[int]) -> models.QuerySet:
+        return SongLog.objects.filter(track_id__in=list(track_ids)).order_by().values('track_id').annotate(
+            logger_count=Count('user', distinct=True),
+            song_log_count=Count('id'),
+            elo_sum=Sum('elo_rating'),
+            rating_sum=Sum(elo_to_rating_expression()),
+            last_logged_at=Max('created_at')
+        )
+    
+    @staticmethod
+    def _logged_elsewhere(track_id: int, song_log: SongLog) -> bool:
+        # Whether the user has another log of the track, so stays counted as a logger
+        return SongLog.objects.filter(track_id=track_id, user_id=song_log.user_id).exclude(id=song_log.id).exists()
+    
+    @staticmethod
+    def _differs(entry: TrackLeaderboardEntry, row: Dict[str, Any]) -> bool:
+        return (
+            entry.logger_count != row['logger_count'] or
+            entry.song_log_count != row['song_log_count'] or
+            entry.last_logged_at != row['last_logged_at'] or
+            not math.isclose(entry.elo_sum, row['elo_sum'], abs_tol=1e-6) or
+            not math.isclose(entry.rating_sum, row['rating_sum'], abs_tol=1e-6)
+        )
+
+class InsertionService:
+    """
+    Service for placing a new song into a user's rankings with a binary search.
+    Each answer halves the remaining range, so a library of n songs needs at most
+    ceil(log2(n + 1)) comparisons instead of many random pairings.
+    """
+    
+    # ELO gap used when the song is placed above the top or below the bottom song
+    PLACEMENT_MARGIN = EloRatingService.K_FACTOR / 2
+    
+    @classmethod
+    def start_session(cls, user, song_log_id: int) -> InsertionSession:
+        """
+        Start (or resume) an insertion session for one of the user's songs
+        """
+        with transaction.atomic():
+            song_log = SongLog.objects.select_for_update().get(id=song_log_id, user=user)
+            
+            existing = InsertionSession.objects.filter(
+                song_log=song_log,
+                status=InsertionSession.STATUS_ACTIVE
+            ).first()
+            if existing:
+                return existing
+            
+            ranked_song_ids = list(
+                SongLog.objects.filter(user=user)
+                .exclude(id=song_log.id)
+                .order_by('-elo_rating', 'id')
+                .values_list('id', flat=True)
+            )
+            
+            session = InsertionSession.objects.create(
+                user=user,
+                song_log=song_log,
+                ranked_song_ids=ranked_song_ids,
+                low=0,
+                high=len(ranked_song_ids)
+            )
+            
+            if not ranked_song_ids:
+                # Nothing to compare against, the song keeps its current rating
+                cls._complete(session)
+            
+            return session
+    
+    @classmethod
+    def record_comparison(cls, user, session_id: int, winner_song_log_id: int) -> InsertionSession:
+        """
+        Record the answer to the session's current comparison and narrow the search range
+        """
+        with transaction.atomic():
+            session = InsertionSession.objects.select_for_update().get(id=session_id, user=user)
+            
+            if not session.is_active:
+                raise ValueError('This insertion session is already completed')
+            
+            compared_song_log_id = session.next_compared_song_log_id
+            if winner_song_log_id not in [session.song_log_id, compared_song_log_id]:
+                raise ValueError('winner_song_log_id must be one of the compared songs')
+            
+            won = winner_song_log_id == session.song_log_id
+            mid = (session.low + session.high) // 2
+            
+            # The ranked list is ordered from highest to lowest ELO:
+            # winning moves the search towards the top, losing towards the bottom
+            if won:
+                session.high = mid
+            else:
+                session.low = mid + 1
+            
+            session.steps = session.steps + [{
+                'compared_song_log': compared_song_log_id,
+                'won': won
+            }]
+            
+            if session.low >= session.high:
+                cls._complete(session)
+            else:
+                session.save()
+            
+            return session
+    
+    @classmethod
+    def song_removed(cls, song_log: SongLog) -> None:
+        """
+        Drop a deleted song from the user's active sessions, completing the ones
+        it was the last song left to compare against
+        """
+        with transaction.atomic():
+            sessions = InsertionSession.objects.select_for_update().filter(
+                user_id=song_log.user_id,
+                status=InsertionSession.STATUS_ACTIVE
+            ).exclude(song_log_id=song_log.id)
+            for session in sessions:
+                if song_log.id not in session.ranked_song_ids:
+                    continue
+                
+                # Positions after the song move up by one, keep the search range on the same songs
+                index = session.ranked_song_ids.index(song_log.id)
+                session.ranked_song_ids = [i for i in session.ranked_song_ids if i != song_log.id]
+                if index < session.low:
+                    session.low -= 1
+                if index < session.high:
+                    session.high -= 1
+                
+                if session.low >= session.high:
+                    cls._complete(session)
+                else:
+                    session.save()
+    
+    @classmethod
+    def _complete(cls, session: InsertionSession) -> None:
+        """
+        Seed the song's ELO rating from its final position between its neighbours.
+        Only songs without any comparison are seeded: the rating history replays
+        from initial_elo, which must be where the song's first comparison started.
+        """
+        position = session.low
+        ranked_song_ids = session.ranked_song_ids
+        above_id = ranked_song_ids[position - 1] if position > 0 else None
+        below_id = ranked_song_ids[position] if position < len(ranked_song_ids) else None
+        
+        # Use the neighbours' current ratings, they may have moved since the session started
+        neighbour_ratings = dict(
+            SongLog.objects.filter(id__in=[i for i in (above_id, below_id) if i is not None])
+            .values_list('id', 'elo_rating')
+        )
+        above_rating = neighbour_ratings.get(above_id)
+        below_rating = neighbour_ratings.get(below_id)
+        
+        if above_rating is not None and below_rating is not None:
+            seeded_rating = (above_rating + below_rating) / 2
+        elif above_rating is not None:
+            seeded_rating = above_rating - cls.PLACEMENT_MARGIN
+        elif below_rating is not None:
+            seeded_rating = below_rating + cls.PLACEMENT_MARGIN
+        else:
+            seeded_rating = None
+        
+        song_log = SongLog.objects.get(id=session.song_log_id)
+        if seeded_rating is not None and not Rating.objects.filter(
+            Q(song_log=song_log) | Q(compared_song_log=song_log)
+        ).exists():
+            previous_rating = song_log.elo_rating
+            song_log.elo_rating = seeded_rating
+            song_log.initial_elo = seeded_rating
+            song_log.save(update_fields=['elo_rating', 'initial_elo'])
+            RatingStatsService.elo_changed(session.user_id, [(song_log, previous_rating)])
+        
+        session.status = InsertionSession.STATUS_COMPLETED
+        session.final_position = position
+        session.save()
+
+
+class EloHistoryService:
+    """
+    Service for rebuilding ELO ratings from the rating history.
+    Checkpoints are taken every ELO_CHECKPOINT_INTERVAL ratings so a deleted or
+    edited rating only needs the ratings after the nearest checkpoint replayed.
+    """
+    
+    DEFAULT_CHECKPOINT_INTERVAL = 100
+    # Older checkpoints are pruned, rollbacks before them replay from the start
+    MAX_CHECKPOINTS_PER_USER = 10
+    
+    @classmethod
+    def get_checkpoint_interval(cls) -> int:
+        return getattr(settings, 'ELO_CHECKPOINT_INTERVAL', cls.DEFAULT_CHECKPOINT_INTERVAL)
+    
+    @classmethod
+    def create_checkpoint(cls, user, last_rating_id: int) -> EloCheckpoint:
+        """
+        Snapshot the current state of all the user's songs
+        """
+        song_states = {
+            str(song_id): [elo_rating, comparisons, wins, last_compared_at.isoformat() if last_compared_at else None]
+            for song_id, elo_rating, comparisons, wins, last_compared_at in SongLog.objects.filter(user=user)
+            .values_list('id', 'elo_rating', 'comparisons', 'wins', 'last_compared_at')
+        }
+        checkpoint = EloCheckpoint.objects.create(
+            user=user,
+            last_rating_id=last_rating_id,
+            song_states=song_states
+        )
+        cls._prune_checkpoints(user)
+        return checkpoint
+    
+    @classmethod
+    def _prune_checkpoints(cls, user) -> None:
+        stale_ids = EloCheckpoint.objects.filter(user=user).order_by('-last_rating_id').values_list(
+            'id', flat=True
+        )[cls.MAX_CHECKPOINTS_PER_USER:]
+        EloCheckpoint.objects.filter(id__in=list(stale_ids)).delete()
+    
+    @classmethod
+    def replay_from(cls, user, rating_id: int) -> int:
+        """
+        Recompute the user's song ratings after the history changed at `rating_id`:
+        restore the nearest checkpoint before it and replay the ratings that follow.
+        Returns the number of ratings replayed.
+        """
+        with transaction.atomic():
+            # Checkpoints taken at or after the changed rating no longer match the history
+            EloCheckpoint.objects.filter(user=user, last_rating_id__gte=rating_id).delete()
+            checkpoint = EloCheckpoint.objects.filter(
+                user=user, last_rating_id__lt=rating_id
+            ).order_by('-last_rating_id').first()
+            return cls._replay(user, checkpoint)
+    
+    @classmethod
+    def rebuild(cls, user) -> int:
+        """
+        Replay the user's whole rating history from the songs' initial ratings,
+        recreating the checkpoints along the way. Returns the number of ratings replayed.
+        """
+        with transaction.atomic():
+            RatingStatsService.lock(user)
+            EloCheckpoint.objects.filter(user=user).delete()
+            replayed = cls._replay(user, None, checkpoint_interval=cls.get_checkpoint_interval())
+            cls._prune_checkpoints(user)
+            return replayed
+    
+    @classmethod
+    def _replay(cls, user, checkpoint: Optional[EloCheckpoint], checkpoint_interval: Optional[int] = None) -> int:
+        songs = {song_log.id: song_log for song_log in SongLog.objects.filter(user=user)}
+        snapshot = checkpoint.song_states if checkpoint else {}
+        
+        # Songs logged after the checkpoint start from their initial state, and so do
+        # songs not compared before it: their initial_elo may have been seeded since
+        states = {}
+        for song_id, song_log in songs.items():
+            saved = snapshot.get(str(song_id))
+            if saved and saved[1] > 0:
+                elo_rating, comparisons, wins, last_compared_at = saved
+                states[song_id] = [elo_rating, comparisons, wins, parse_datetime(last_compared_at) if last_compared_at else None]
+            else:
+                states[song_id] = [song_log.initial_elo, 0, 0, None]
+        
+        suffix = Rating.objects.filter(user=user).order_by('id').values_list(
+            'id', 'song_log_id', 'compared_song_log_id', 'winner_song_log_id', 'created_at'
+        )
+        if checkpoint:
+            suffix = suffix.filter(id__gt=checkpoint.last_rating_id)
+        
+        replayed = 0
+        for rating_id, song_log_id, compared_song_log_id, winner_id, created_at in suffix.iterator(chunk_size=2000):
+            loser_id = compared_song_log_id if winner_id == song_log_id else song_log_id
+            winner, loser = states[winner_id], states[loser_id]
+            winner[0], loser[0] = EloRatingService.update_ratings(winner[0], loser[0], winner[1], loser[1])
+            winner[1] += 1
+            winner[2] += 1
+            loser[1] += 1
+            winner[3] = loser[3] = created_at
+            replayed += 1
+            
+            if checkpoint_interval and replayed % checkpoint_interval == 0:
+                EloCheckpoint.objects.create(
+                    user=user,
+                    last_rating_id=rating_id,
+                    song_states={
+                        str(song_id): [state[0], state[1], state[2], state[3].isoformat() if state[3] else None]
+                        for song_id, state in states.items()
+                    }
+                )
+        
+        elo_changes = []
+        changed_songs = []
+        for song_id, (elo_rating, comparisons, wins, last_compared_at) in states.items():
+            song_log = songs[song_id]
+            if (song_log.elo_rating, song_log.comparisons, song_log.wins, song_log.last_compared_at) != (
+                elo_rating, comparisons, wins, last_compared_at
+            ):
+                elo_changes.append((song_log, song_log.elo_rating))
+                song_log.elo_rating = elo_rating
+                song_log.comparisons = comparisons
+                song_log.wins = wins
+                song_log.last_compared_at = last_compared_at
+                changed_songs.append(song_log)
+        
+        SongLog.objects.bulk_update(
+            changed_songs, ['elo_rating', 'comparisons', 'wins', 'last_compared_at'], batch_size=500
+        )
+        
+        # Buffered ratings were part of the replay, they are now applied and counted
+        newly_applied = Rating.objects.filter(user=user, elo_applied=False).update(elo_applied=True)
+        RatingStatsService.elo_changed(user.pk, elo_changes, ratings_delta=newly_applied)
+        
+        return replayed
+
+
+class EloWriteBehindService:
+    """
+    Optional write-behind mode for ELO updates (settings.ELO_WRITE_BEHIND).
+    Comparisons are stored right away with elo_applied=False and a background
+    applier replays them in micro-batches per user, writing each batch of song
+    updates with one bulk_update instead of locking hot rows on every request.
+    Readers call flush(user) first to see their own comparisons.
+    """
+    
+    _timer = None
+    _timer_lock = threading.Lock()
+    
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return getattr(settings, 'ELO_WRITE_BEHIND', False)
+    
+    @classmethod
+    def record_rating(cls, user, song_log_id: int, compared_song_log_id: int, winner_song_log_id: int) -> Rating:
+        """
+        Durably store a comparison and leave the ELO update to the applier
+        """
+        song_log_id, compared_song_log_id, winner_song_log_id = (
+            int(song_log_id), int(compared_song_log_id), int(winner_song_log_id)
+        )
+        if winner_song_log_id not in [song_log_id, compared_song_log_id]:
+            raise ValueError('winner_song_log_id must be one of the compared songs')
+        
+        with transaction.atomic():
+            songs = SongLog.objects.in_bulk([song_log_id, compared_song_log_id])
+            if len(songs) != 2 or any(song.user_id != user.pk for song in songs.values()):
+                raise SongLog.DoesNotExist('SongLog matching query does not exist.')
+            
+            rating = Rating.objects.create(
+                user=user,
+                song_log=songs[song_log_id],
+                compared_song_log=songs[compared_song_log_id],
+                winner_song_log=songs[winner_song_log_id],
+                elo_applied=False
+            )
+            transaction.on_commit(cls.schedule_flush)
+            
+            return rating
+    
+    @classmethod
+    def schedule_flush(cls) -> None:
+        """
+        Start the applier timer unless one is already pending, so bursts of
+        comparisons are coalesced into a single flush
+        """
+        with cls._timer_lock:
+            if cls._timer is not None:
+                return
+            cls._timer = threading.Timer(getattr(settings, 'ELO_WRITE_BEHIND_FLUSH_INTERVAL', 0.5), cls._run_scheduled_flush)
+            cls._timer.daemon = True
+            cls._timer.start()
+    
+    @classmethod
+    def _run_scheduled_flush(cls) -> None:
+        with cls._timer_lock:
+            cls._timer = None
+        try:
+            cls.flush()
+        except Exception as e:
+            # Pending ratings stay in the table and are picked up by the next flush
+            logger.error("Error applying buffered ELO updates: %s", str(e), exc_info=True)
+        finally:
+            connection.close()
+    
+    @classmethod
+    def has_pending(cls, user) -> bool:
+        return Rating.objects.filter(user=user, elo_applied=False).exists()
+    
+    @classmethod
+    def flush(cls, user=None) -> int:
+        """
+        Apply all pending comparisons, optionally only the given user's.
+        Returns the number of comparisons applied.
+        """
+        pending = Rating.objects.filter(elo_applied=False)
+        if user is not None:
+            pending = pending.filter(user=user)
+        user_ids = list(pending.order_by().values_list('user_id', flat=True).distinct())
+        
+        applied = 0
+        for user_id in user_ids:
+            while True:
+                batch_applied = cls._apply_batch(user_id)
+                applied += batch_applied
+                if batch_applied < cls._batch_size():
+                    break
+        return applied
+    
+    @classmethod
+    def _batch_size(cls) -> int:
+        return getattr(settings, 'ELO_WRITE_BEHIND_BATCH_SIZE', 500)
+    
+    @classmethod
+    def _apply_batch(cls, user_id: int) -> int:
+        with transaction.atomic():
+            stats = RatingStatsService._lock(user_id, create_missing=True)
+            
+            pending = list(
+                Rating.objects.filter(user_id=user_id, elo_applied=False).order_by('id').values_list(
+                    'id', 'song_log_id', 'compared_song_log_id', 'winner_song_log_id', 'created_at'
+                )[:cls._batch_size()]
+            )
+            if not pending:
+                return 0
+            
+            song_ids = set()
+            for _, song_log_id, compared_song_log_id, _, _ in pending:
+                song_ids.update((song_log_id, compared_song_log_id))
+            songs = SongLog.objects.in_bulk(song_ids)
+            previous_ratings = {song_id: song_log.elo_rating for song_id, song_log in songs.items()}
+            
+            # Coalesce: every comparison is applied in memory, each song is written once
+            for _, song_log_id, compared_song_log_id, winner_id, created_at in pending:
+                winner = songs[winner_id]
+                loser = songs[compared_song_log_id if winner_id == song_log_id else song_log_id]
+                winner.elo_rating, loser.elo_rating = EloRatingService.update_ratings(
+                    winner.elo_rating, loser.elo_rating, winner.comparisons, loser.comparisons
+                )
+                winner.comparisons += 1
+                winner.wins += 1
+                loser.comparisons += 1
+                winner.last_compared_at = loser.last_compared_at = created_at
+            
+            SongLog.objects.bulk_update(
+                songs.values(), ['elo_rating', 'comparisons', 'wins', 'last_compared_at'], batch_size=500
+            )
+            Rating.objects.filter(id__in=[rating_id for rating_id, *_ in pending]).update(elo_applied=True)
+            RatingStatsService.elo_changed(
+                user_id,
+                [(song_log, previous_ratings[song_id]) for song_id, song_log in songs.items()],
+                ratings_delta=len(pending)
+            )
+            
+            # Take a checkpoint if this batch crossed a checkpoint boundary
+            interval = EloHistoryService.get_checkpoint_interval()
+            if (stats.total_ratings + len(pending)) // interval > stats.total_ratings // interval:
+                EloHistoryService.create_checkpoint(stats.user, pending[-1][0])
+            
+            return len(pending)
@@ -0,0 +1,46 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from music_logs.models import SongLog
+from music_logs.signals import song_logs_imported
+from user_management.services import DataVersionService
+from .models import Rating
+from .services import RatingStatsService, LeaderboardService, InsertionService
+
+
+@receiver(post_save, sender=SongLog)
+def song_log_saved(sender, instance, created, **kwargs):
+    if created:
+        RatingStatsService.song_added(instance)
+        LeaderboardService.song_added(instance)
+        return
+
+    # Set by music_logs.signals.song_log_saving
+    stored_track_id = getattr(instance, '_stored_track_id', None)
+    if stored_track_id is not None and stored_track_id != instance.track_id:
+        LeaderboardService.track_changed(instance, stored_track_id)
+
+
+@receiver(post_delete, sender=SongLog)
+def song_log_deleted(sender, instance, **kwargs):
+    RatingStatsService.song_removed(instance)
+    LeaderboardService.song_removed(instance)
+    InsertionService.song_removed(instance)
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, **kwargs):
+    DataVersionService.bump(instance.user_id, global_results=False)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    # Buffered comparisons are only counted once the write-behind applier ran
+    if instance.elo_applied:
+        RatingStatsService.rating_removed(instance.user_id)
+    DataVersionService.bump(instance.user_id, global_results=False)
+
+
+@receiver(song_logs_imported)
+def song_logs_bulk_imported(sender, user, track_ids, **kwargs):
+    RatingStatsService.rebuild(user)
+    LeaderboardService.reconcile(track_ids)
@@ -1,3 +1,789 @@
-from django.test import TestCase
+import time
+from importlib import import_module
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from core.memoize import USER, get_cache, memoize
+from core.testing import AggregateConsistencyMixin, EndpointBudgetMixin, QueryPlanMixin, create_rated_users, create_user_with_songs
+from music_logs.models import RATING_MAX_ELO, RATING_MIN_ELO, SongLog, Track, elo_to_rating
+from music_logs.services import SocialFeedService
+from .models import EloCheckpoint, Rating, TrackLeaderboardEntry, UserRatingStats
+from .serializers import RankedSongLogSerializer
+from .services import EloHistoryService, EloRatingService, EloWriteBehindService, InsertionService, LeaderboardService, RatingService, RatingStatsService
 
-# Create your tests here.
+
+class RatingQueryPlanTests(QueryPlanMixin, TestCase):
+    """
+    Every rating endpoint reads SongLog and Rating through an index
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user_with_songs(f'user{i}', song_count=8) for i in range(3)]
+        for user in cls.users:
+            song_ids = list(user.song_logs.order_by('id').values_list('id', flat=True))
+            for song_log_id, compared_song_log_id in zip(song_ids, song_ids[1:]):
+                RatingService.create_rating(user, song_log_id, compared_song_log_id, song_log_id)
+        cls.song_ids = list(cls.users[0].song_logs.order_by('id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def assertEndpointUsesIndexes(self, url):
+        with self.assertUsesIndexes():
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def test_ratings_list(self):
+        self.assertEndpointUsesIndexes('/api/ratings/')
+
+    def test_comparison_pair(self):
+        self.assertEndpointUsesIndexes('/api/ratings/comparison_pair/')
+
+    def test_create_comparison(self):
+        with self.assertUsesIndexes():
+            response = self.client.post('/api/ratings/create_comparison/', {
+                'song_log_id': self.song_ids[0],
+                'compared_song_log_id': self.song_ids[2],
+                'winner_song_log_id': self.song_ids[2]
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_rankings(self):
+        cursor = RatingService.get_song_cursor(self.users[0], self.song_ids[3])
+        self.assertEndpointUsesIndexes(f'/api/ratings/rankings/?page_size=3&cursor={cursor}')
+
+    def test_rankings_jump_to_song(self):
+        self.assertEndpointUsesIndexes(f'/api/ratings/rankings/?page_size=3&song_id={self.song_ids[4]}')
+
+    def test_stats(self):
+        self.assertEndpointUsesIndexes('/api/ratings/stats/')
+
+    def test_insertion_sessions(self):
+        self.assertEndpointUsesIndexes('/api/insertion-sessions/')
+
+    def test_leaderboard(self):
+        response = self.assertEndpointUsesIndexes('/api/leaderboard/?page_size=2')
+        self.assertEndpointUsesIndexes(response.data['next'])
+
+
+class RatingEndpointBudgetTests(EndpointBudgetMixin, TestCase):
+    """
+    Query count and latency budgets of the rating endpoints
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_rated_users(user_count=10, song_count=30, rating_count=40)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def get(self, url):
+        return lambda i: self.client.get(url)
+
+    def test_comparison_pair(self):
+        # Up to one lookup per candidate pair until an unrated one is found
+        self.assertEndpointBudget('comparison_pair', 5, self.get('/api/ratings/comparison_pair/'))
+
+    def test_create_comparison(self):
+        rated = set(self.users[0].ratings.values_list('song_log_id', 'compared_song_log_id'))
+        song_ids = sorted(self.users[0].song_logs.values_list('id', flat=True))
+        unrated = [
+            (a, b) for i, a in enumerate(song_ids) for b in song_ids[i + 1:]
+            if (a, b) not in rated and (b, a) not in rated
+        ]
+
+        def create_comparison(i):
+            song_log_id, compared_song_log_id = unrated[i]
+            return self.client.post('/api/ratings/create_comparison/', {
+                'song_log_id': song_log_id,
+                'compared_song_log_id': compared_song_log_id,
+                'winner_song_log_id': song_log_id
+            }, format='json')
+
+        # Includes bumping the user's data version for the rating and for the ELO update
+        self.assertEndpointBudget('create_comparison', 23, create_comparison, expected_status=201)
+
+    def test_rankings(self):
+        self.assertEndpointBudget('rankings', 1, self.get('/api/ratings/rankings/?page_size=20'))
+
+    def test_stats(self):
+        self.assertEndpointBudget('stats', 1, self.get('/api/ratings/stats/'))
+
+    def test_ratings_list(self):
+        # One page, with the nested song logs and tracks joined in
+        self.assertEndpointBudget('ratings', 1, self.get('/api/ratings/'))
+
+    def test_ratings_list_flat(self):
+        self.assertEndpointBudget('ratings_flat', 1, self.get('/api/ratings/?flat=1'))
+
+
+class RatingHistoryTests(TestCase):
+    """
+    The ratings list is cursor paginated, newest first, with nested song logs or flat IDs
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_rated_users(1, 8, 12)[0]
+        cls.rating_ids = list(cls.user.ratings.order_by('-id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_pages(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            # Keyset pagination, there is no count
+            self.assertEqual(set(page), {'next', 'previous', 'results'})
+            pages.append(page['results'])
+            url = page['next']
+        return pages
+
+    def test_flat(self):
+        pages = self.get_pages('/api/ratings/?flat=1&page_size=5')
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        results = [rating for page in pages for rating in page]
+        self.assertEqual([rating['id'] for rating in results], self.rating_ids)
+
+        ratings = Rating.objects.in_bulk(self.rating_ids)
+        for result in results:
+            rating = ratings[result['id']]
+            self.assertEqual(set(result), {'id', 'song_log', 'compared_song_log', 'winner_song_log', 'created_at'})
+            self.assertEqual(
+                (result['song_log'], result['compared_song_log'], result['winner_song_log']),
+                (rating.song_log_id, rating.compared_song_log_id, rating.winner_song_log_id)
+            )
+
+    def test_nested(self):
+        pages = self.get_pages('/api/ratings/?page_size=5')
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        results = [rating for page in pages for rating in page]
+        self.assertEqual([rating['id'] for rating in results], self.rating_ids)
+
+        rating = Rating.objects.select_related('winner_song_log__track').get(pk=results[0]['id'])
+        self.assertEqual(results[0]['winner_song_log']['id'], rating.winner_song_log_id)
+        self.assertEqual(results[0]['winner_song_log']['song_title'], rating.winner_song_log.track.title)
+
+
+class RatingStatsTests(AggregateConsistencyMixin, TestCase):
+    """
+    The incrementally maintained UserRatingStats match a full aggregate after every kind of write
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = create_rated_users(2, 8, 12)
+
+    def test_ratings(self):
+        self.assertRatingStatsConsistent(self.user)
+        song_ids = list(self.user.song_logs.order_by('id').values_list('id', flat=True))
+        rated = set(self.user.ratings.values_list('song_log_id', 'compared_song_log_id'))
+        unrated = next((a, b) for a in song_ids for b in song_ids if a < b and (a, b) not in rated)
+        RatingService.create_rating(self.user, *unrated, unrated[1])
+        self.assertRatingStatsConsistent(self.user)
+
+    def test_rating_rollback(self):
+        ratings = list(self.user.ratings.order_by('id'))
+        RatingService.delete_rating(ratings[5])
+        self.assertRatingStatsConsistent(self.user)
+
+        rating = ratings[3]
+        loser_id = rating.compared_song_log_id if rating.winner_song_log_id == rating.song_log_id else rating.song_log_id
+        RatingService.update_rating_winner(rating, loser_id)
+        self.assertRatingStatsConsistent(self.user)
+
+        EloHistoryService.rebuild(self.user)
+        self.assertRatingStatsConsistent(self.user)
+
+    def test_song_logs(self):
+        highest = self.user.song_logs.order_by('-elo_rating').first()
+        highest.delete()
+        self.assertRatingStatsConsistent(self.user)
+
+        SongLog.objects.create(user=self.user, track=highest.track, date=highest.date)
+        self.assertRatingStatsConsistent(self.user)
+        self.assertRatingStatsConsistent(self.other)
+
+    def test_missing_row(self):
+        # Users from before the stats table have no row until something locks it
+        UserRatingStats.objects.filter(user=self.user).delete()
+        with transaction.atomic():
+            stats = RatingStatsService.lock(self.user)
+        self.assertEqual(stats.pk, self.user.pk)
+        self.assertRatingStatsConsistent(self.user)
+
+        UserRatingStats.objects.filter(user=self.user).delete()
+        RatingService.delete_rating(self.user.ratings.order_by('id').last())
+        self.assertRatingStatsConsistent(self.user)
+
+    def test_empty_library(self):
+        self.user.song_logs.all().delete()
+        self.assertRatingStatsConsistent(self.user)
+        self.assertEqual(RatingService.get_rating_stats(self.user)['avg_rating'], 0)
+
+
+class DatabaseRatingTests(TestCase):
+    """
+    Ratings computed by the database match elo_to_rating, including at the rounding edges
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user_with_songs('user0', song_count=1)
+
+    def test_bucket_edges(self):
+        track = self.user.song_logs.get().track
+        # Every ELO rating where the 1-10 rating rounds up to the next tenth, and just around it
+        edges = [RATING_MIN_ELO + (tenth + 0.5) * (RATING_MAX_ELO - RATING_MIN_ELO) / 90 for tenth in range(90)]
+        elo_ratings = [RATING_MIN_ELO, RATING_MAX_ELO, 0.0, 5000.0] + [
+            edge + offset for edge in edges for offset in (-1e-9, 0.0, 1e-9)
+        ]
+        SongLog.objects.bulk_create(
+            SongLog(user=self.user, track=track, date=date(2024, 1, 1), elo_rating=elo_rating)
+            for elo_rating in elo_ratings
+        )
+        for elo_rating, db_rating in SongLog.objects.with_rating().values_list('elo_rating', 'db_rating'):
+            self.assertEqual(db_rating, elo_to_rating(elo_rating), elo_rating)
+
+    def test_changed_elo_rating(self):
+        song_log = SongLog.objects.with_rating().get(user=self.user)
+        self.assertEqual(song_log.rating, song_log.db_rating)
+        song_log.elo_rating = RATING_MAX_ELO
+        self.assertEqual(song_log.rating, 10.0)
+
+
+class ComparisonCounterTests(TestCase):
+    """
+    SongLog comparison counters agree with the rating history, and drive the adaptive K-factor
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_rated_users(1, 8, 15)[0]
+
+    def assertCountersMatchRatings(self):
+        ratings = list(self.user.ratings.values_list('song_log_id', 'compared_song_log_id', 'winner_song_log_id'))
+        for song_log in self.user.song_logs.all():
+            compared = [rating for rating in ratings if song_log.id in rating[:2]]
+            self.assertEqual(song_log.comparisons, len(compared))
+            self.assertEqual(song_log.wins, sum(rating[2] == song_log.id for rating in compared))
+            self.assertEqual(song_log.last_compared_at is not None, bool(compared))
+
+    def test_counters(self):
+        self.assertCountersMatchRatings()
+        RatingService.delete_rating(self.user.ratings.order_by('id')[3])
+        self.assertCountersMatchRatings()
+
+    def test_least_compared_songs_first(self):
+        pair = RatingService.get_comparison_pair(self.user)
+        fewest = min(self.user.song_logs.values_list('comparisons', flat=True))
+        self.assertEqual(min(pair['song1']['comparisons'], pair['song2']['comparisons']), fewest)
+
+    def test_k_factor(self):
+        self.assertEqual(EloRatingService.get_k_factor(100), EloRatingService.K_FACTOR)
+        with override_settings(ELO_ADAPTIVE_K_FACTOR=True):
+            self.assertEqual(EloRatingService.get_k_factor(0), EloRatingService.K_FACTOR)
+            self.assertEqual(EloRatingService.get_k_factor(EloRatingService.K_FACTOR_HALF_LIFE), EloRatingService.K_FACTOR / 2)
+            self.assertEqual(EloRatingService.get_k_factor(10000), EloRatingService.MIN_K_FACTOR)
+            # A song compared often moves less than a new one
+            winner, loser = EloRatingService.update_ratings(1500, 1500, winner_comparisons=0, loser_comparisons=60)
+            self.assertGreater(winner - 1500, 1500 - loser)
+
+
+@override_settings(ELO_CHECKPOINT_INTERVAL=5)
+class EloHistoryTests(AggregateConsistencyMixin, TestCase):
+    """
+    Rolling back part of the rating history leaves every song where a full replay puts it
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with override_settings(ELO_CHECKPOINT_INTERVAL=5):
+            cls.user = create_rated_users(1, 10, 22)[0]
+
+    def song_states(self):
+        return {
+            song_log.id: (round(song_log.elo_rating, 9), song_log.comparisons, song_log.wins, song_log.last_compared_at)
+            for song_log in SongLog.objects.filter(user=self.user)
+        }
+
+    def assertMatchesRebuild(self):
+        states = self.song_states()
+        EloHistoryService.rebuild(self.user)
+        self.assertEqual(self.song_states(), states)
+        self.assertRatingStatsConsistent(self.user)
+
+    def checkpoint_rating_ids(self):
+        return sorted(EloCheckpoint.objects.filter(user=self.user).values_list('last_rating_id', flat=True))
+
+    def test_incremental_matches_rebuild(self):
+        self.assertEqual(len(self.checkpoint_rating_ids()), 4)
+        self.assertMatchesRebuild()
+
+    def test_delete_after_checkpoint(self):
+        rating = self.user.ratings.order_by('id')[12]
+        checkpoints = [rating_id for rating_id in self.checkpoint_rating_ids() if rating_id < rating.id]
+        RatingService.delete_rating(rating)
+        # Checkpoints before the deleted rating survive, the later ones are dropped
+        self.assertEqual(self.checkpoint_rating_ids(), checkpoints)
+        self.assertEqual(len(checkpoints), 2)
+        self.assertMatchesRebuild()
+
+    def test_edit_before_every_checkpoint(self):
+        rating = self.user.ratings.order_by('id')[1]
+        loser_id = rating.compared_song_log_id if rating.winner_song_log_id == rating.song_log_id else rating.song_log_id
+        RatingService.update_rating_winner(rating, loser_id)
+        self.assertEqual(self.checkpoint_rating_ids(), [])
+        self.assertMatchesRebuild()
+
+    def test_pruning(self):
+        with override_settings(ELO_CHECKPOINT_INTERVAL=1):
+            EloHistoryService.rebuild(self.user)
+        rating_ids = list(self.user.ratings.order_by('id').values_list('id', flat=True))
+        self.assertEqual(self.checkpoint_rating_ids(), rating_ids[-EloHistoryService.MAX_CHECKPOINTS_PER_USER:])
+
+        # Older ratings than the oldest checkpoint replay from the start
+        RatingService.delete_rating(Rating.objects.get(id=rating_ids[2]))
+        self.assertMatchesRebuild()
+
+    def test_insertion_seed_survives_rollback(self):
+        song_log = SongLog.objects.create(user=self.user, track=Track.objects.first(), date=date(2024, 2, 1))
+        # A checkpoint taken while the new song is still unplaced
+        EloHistoryService.create_checkpoint(self.user, self.user.ratings.latest('id').id)
+        session = InsertionService.start_session(self.user, song_log.id)
+        while session.is_active:
+            session = InsertionService.record_comparison(self.user, session.id, song_log.id)
+        song_log.refresh_from_db()
+        self.assertEqual(session.final_position, 0)
+        self.assertEqual(song_log.initial_elo, song_log.elo_rating)
+        self.assertGreater(song_log.elo_rating, 1500)
+
+        # Compared after the seed, then the history after the checkpoint changes
+        song_ids = list(self.user.song_logs.exclude(id=song_log.id).order_by('id').values_list('id', flat=True))
+        rated = set(self.user.ratings.values_list('song_log_id', 'compared_song_log_id'))
+        unrated = next((a, b) for a in song_ids for b in song_ids if a < b and (a, b) not in rated)
+        RatingService.create_rating(self.user, song_log.id, song_ids[0], song_ids[0])
+        rating = RatingService.create_rating(self.user, *unrated, unrated[0])
+        RatingService.delete_rating(rating)
+        song_log.refresh_from_db()
+        self.assertEqual(song_log.comparisons, 1)
+        self.assertMatchesRebuild()
+
+        # Placing a compared song again doesn't rewrite where its history started
+        seeded_elo = song_log.initial_elo
+        session = InsertionService.start_session(self.user, song_log.id)
+        while session.is_active:
+            session = InsertionService.record_comparison(self.user, session.id, session.next_compared_song_log_id)
+        song_log.refresh_from_db()
+        self.assertEqual(song_log.initial_elo, seeded_elo)
+        self.assertMatchesRebuild()
+
+
+@override_settings(ELO_WRITE_BEHIND=True, ELO_CHECKPOINT_INTERVAL=5)
+class EloWriteBehindTests(AggregateConsistencyMixin, TestCase):
+    """
+    Buffered comparisons are applied like synchronous ones, and readers see their own
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user_with_songs('user0', song_count=8)
+        cls.song_ids = list(cls.user.song_logs.order_by('id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def compare(self, count, start=0):
+        """
+        `count` comparisons of consecutive songs, the first song of each pair winning
+        """
+        pairs = list(zip(self.song_ids, self.song_ids[1:]))[start:start + count]
+        return [RatingService.create_rating(self.user, a, b, a) for a, b in pairs]
+
+    def song_states(self):
+        return {
+            song_log.id: (round(song_log.elo_rating, 9), song_log.comparisons, song_log.wins, song_log.last_compared_at)
+            for song_log in SongLog.objects.filter(user=self.user)
+        }
+
+    def test_buffered(self):
+        rating, = self.compare(1)
+        self.assertFalse(rating.elo_applied)
+        self.assertEqual(SongLog.objects.get(id=self.song_ids[0]).comparisons, 0)
+        self.assertTrue(EloWriteBehindService.has_pending(self.user))
+        self.assertRatingStatsConsistent(self.user)
+
+    def test_flush(self):
+        self.compare(6)
+        self.assertEqual(EloWriteBehindService.flush(), 6)
+        self.assertFalse(Rating.objects.filter(user=self.user, elo_applied=False).exists())
+        self.assertRatingStatsConsistent(self.user)
+        self.assertEqual(EloWriteBehindService.flush(), 0)
+        # The batch crossed a checkpoint boundary
+        self.assertTrue(EloCheckpoint.objects.filter(user=self.user).exists())
+
+        states = self.song_states()
+        EloHistoryService.rebuild(self.user)
+        self.assertEqual(self.song_states(), states)
+
+    @override_settings(ELO_WRITE_BEHIND_BATCH_SIZE=2)
+    def test_flush_in_batches(self):
+        self.compare(5)
+        self.assertEqual(EloWriteBehindService.flush(user=self.user), 5)
+        self.assertRatingStatsConsistent(self.user)
+
+    def test_read_your_writes(self):
+        self.assertEqual(self.client.get('/api/ratings/stats/').json()['total_ratings'], 0)
+        response = self.client.post('/api/ratings/create_comparison/', {
+            'song_log_id': self.song_ids[3], 'compared_song_log_id': self.song_ids[4], 'winner_song_log_id': self.song_ids[3]
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.client.get('/api/ratings/stats/').json()['total_ratings'], 1)
+        self.compare(1, start=5)
+        rankings = self.client.get('/api/ratings/rankings/').json()['results']
+        self.assertEqual({song['id'] for song in rankings[:2]}, {self.song_ids[3], self.song_ids[5]})
+        self.assertFalse(EloWriteBehindService.has_pending(self.user))
+
+    def test_delete(self):
+        applied = self.compare(2)
+        EloWriteBehindService.flush()
+        pending = self.compare(2, start=2)
+
+        # Deleting a buffered comparison leaves the applied count alone
+        RatingService.delete_rating(pending[0])
+        self.assertRatingStatsConsistent(self.user)
+        RatingService.delete_rating(applied[0])
+        self.assertRatingStatsConsistent(self.user)
+        self.assertEqual(EloWriteBehindService.flush(), 0)
+
+    def test_stats_rebuilt_with_pending(self):
+        self.compare(3)
+        RatingStatsService.rebuild(self.user)
+        EloWriteBehindService.flush()
+        self.assertRatingStatsConsistent(self.user)
+
+
+class LeaderboardTests(AggregateConsistencyMixin, TestCase):
+    """
+    The leaderboard's running sums match a full aggregate of the song logs after every kind of write
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = create_rated_users(2, 6, 8)
+
+    def test_ratings(self):
+        self.assertLeaderboardConsistent()
+        RatingService.delete_rating(self.user.ratings.order_by('id')[2])
+        self.assertLeaderboardConsistent()
+
+    def test_song_logs(self):
+        song_log = self.user.song_logs.order_by('id').first()
+        # A second log of the same song by the same user doesn't add a logger
+        SongLog.objects.create(user=self.user, track=song_log.track, date=date(2024, 2, 1))
+        self.assertLeaderboardConsistent()
+        song_log.delete()
+        self.assertLeaderboardConsistent()
+
+        # The last log of a song removes its entry
+        track = Track.objects.create(title='Rare', artist='Someone')
+        SongLog.objects.create(user=self.user, track=track, date=date(2024, 2, 1)).delete()
+        self.assertFalse(TrackLeaderboardEntry.objects.filter(track=track).exists())
+        self.assertLeaderboardConsistent()
+
+    def test_track_moves(self):
+        song_log = self.user.song_logs.order_by('-elo_rating').first()
+        song_log.track = Track.objects.create(title='Moved', artist='Someone')
+        song_log.save()
+        self.assertLeaderboardConsistent()
+
+        song_log.track = self.other.song_logs.exclude(track=song_log.track).first().track
+        song_log.save()
+        self.assertLeaderboardConsistent()
+
+    def test_reconcile(self):
+        entry = TrackLeaderboardEntry.objects.order_by('track_id').first()
+        TrackLeaderboardEntry.objects.filter(pk=entry.pk).update(elo_sum=0, logger_count=9)
+        TrackLeaderboardEntry.objects.order_by('track_id').last().delete()
+        orphan = Track.objects.create(title='Nobody', artist='Someone')
+        TrackLeaderboardEntry.objects.create(track=orphan, song_log_count=1)
+
+        self.assertEqual(LeaderboardService.reconcile(), {'created': 1, 'updated': 1, 'deleted': 1})
+        self.assertLeaderboardConsistent()
+        self.assertEqual(LeaderboardService.reconcile(), {'created': 0, 'updated': 0, 'deleted': 0})
+
+    def test_migration(self):
+        populate_leaderboard = import_module('music_ratings.migrations.0009_populate_leaderboard').populate_leaderboard
+        TrackLeaderboardEntry.objects.all().delete()
+        populate_leaderboard(apps, None)
+        self.assertLeaderboardConsistent()
+
+
+class InsertionServiceTests(TestCase):
+    """
+    Binary-search placement finds the song's position in at most ceil(log2(n + 1)) answers
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user_with_songs('user0', song_count=8)
+        *ranked, cls.new_song = cls.user.song_logs.order_by('id')
+        # Distinct ratings, highest first
+        for i, song_log in enumerate(ranked):
+            SongLog.objects.filter(id=song_log.id).update(elo_rating=2000 - i * 100)
+        cls.ranked_ids = [song_log.id for song_log in ranked]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place(self, position):
+        """
+        Answer every comparison as if the song belonged at `position` in the rankings
+        """
+        session = InsertionService.start_session(self.user, self.new_song.id)
+        while session.is_active:
+            compared_id = session.next_compared_song_log_id
+            won = position <= self.ranked_ids.index(compared_id)
+            session = InsertionService.record_comparison(
+                self.user, session.id, self.new_song.id if won else compared_id
+            )
+        return session
+
+    def test_placement(self):
+        for position in range(len(self.ranked_ids) + 1):
+            with self.subTest(position=position):
+                session = self.place(position)
+                self.assertEqual(session.final_position, position)
+                self.assertLessEqual(len(session.steps), session.max_comparisons)
+                self.assertEqual(session.max_comparisons, 3)
+
+                elo_rating = SongLog.objects.get(id=self.new_song.id).elo_rating
+                if position > 0:
+                    self.assertLess(elo_rating, 2000 - (position - 1) * 100)
+                if position < len(self.ranked_ids):
+                    self.assertGreater(elo_rating, 2000 - position * 100)
+
+    def test_invalid_answers(self):
+        session = InsertionService.start_session(self.user, self.new_song.id)
+        with self.assertRaises(ValueError):
+            InsertionService.record_comparison(self.user, session.id, self.ranked_ids[-1])
+        session = self.place(0)
+        with self.assertRaises(ValueError):
+            InsertionService.record_comparison(self.user, session.id, self.new_song.id)
+
+    def test_deleted_song(self):
+        session = InsertionService.start_session(self.user, self.new_song.id)
+        deleted_id = session.next_compared_song_log_id
+        SongLog.objects.get(id=deleted_id).delete()
+        self.ranked_ids.remove(deleted_id)
+
+        session.refresh_from_db()
+        self.assertNotIn(deleted_id, session.ranked_song_ids)
+        self.assertIn(session.next_compared_song_log_id, self.ranked_ids)
+        response = self.client.get(f'/api/insertion-sessions/{session.id}/')
+        self.assertEqual(response.data['next_comparison']['compared_song_log_id'], session.next_compared_song_log_id)
+
+        # Deleting the last song left to compare against completes the session
+        session = InsertionService.record_comparison(self.user, session.id, self.new_song.id)
+        session = InsertionService.record_comparison(self.user, session.id, self.new_song.id)
+        SongLog.objects.get(id=session.next_compared_song_log_id).delete()
+        session.refresh_from_db()
+        self.assertFalse(session.is_active)
+        self.assertEqual(session.final_position, 0)
+
+    def test_api(self):
+        self.assertEqual(self.client.post('/api/insertion-sessions/', {'song_log_id': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/insertion-sessions/', {}).status_code, 400)
+        self.assertEqual(self.client.post('/api/insertion-sessions/', {'song_log_id': 0}).status_code, 404)
+
+        response = self.client.post('/api/insertion-sessions/', {'song_log_id': str(self.new_song.id)})
+        self.assertEqual(response.status_code, 201)
+        session_id = response.data['id']
+        url = f'/api/insertion-sessions/{session_id}/compare/'
+        self.assertEqual(self.client.post(url, {'winner_song_log_id': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/insertion-sessions/0/compare/', {'winner_song_log_id': 1}).status_code, 404)
+
+        # Form-encoded IDs are strings
+        response = self.client.post(url, {'winner_song_log_id': str(self.new_song.id)})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['comparisons_made'], 1)
+
+
+class RankingsFastSerializerTests(TestCase):
+    """
+    The rankings fast path renders exactly the bytes RankedSongLogSerializer did
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_rated_users(user_count=1, song_count=12, rating_count=30)[0]
+
+    def test_rankings_pages(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        ranked = list(RatingService.get_ranked_songs(self.user))
+        url = '/api/ratings/rankings/?page_size=5'
+        for start in (0, 5, 10):
+            response = client.get(url, HTTP_ACCEPT='application/json')
+            expected = JSONRenderer().render(RankedSongLogSerializer(ranked[start:start + 5], many=True).data)
+            results = response.content[response.content.index(b'"results":') + len(b'"results":'):-1]
+            self.assertEqual(results, expected)
+            url = response.json()['next']
+
+
+class RankingsPaginationTests(TestCase):
+    """
+    Rankings pages continue from the song a cursor points at, whatever was rated in between
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_rated_users(1, 12, 20)[0]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ranked_ids(self):
+        return list(RatingService.get_ranked_songs(self.user).values_list('id', flat=True))
+
+    def test_pages(self):
+        ranked_ids = self.ranked_ids()
+        first = self.get('/api/ratings/rankings/?page_size=5')
+        second = self.get(first['next'])
+        third = self.get(second['next'])
+        pages = [[song['id'] for song in page['results']] for page in (first, second, third)]
+        self.assertEqual(pages, [ranked_ids[:5], ranked_ids[5:10], ranked_ids[10:]])
+        self.assertIsNone(first['previous'])
+        self.assertIsNone(third['next'])
+
+        previous = self.get(third['previous'])
+        self.assertEqual([song['id'] for song in previous['results']], ranked_ids[5:10])
+        self.assertEqual([song['id'] for song in self.get(previous['previous'])['results']], ranked_ids[:5])
+
+    def test_changes_between_pages(self):
+        ranked_ids = self.ranked_ids()
+        first = self.get('/api/ratings/rankings/?page_size=5')
+        # With offset paging, the song moving up into the first page would be skipped
+        SongLog.objects.get(pk=ranked_ids[0]).delete()
+
+        seen = [song['id'] for song in first['results']]
+        url = first['next']
+        while url:
+            page = self.get(url)
+            seen += [song['id'] for song in page['results']]
+            url = page['next']
+        self.assertEqual(seen, ranked_ids)
+
+    def test_jump_to_song(self):
+        ranked_ids = self.ranked_ids()
+        page = self.get(f'/api/ratings/rankings/?page_size=4&song_id={ranked_ids[6]}')
+        self.assertEqual([song['id'] for song in page['results']], ranked_ids[6:10])
+        self.assertNotIn('song_id', page['next'])
+        self.assertEqual([song['id'] for song in self.get(page['previous'])['results']], ranked_ids[2:6])
+
+    def test_invalid_cursor(self):
+        for cursor in ('3', 'a1500.0', 'c1500.0_3', 'anan_3', 'a1500.0_x'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f'/api/ratings/rankings/?cursor={cursor}')
+                self.assertEqual(response.status_code, 400)
+
+
+class MemoizeTests(TestCase):
+    """
+    Memoized service results are served from the cache until a write bumps their generation
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_rated_users(3, 6, 5)
+
+    def setUp(self):
+        get_cache().clear()
+
+    def test_user_scope(self):
+        user, other = self.users[:2]
+        stats = RatingService.get_rating_stats(user)
+        with self.assertNumQueries(0):
+            self.assertEqual(RatingService.get_rating_stats(user), stats)
+
+        # Another user's comparison leaves the result cached
+        song_ids = list(other.song_logs.values_list('id', flat=True)[:2])
+        RatingService.create_rating(other, *song_ids, song_ids[0])
+        with self.assertNumQueries(0):
+            RatingService.get_rating_stats(user)
+
+        song_ids = list(user.song_logs.values_list('id', flat=True)[:2])
+        RatingService.create_rating(user, *song_ids, song_ids[0])
+        self.assertEqual(RatingService.get_rating_stats(user)['total_ratings'], stats['total_ratings'] + 1)
+
+    def test_arguments_in_key(self):
+        user = self.users[0]
+        first = RatingService.get_user_rankings(user, page_size=2)
+        with self.assertNumQueries(0):
+            RatingService.get_user_rankings(user, None, 2)
+        second = RatingService.get_user_rankings(user, cursor=first['next_cursor'], page_size=2)
+        self.assertNotEqual(first['results'][0].pk, second['results'][0].pk)
+
+    def test_global_scope(self):
+        user, other = self.users[:2]
+        similar = SocialFeedService.get_similar_users(user)
+        with self.assertNumQueries(0):
+            SocialFeedService.get_similar_users(user)
+
+        # Comparisons don't change who is similar
+        song_ids = list(other.song_logs.values_list('id', flat=True)[:2])
+        RatingService.create_rating(other, *song_ids, song_ids[0])
+        with self.assertNumQueries(0):
+            SocialFeedService.get_similar_users(user)
+
+        # Any user's new song can change who is similar
+        other.song_logs.first().delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(SocialFeedService.get_similar_users(user)), len(similar))
+        self.assertGreater(len(queries), 0)
+
+    def test_stampede(self):
+        user = self.users[0]
+        calls = []
+
+        def slow_stats(cls, user):
+            calls.append(user.pk)
+            time.sleep(0.2)
+            return {'total_ratings': 1}
+
+        memoized = classmethod(memoize(scope=USER)(slow_stats)).__get__(RatingService)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: memoized(user), range(4)))
+        self.assertEqual(calls, [user.pk])
+        self.assertEqual(results, [{'total_ratings': 1}] * 4)
+
+    @override_settings(MEMOIZE_ENABLED=False)
+    def test_disabled(self):
+        user = self.users[0]
+        RatingService.get_rating_stats(user)
+        with CaptureQueriesContext(connection) as queries:
+            RatingService.get_rating_stats(user)
+        self.assertGreater(len(queries), 0)
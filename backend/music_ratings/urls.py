@@ -1,9 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RatingViewSet
+from .views import RatingViewSet, InsertionSessionViewSet, LeaderboardViewSet
 
 router = DefaultRouter()
 router.register(r'ratings', RatingViewSet, basename='rating')
+router.register(r'insertion-sessions', InsertionSessionViewSet, basename='insertion-session')
+router.register(r'leaderboard', LeaderboardViewSet, basename='leaderboard')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -2,24 +2,79 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Rating
-from .serializers import RatingSerializer
-from .services import RatingService
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from core.conditional import data_version_etag
+from core.fieldsets import FieldSelection
+from core.renderers import FastJSONRenderer
+from music_logs.models import SongLog
+from music_logs.exporters import export_response, CONTENT_TYPES, FORMAT_NDJSON
+from django.utils import timezone
+from .models import Rating, InsertionSession, TrackLeaderboardEntry
+from .serializers import RatingSerializer, FlatRatingSerializer, RankedSongLogFastSerializer, InsertionSessionSerializer, TrackLeaderboardEntrySerializer
+from .pagination import RatingHistoryPagination
+from .services import RatingService, InsertionService, EloWriteBehindService, LeaderboardService
 
 # Create your views here.
 
 class RatingViewSet(viewsets.ModelViewSet):
     serializer_class = RatingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RatingHistoryPagination
+
+    EXPORT_FIELDS = ['id', 'song_log_id', 'compared_song_log_id', 'winner_song_log_id', 'elo_applied', 'created_at']
 
     def get_queryset(self):
         # Users can only see their own ratings
-        return Rating.objects.filter(user=self.request.user)
+        queryset = Rating.objects.filter(user=self.request.user)
+        if self.is_flat():
+            return queryset
+        return queryset.select_related('song_log__track', 'compared_song_log__track', 'winner_song_log__track')
+
+    def get_serializer_class(self):
+        if self.is_flat():
+            return FlatRatingSerializer
+        return RatingSerializer
+
+    def is_flat(self):
+        """
+        ?flat=1 on reads returns song logs as IDs instead of nested objects
+        """
+        return (
+            self.action in ('list', 'retrieve') and
+            self.request.query_params.get('flat', '').lower() in ('1', 'true')
+        )
 
     def perform_create(self, serializer):
         # Automatically set the user when creating a rating
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        # Revert the ELO changes this comparison produced
+        RatingService.delete_rating(instance)
+
+    def update(self, request, *args, **kwargs):
+        """
+        Change the winner of a comparison, the only editable part of a rating
+        """
+        rating = self.get_object()
+        try:
+            winner_song_log_id = int(request.data.get('winner_song_log_id'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'winner_song_log_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            rating = RatingService.update_rating_winner(rating, winner_song_log_id)
+            return Response(RatingSerializer(rating).data)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
     @action(detail=False, methods=['get'])
     def comparison_pair(self, request):
         """
@@ -74,15 +129,64 @@ class RatingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=[FastJSONRenderer, BrowsableAPIRenderer])
+    @data_version_etag()
     def rankings(self, request):
         """
-        Get user's songs ranked by ELO rating
+        Get user's songs ranked by ELO rating, one page at a time.
+        Follow the `next` and `previous` links to move between pages, or pass
+        `song_id` to get the page starting with that song.
         """
+        cursor = request.query_params.get('cursor')
         try:
-            rankings = RatingService.get_user_rankings(request.user)
-            from music_logs.serializers import SongLogSerializer
-            return Response(SongLogSerializer(rankings, many=True).data)
+            page_size = min(
+                int(request.query_params.get('page_size', RatingService.RANKINGS_PAGE_SIZE)),
+                RatingService.MAX_RANKINGS_PAGE_SIZE
+            )
+            if page_size < 1:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'page_size must be a positive integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if cursor is not None:
+            try:
+                RatingService.parse_rankings_cursor(cursor)
+            except ValueError:
+                return Response(
+                    {'error': 'cursor must come from a next or previous link'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        if EloWriteBehindService.is_enabled():
+            # Read-your-writes: apply this user's buffered comparisons first
+            EloWriteBehindService.flush(user=request.user)
+
+        song_id = request.query_params.get('song_id')
+        if song_id:
+            try:
+                cursor = RatingService.get_song_cursor(request.user, song_id)
+            except (SongLog.DoesNotExist, ValueError):
+                return Response(
+                    {'error': 'Song not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+        try:
+            serializer = RankedSongLogFastSerializer.restrict(FieldSelection.from_request(request))
+            page = RatingService.get_user_rankings(
+                request.user, cursor=cursor, page_size=page_size, values=serializer.lookups
+            )
+            url = request.build_absolute_uri()
+            url = remove_query_param(url, 'song_id')
+            return Response({
+                'next': replace_query_param(url, 'cursor', page['next_cursor'])
+                        if page['next_cursor'] is not None else None,
+                'previous': replace_query_param(url, 'cursor', page['previous_cursor'])
+                            if page['previous_cursor'] is not None else None,
+                'results': serializer.serialize_rows(page['results'])
+            })
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -90,11 +194,14 @@ class RatingViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @data_version_etag()
     def stats(self, request):
         """
         Get rating statistics for the user
         """
         try:
+            if EloWriteBehindService.is_enabled():
+                EloWriteBehindService.flush(user=request.user)
             stats = RatingService.get_rating_stats(request.user)
             return Response(stats)
         except Exception as e:
@@ -102,3 +209,126 @@ class RatingViewSet(viewsets.ModelViewSet):
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Download all of the user's comparisons as NDJSON (default) or CSV, with
+        songs as IDs that refer to the song log export
+        """
+        file_format = request.query_params.get('file_format', FORMAT_NDJSON)
+        if file_format not in CONTENT_TYPES:
+            return Response(
+                {'error': f"file_format must be one of {', '.join(CONTENT_TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ratings = Rating.objects.filter(user=request.user)
+        return export_response(ratings, self.EXPORT_FIELDS, file_format, f'ratings-{timezone.localdate()}')
+
+
+class InsertionSessionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Place a newly logged song with a binary search over the user's rankings
+    """
+    serializer_class = InsertionSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        # Users can only see their own insertion sessions
+        queryset = InsertionSession.objects.filter(user=self.request.user).select_related('song_log__track')
+        session_status = self.request.query_params.get('status')
+        if session_status:
+            queryset = queryset.filter(status=session_status)
+        return queryset
+
+    def create(self, request):
+        """
+        Start an insertion session for a song, or resume the active one
+        """
+        try:
+            song_log_id = int(request.data.get('song_log_id'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'song_log_id is required and must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            session = InsertionService.start_session(request.user, song_log_id)
+            return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED)
+        except SongLog.DoesNotExist:
+            return Response(
+                {'error': 'Song not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+    @action(detail=True, methods=['post'])
+    def compare(self, request, pk=None):
+        """
+        Answer the session's current comparison
+        """
+        try:
+            winner_song_log_id = int(request.data.get('winner_song_log_id'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'winner_song_log_id is required and must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            session = InsertionService.record_comparison(request.user, pk, winner_song_log_id)
+            return Response(self.get_serializer(session).data)
+        except InsertionSession.DoesNotExist:
+            return Response(
+                {'error': 'Insertion session not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+
+class LeaderboardViewSet(viewsets.ViewSet):
+    """
+    Tracks ranked by their mean rating across every user who logged them
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        """
+        Get one page of the leaderboard. Pass `cursor` from a previous response to
+        continue, and `min_loggers` to leave out tracks only a few users logged.
+        """
+        try:
+            page_size = min(
+                int(request.query_params.get('page_size', LeaderboardService.PAGE_SIZE)),
+                LeaderboardService.MAX_PAGE_SIZE
+            )
+            min_loggers = int(request.query_params.get('min_loggers', 1))
+            cursor = request.query_params.get('cursor')
+            after = int(cursor) if cursor else None
+            if page_size < 1 or min_loggers < 1:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'cursor, page_size and min_loggers must be positive integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            page = LeaderboardService.get_page(after=after, page_size=page_size, min_loggers=min_loggers)
+        except TrackLeaderboardEntry.DoesNotExist:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        url = request.build_absolute_uri()
+        return Response({
+            'next': replace_query_param(url, 'cursor', page['next_cursor'])
+                    if page['next_cursor'] is not None else None,
+            'results': TrackLeaderboardEntrySerializer(page['results'], many=True).data
+        })
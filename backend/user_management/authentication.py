@@ -0,0 +1,102 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps a snapshot of each recently used token's user
+    in memory, per process, so most requests authenticate without a query.
+
+    Snapshots are dropped when the user is saved or deleted and when the token
+    is deleted (logout), and expire after AUTH_TOKEN_CACHE_TTL seconds, which
+    bounds how stale a snapshot in another process can get. The user's
+    data_version is left out of the snapshot and read from the database when
+    accessed, so ETags and version-keyed caches always see the current version.
+    """
+
+    # Never part of a snapshot, read on access instead
+    LIVE_FIELDS = {'data_version'}
+
+    _cache = OrderedDict()  # token key -> (expiry, user ID, user field names, user values, token created)
+    _keys_by_user = {}
+    _cache_lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    def authenticate_credentials(self, key):
+        cls = type(self)
+        with cls._cache_lock:
+            entry = cls._cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                cls._cache.move_to_end(key)
+                cls.hits += 1
+            else:
+                entry = None
+                cls.misses += 1
+        if entry:
+            return self.restore(key, entry)
+
+        # Invalid tokens and inactive users raise AuthenticationFailed, and are not cached
+        user, token = super().authenticate_credentials(key)
+        self.store(token)
+        return user, token
+
+    def store(self, token):
+        cls = type(self)
+        user = token.user
+        names = [field.attname for field in user._meta.concrete_fields if field.attname not in cls.LIVE_FIELDS]
+        # Copied, so later changes to the request's user never reach the snapshot
+        values = copy.deepcopy([getattr(user, name) for name in names])
+        expiry = time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL
+        with cls._cache_lock:
+            cls._cache[token.key] = (expiry, user.pk, names, values, token.created)
+            cls._keys_by_user[user.pk] = token.key
+            while len(cls._cache) > settings.AUTH_TOKEN_CACHE_SIZE:
+                _, (_, user_id, *_) = cls._cache.popitem(last=False)
+                cls._keys_by_user.pop(user_id, None)
+
+    def restore(self, key, entry):
+        _, _, names, values, created = entry
+        model = self.get_model()
+        user_model = model._meta.get_field('user').related_model
+        # Fields missing from `names` are deferred, and loaded on first access
+        user = user_model.from_db(None, names, copy.deepcopy(values))
+        token = model(key=key, user=user, created=created)
+        token._state.adding = False
+        return user, token
+
+    @classmethod
+    def invalidate_token(cls, key) -> None:
+        with cls._cache_lock:
+            entry = cls._cache.pop(key, None)
+            if entry:
+                cls._keys_by_user.pop(entry[1], None)
+
+    @classmethod
+    def invalidate_user(cls, user_id) -> None:
+        with cls._cache_lock:
+            key = cls._keys_by_user.pop(user_id, None)
+            if key is not None:
+                cls._cache.pop(key, None)
+
+    @classmethod
+    def cache_stats(cls):
+        with cls._cache_lock:
+            lookups = cls.hits + cls.misses
+            return {
+                'hits': cls.hits,
+                'misses': cls.misses,
+                'hit_rate': round(cls.hits / lookups, 4) if lookups else None,
+                'size': len(cls._cache),
+            }
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._cache_lock:
+            cls._cache.clear()
+            cls._keys_by_user.clear()
+            cls.hits = cls.misses = 0
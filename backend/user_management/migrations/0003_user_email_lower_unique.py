@@ -0,0 +1,44 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:54
+
+import django.db.models.functions.text
+import user_management.models
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    User = apps.get_model('user_management', 'User')
+    duplicates = list(
+        User.objects.exclude(email='').annotate(email_lower=Lower('email')).values('email_lower').annotate(
+            count=Count('id')
+        ).filter(count__gt=1).values_list('email_lower', flat=True)[:20]
+    )
+    if duplicates:
+        # Which account keeps the email is for an admin to decide, not a migration
+        raise RuntimeError(
+            'Emails must be unique ignoring case before this migration can add its unique index. '
+            f"Shared by several users: {', '.join(duplicates)}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user_management', '0002_user_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', user_management.models.UserManager()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='user_email_lower_unique'),
+        ),
+    ]
@@ -1,11 +1,26 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+
+class UserManager(BaseUserManager):
+    def with_email(self, email):
+        """
+        Users with this email, ignoring case. Reads the unique index on lower(email).
+        """
+        # Blank emails are left out of the index, the same condition lets the database use it
+        return self.alias(email_lower=Lower('email')).filter(email_lower=email.lower()).exclude(email='')
+
 
 class User(AbstractUser):
     favorite_genres = models.JSONField(default=list, blank=True)
     # favorite_artists is a list of objects: {id: str, name: str, image: str|null}
     favorite_artists = models.JSONField(default=list, blank=True)
     mood_preferences = models.JSONField(default=list, blank=True)
+    # Bumped on every write to the user's profile, song logs or ratings, so read
+    # endpoints can answer conditional requests without recomputing (see DataVersionService)
+    data_version = models.PositiveBigIntegerField(default=0, editable=False)
     """
     Example for favorite_artists:
     [
@@ -14,5 +29,13 @@ class User(AbstractUser):
     ]
     """
 
+    objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Emails log users in, so they must be unique regardless of case
+            models.UniqueConstraint(Lower('email'), condition=~Q(email=''), name='user_email_lower_unique'),
+        ]
+
     def __str__(self):
         return self.username
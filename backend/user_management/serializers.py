@@ -4,7 +4,23 @@ from django.contrib.auth.password_validation import validate_password
 
 User = get_user_model()
 
+def validate_unique_email(value, instance=None):
+    """
+    Emails are unique regardless of case, see User.Meta.constraints
+    """
+    if value:
+        others = User.objects.with_email(value)
+        if instance is not None:
+            others = others.exclude(pk=instance.pk)
+        if others.exists():
+            raise serializers.ValidationError('A user with that email already exists.')
+    return value
+
+
 class UserSerializer(serializers.ModelSerializer):
+    def validate_email(self, value):
+        return validate_unique_email(value, self.instance)
+
     def validate_favorite_artists(self, value):
         # Accepts either list of strings or list of objects, always returns list of objects
         new_value = []
@@ -40,6 +56,9 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         model = User
         fields = ['username', 'email', 'password', 'password2']
 
+    def validate_email(self, value):
+        return validate_unique_email(value)
+
     def validate(self, attrs):
         if attrs['password'] != attrs['password2']:
             raise serializers.ValidationError({"password": "Password fields didn't match."})
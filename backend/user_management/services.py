@@ -0,0 +1,42 @@
+from typing import Optional
+from django.db.models import F
+from core.memoize import bump_generations
+from .models import User
+
+
+class DataVersionService:
+    """
+    Service for the per-user data version, a counter bumped on every write that
+    changes what the user's read endpoints return. ETags are derived from it, and
+    bumping it also invalidates the memoized service results (see core.memoize).
+    """
+    
+    # Saves of only these fields change no API response
+    IGNORED_USER_FIELDS = {'last_login', 'password', 'data_version'}
+    
+    @staticmethod
+    def bump(user_id: int, global_results: bool = True) -> None:
+        """
+        Pass global_results=False for writes that can't change what other users
+        see in global results, such as comparisons
+        """
+        # An UPDATE rather than save(), so concurrent bumps never collapse into one
+        User.objects.filter(pk=user_id).update(data_version=F('data_version') + 1)
+        bump_generations(user_id, global_results)
+    
+    @classmethod
+    def user_saved(cls, user: User, created: bool, update_fields=None) -> None:
+        if created:
+            # A new user only changes results that compare users with each other
+            bump_generations(user.pk)
+            return
+        if update_fields is not None and set(update_fields) <= cls.IGNORED_USER_FIELDS:
+            return
+        cls.bump(user.pk)
+    
+    @staticmethod
+    def get(user_id: int) -> Optional[int]:
+        """
+        The stored version of a user, None if there is no such user
+        """
+        return User.objects.filter(pk=user_id).values_list('data_version', flat=True).first()
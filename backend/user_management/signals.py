@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import CachedTokenAuthentication
+from .models import User
+from .services import DataVersionService
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    DataVersionService.user_saved(instance, created, update_fields)
+    CachedTokenAuthentication.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    CachedTokenAuthentication.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Logout deletes the token
+    CachedTokenAuthentication.invalidate_token(instance.key)
@@ -1,3 +1,233 @@
-from django.test import TestCase
+from datetime import date
+from django.contrib.sessions.models import Session
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core.testing import QueryPlanMixin, create_rated_users, create_user_with_songs
+from music_logs.models import SongLog, Track
+from music_ratings.services import RatingService
+from .authentication import CachedTokenAuthentication
+from .models import User
 
-# Create your tests here.
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Tokens authenticate from memory after their first use, and never with a stale user
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user_with_songs('user0', song_count=3)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        CachedTokenAuthentication.clear_cache()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cache_hit(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/auth/user/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/user/')
+        self.assertEqual(response.json()['username'], 'user0')
+        self.assertEqual(CachedTokenAuthentication.cache_stats()['hits'], 1)
+        self.assertEqual(CachedTokenAuthentication.cache_stats()['misses'], 1)
+
+    def test_data_version_is_current(self):
+        self.client.get('/api/auth/user/')
+        response = self.client.get('/api/song-logs/home_status/')
+        self.user.song_logs.first().delete()
+        response = self.client.get('/api/song-logs/home_status/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['recent_activity']['total_logs'], 2)
+
+    def test_profile_update(self):
+        self.client.get('/api/auth/user/')
+        # Changed without signals, as another process's cache wouldn't see it
+        User.objects.filter(pk=self.user.pk).update(first_name='Changed')
+        response = self.client.patch('/api/auth/user/', {'favorite_genres': ['jazz']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/auth/user/').json()['favorite_genres'], ['jazz'])
+        # The update started from the stored user, not the cached snapshot
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Changed')
+
+    def test_deactivated_user(self):
+        self.client.get('/api/auth/user/')
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 401)
+
+    def test_logout(self):
+        self.client.get('/api/auth/user/')
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 401)
+
+
+class ConditionalRequestTests(TestCase):
+    """
+    Per-user endpoints send ETags derived from the data version, and answer a matching If-None-Match with 304
+    """
+
+    URLS = ['/api/ratings/rankings/', '/api/ratings/stats/', '/api/song-logs/home_status/']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = create_rated_users(2, 4, 3)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        CachedTokenAuthentication.clear_cache()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.profile_url = f'/api/song-logs/user_profile/?user_id={self.other.pk}'
+
+    def etags(self):
+        etags = {}
+        for url in [*self.URLS, self.profile_url]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etags[url] = response['ETag']
+        return etags
+
+    def test_not_modified(self):
+        for url, etag in self.etags().items():
+            with self.subTest(url=url):
+                # Only the data version is read, the token is authenticated from memory
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_writes(self):
+        song_ids = list(self.user.song_logs.order_by('id').values_list('id', flat=True))
+        track = Track.objects.create(title='New Song', artist='New Artist')
+        writes = [
+            ('song log', lambda: SongLog.objects.create(user=self.user, track=track, date=date(2024, 5, 1))),
+            ('rating', lambda: RatingService.create_rating(self.user, song_ids[0], song_ids[3], song_ids[3])),
+            ('profile', lambda: self.assertEqual(
+                self.client.patch('/api/auth/user/', {'favorite_genres': ['jazz']}, format='json').status_code, 200
+            )),
+        ]
+        for name, write in writes:
+            with self.subTest(write=name):
+                etags = self.etags()
+                version = User.objects.get(pk=self.user.pk).data_version
+                write()
+                self.assertGreater(User.objects.get(pk=self.user.pk).data_version, version)
+                for url in self.URLS:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                    self.assertEqual(response.status_code, 200)
+                    self.assertNotEqual(response['ETag'], etags[url])
+
+    def test_user_profile_follows_target_user(self):
+        etag = self.etags()[self.profile_url]
+        # The requesting user's writes don't change another user's profile
+        self.client.patch('/api/auth/user/', {'favorite_genres': ['jazz']}, format='json')
+        self.assertEqual(self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.other.song_logs.order_by('id').first().delete()
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response['ETag'].strip('"').split('-')[0], str(self.other.pk))
+
+
+class LeanMiddlewareTests(TestCase):
+    """
+    Token API requests skip the session, CSRF, auth and messages middleware, browser clients keep them
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user_with_songs('user0', song_count=1)
+        cls.user.email = 'user0@example.com'
+        cls.user.set_password('a-long-password')
+        cls.user.save()
+
+    def login(self, client):
+        response = client.post(
+            '/api/auth/login/', {'email': 'user0@example.com', 'password': 'a-long-password'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(User.objects.get(pk=self.user.pk).last_login)
+        return response
+
+    def test_login_starts_session(self):
+        client = APIClient()
+        self.login(client)
+        self.assertEqual(Session.objects.get().get_decoded()['_auth_user_id'], str(self.user.pk))
+        self.assertEqual(client.get('/api/song-logs/check_preferences/').status_code, 200)
+
+    def test_token_login_starts_no_session(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.login(client)
+        self.assertFalse(Session.objects.exists())
+
+    def test_token_request(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        response = client.get('/api/song-logs/check_preferences/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+        self.assertEqual(client.post('/api/auth/logout/').status_code, 204)
+
+    def test_session_request(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.get('/api/song-logs/check_preferences/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+        # Session clients still need a CSRF token to write
+        self.assertEqual(client.post('/api/auth/logout/').status_code, 403)
+
+
+class LoginTests(QueryPlanMixin, TestCase):
+    """
+    Login finds the user by email through the lower(email) index, ignoring case
+    """
+
+    # Login must not scan the user table either
+    FULL_SCAN_ALLOWED = set()
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(20):
+            User.objects.create_user(f'user{i}', f'User{i}@Example.com', 'a-long-password')
+        User.objects.create_user('no-email', '', 'a-long-password')
+
+    def login(self, email, password='a-long-password'):
+        return APIClient().post('/api/auth/login/', {'email': email, 'password': password}, format='json')
+
+    def test_login(self):
+        with self.assertUsesIndexes():
+            response = self.login('user7@example.COM')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['username'], 'user7')
+
+        # The token is reused, read along with the user
+        with CaptureQueriesContext(connection) as queries:
+            again = self.login('USER7@example.com')
+        self.assertEqual(again.json()['token'], response.json()['token'])
+        # Besides starting the session, only the user and token, then last_login
+        user_queries = [
+            query['sql'] for query in queries if 'django_session' not in query['sql'] and 'SAVEPOINT' not in query['sql']
+        ]
+        self.assertEqual(len(user_queries), 2, user_queries)
+
+    def test_invalid_credentials(self):
+        self.assertEqual(self.login('user7@example.com', 'wrong').status_code, 401)
+        self.assertEqual(self.login('nobody@example.com').status_code, 401)
+
+    def test_duplicate_email(self):
+        response = APIClient().post('/api/auth/register/', {
+            'username': 'new', 'email': 'USER3@example.com', 'password': 'Xyz-12345-long', 'password2': 'Xyz-12345-long'
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user('new', 'user3@EXAMPLE.com', 'a-long-password')
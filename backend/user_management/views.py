@@ -4,6 +4,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth.signals import user_logged_in
+from django.db import IntegrityError, transaction
 from .models import User
 from .serializers import UserSerializer, UserRegistrationSerializer
 
@@ -55,13 +57,18 @@ class LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Find user by email and authenticate directly
+        # Find user by email and authenticate directly, with their token if they have one
         try:
-            user = User.objects.get(email=email)
+            user = User.objects.with_email(str(email)).select_related('auth_token').get()
             if user.check_password(password):
-                # Password is correct, create token and login
-                login(request, user)
-                token, _ = Token.objects.get_or_create(user=user)
+                # Password is correct, hand out the token. Session clients are logged in
+                # as before; token API requests skip the session middleware, so for them
+                # the signal alone records the login
+                if hasattr(request, 'session'):
+                    login(request, user)
+                else:
+                    user_logged_in.send(sender=user.__class__, request=request, user=user)
+                token = self.get_token(user)
                 
                 return Response({
                     'user': UserSerializer(user).data,
@@ -78,6 +85,19 @@ class LoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
+    @staticmethod
+    def get_token(user):
+        try:
+            return user.auth_token
+        except Token.DoesNotExist:
+            pass
+        try:
+            with transaction.atomic():
+                return Token.objects.create(user=user)
+        except IntegrityError:
+            # A concurrent login created it first
+            return Token.objects.get(user=user)
+
 class LogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -88,7 +108,9 @@ class LogoutView(APIView):
         except (AttributeError, Token.DoesNotExist):
             pass
 
-        logout(request)
+        # Token API requests skip the session middleware, only browser clients have a session to end
+        if hasattr(request, 'session'):
+            logout(request)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class UserView(generics.RetrieveUpdateAPIView):
@@ -96,4 +118,7 @@ class UserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user
\ No newline at end of file
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        # Updates start from the stored user, the authenticated one can be a cached snapshot
+        return User.objects.get(pk=self.request.user.pk)
\ No newline at end of file
@@ -59,12 +59,36 @@ export interface RatingStats {
     } | null;
 }
 
+export interface RankedSongLog extends SongLog {
+    rank: number;
+    percentile: number;
+}
+
+export interface RankingsPage {
+    next: string | null;
+    previous: string | null;
+    results: RankedSongLog[];
+}
+
+export interface RatingHistoryPage {
+    next: string | null;
+    previous: string | null;
+    // Nested song logs by default, song log IDs with `flat`
+    results: any[];
+}
+
 export interface CreateRatingData {
     song_log_id: number;
     compared_song_log_id: number;
     winner_song_log_id: number;
 }
 
+// Cursor of the page a `next`/`previous` link points at
+export const pageCursor = (link: string | null): string | undefined => {
+    const cursor = link ? new URL(link).searchParams.get('cursor') : null;
+    return cursor === null ? undefined : cursor;
+};
+
 export const ratingsApi = {
     getComparisonPair: async (): Promise<ComparisonPair> => {
         const response = await ratingsClient.get('/ratings/comparison_pair/');
@@ -76,8 +100,20 @@ export const ratingsApi = {
         return response.data;
     },
 
-    getRankings: async (): Promise<SongLog[]> => {
-        const response = await ratingsClient.get('/ratings/rankings/');
+    // Every ranked song, following the cursor through all pages
+    getRankings: async (): Promise<RankedSongLog[]> => {
+        const songs: RankedSongLog[] = [];
+        let cursor: string | undefined;
+        do {
+            const page: RankingsPage = await ratingsApi.getRankingsPage({ cursor, page_size: 200 });
+            songs.push(...page.results);
+            cursor = pageCursor(page.next);
+        } while (cursor !== undefined);
+        return songs;
+    },
+
+    getRankingsPage: async (params: { cursor?: string; page_size?: number; song_id?: number } = {}): Promise<RankingsPage> => {
+        const response = await ratingsClient.get('/ratings/rankings/', { params });
         return response.data;
     },
 
@@ -86,8 +122,9 @@ export const ratingsApi = {
         return response.data;
     },
 
-    getRatingHistory: async (): Promise<any[]> => {
-        const response = await ratingsClient.get('/ratings/');
+    getRatingHistory: async (params: { cursor?: string; page_size?: number; flat?: boolean } = {}): Promise<RatingHistoryPage> => {
+        const { flat, ...rest } = params;
+        const response = await ratingsClient.get('/ratings/', { params: flat ? { ...rest, flat: 1 } : rest });
         return response.data;
     }
 }; 
\ No newline at end of file
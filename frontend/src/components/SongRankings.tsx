@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { ratingsApi, type RatingStats } from '../api/ratings';
+import { ratingsApi, pageCursor, type RatingStats } from '../api/ratings';
 import type { SongLog } from '../types/songlog';
 
 interface SongRankingsProps {
@@ -9,18 +9,21 @@ interface SongRankingsProps {
 export const SongRankings: React.FC<SongRankingsProps> = ({ className = '' }) => {
     const [rankings, setRankings] = useState<SongLog[]>([]);
     const [stats, setStats] = useState<RatingStats | null>(null);
+    const [nextCursor, setNextCursor] = useState<string | undefined>(undefined);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [error, setError] = useState<string | null>(null);
 
     const fetchData = async () => {
         setLoading(true);
         setError(null);
         try {
-            const [rankingsData, statsData] = await Promise.all([
-                ratingsApi.getRankings(),
+            const [rankingsPage, statsData] = await Promise.all([
+                ratingsApi.getRankingsPage(),
                 ratingsApi.getStats()
             ]);
-            setRankings(rankingsData);
+            setRankings(rankingsPage.results);
+            setNextCursor(pageCursor(rankingsPage.next));
             setStats(statsData);
         } catch (err: any) {
             setError('Failed to load rankings. Please try again.');
@@ -30,6 +33,21 @@ export const SongRankings: React.FC<SongRankingsProps> = ({ className = '' }) =>
         }
     };
 
+    const fetchMore = async () => {
+        if (nextCursor === undefined) return;
+        setLoadingMore(true);
+        try {
+            const rankingsPage = await ratingsApi.getRankingsPage({ cursor: nextCursor });
+            setRankings(current => [...current, ...rankingsPage.results]);
+            setNextCursor(pageCursor(rankingsPage.next));
+        } catch (err: any) {
+            setError('Failed to load rankings. Please try again.');
+            console.error('Error fetching rankings:', err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         fetchData();
     }, []);
@@ -163,6 +181,18 @@ export const SongRankings: React.FC<SongRankingsProps> = ({ className = '' }) =>
                         ))}
                     </div>
                 )}
+
+                {nextCursor !== undefined && (
+                    <div className="p-4 text-center border-t border-gray-200">
+                        <button
+                            onClick={fetchMore}
+                            disabled={loadingMore}
+                            className="px-4 py-2 bg-blue-600 text-white rounded-lg hover:bg-blue-700 disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Loading...' : 'Show more'}
+                        </button>
+                    </div>
+                )}
             </div>
         </div>
     );
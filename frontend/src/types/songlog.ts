@@ -15,4 +15,7 @@ export interface SongLog {
     preview_url: string | null;
     duration_ms: number | null;
     popularity: number | null;
+    comparisons: number;
+    wins: number;
+    last_compared_at: string | null; // ISO string format
 } 
\ No newline at end of file